@@ -0,0 +1,45 @@
+"""
+Benchmark per-lap altitude deltas: the former per-lap filter (O(laps x points))
+against the single grouped pass used by the webapp (O(points)).
+
+    python benchmarks/bench_altitude_deltas.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "webapp"))
+
+from app import _calculate_lap_altitude_deltas  # noqa: E402
+
+POINTS_PER_LAP = 300  # ~1 km laps sampled every second
+
+
+def _per_lap_filter(laps, points):
+    """Previous implementation: filter the whole run once for every lap"""
+    deltas = {}
+    for lap_num in laps:
+        altitudes = [float(p["Altitude_m"]) for p in points if p.get("LapNumber") == lap_num
+                     and p.get("Altitude_m") is not None]
+        deltas[lap_num] = sum(altitudes[i] - altitudes[i - 1] for i in range(1, len(altitudes)))
+    return deltas
+
+
+def _make_run(lap_count):
+    return [{"LapNumber": lap, "Altitude_m": 100.0 + (i % 50) * 0.5}
+            for lap in range(1, lap_count + 1) for i in range(POINTS_PER_LAP)]
+
+
+def main():
+    print(f"{'laps':>6} {'points':>8} {'per-lap filter':>16} {'single pass':>13} {'speedup':>8}")
+    for lap_count in (5, 10, 21, 42, 100):
+        points = _make_run(lap_count)
+        laps = list(range(1, lap_count + 1))
+        assert _per_lap_filter(laps, points) == _calculate_lap_altitude_deltas(points)
+        old = min(timeit.repeat(lambda: _per_lap_filter(laps, points), number=3, repeat=3)) / 3
+        new = min(timeit.repeat(lambda: _calculate_lap_altitude_deltas(points), number=3, repeat=3)) / 3
+        print(f"{lap_count:>6} {len(points):>8} {old * 1000:>13.1f} ms {new * 1000:>10.1f} ms {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
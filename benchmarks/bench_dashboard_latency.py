@@ -0,0 +1,103 @@
+"""
+Benchmark dashboard (index) latency with the independent MongoDB reads issued one after the
+other (QUERY_CONCURRENCY=1) against the concurrent fan-out used by the webapp. Collections are
+simulated with a random per-query round trip so the result does not depend on a local server;
+the response cache is off so every request reaches the data layer.
+
+    python benchmarks/bench_dashboard_latency.py
+"""
+import os
+import random
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "webapp"))
+
+import app  # noqa: E402
+
+REQUESTS = 200
+RUNS = 50
+LAPS_PER_RUN = 10
+# Median round trip ~5 ms with a long tail, roughly a loaded replica set
+LATENCY_MU, LATENCY_SIGMA = -5.3, 0.6
+
+
+class _SimulatedCollection:
+    def __init__(self, docs, rng):
+        self.docs = docs
+        self.rng = rng
+
+    def _round_trip(self):
+        time.sleep(self.rng.lognormvariate(LATENCY_MU, LATENCY_SIGMA))
+
+    def find(self, *args, **kwargs):
+        self._round_trip()
+        return _SimulatedCursor(self.docs)
+
+    def find_one(self, *args, **kwargs):
+        self._round_trip()
+        return None
+
+    def aggregate(self, *args, **kwargs):
+        self._round_trip()
+        return iter([])
+
+    def distinct(self, *args, **kwargs):
+        self._round_trip()
+        return []
+
+
+class _SimulatedCursor(list):
+    def sort(self, *args, **kwargs):
+        return self
+
+
+def _database(layout):
+    rng = random.Random(42)
+    laps = [{"_source_file": f"run_2025-01-{run % 28 + 1:02d}_{run}.tcx", "LapNumber": lap,
+             "LapDistance_m": 1000.0, "LapTotalTime_s": 290.0 + lap}
+            for run in range(RUNS) for lap in range(1, LAPS_PER_RUN + 1)]
+    runs = []
+    if layout == "runs":
+        runs = [{"_source_file": f"run_2025-01-{run % 28 + 1:02d}_{run}.tcx", "date": "2025-01-01", "format": 1,
+                 "total_distance_m": 10000.0, "total_time_s": 3000.0, "lap_count": LAPS_PER_RUN,
+                 "valid_lap_count": LAPS_PER_RUN, "laps": laps[run * LAPS_PER_RUN:(run + 1) * LAPS_PER_RUN]}
+                for run in range(RUNS)]
+    docs = {app.COLLECTION_SUMMARY: laps, app.COLLECTION_RUNS: runs}
+    names = (app.COLLECTION_SUMMARY, app.COLLECTION_DETAILED, app.COLLECTION_DETAILED_PACKED, app.COLLECTION_RUNS,
+             app.COLLECTION_PERSONAL_RECORDS, app.COLLECTION_DATASET_VERSION)
+    return {name: _SimulatedCollection(docs.get(name, []), rng) for name in names}
+
+
+def _latencies(layout, concurrency):
+    db = _database(layout)
+    client = app.app.test_client()
+    latencies = []
+    with patch.object(app, "get_db_connection", return_value=db), \
+         patch.object(app, "response_cache", app.ResponseCache(0)), \
+         patch.object(app, "DATASET_VERSION_POLL_S", 0), \
+         patch.object(app, "QUERY_CONCURRENCY", concurrency):
+        for _ in range(REQUESTS):
+            start = time.perf_counter()
+            response = client.get("/")
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200
+    return sorted(latencies)
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))] * 1000
+
+
+def main():
+    print(f"{'dashboard source':<18} {'queries':<11} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for layout in ("runs", "laps"):
+        for concurrency, label in ((1, "sequential"), (app.QUERY_CONCURRENCY_DEFAULT, "concurrent")):
+            values = _latencies(layout, concurrency)
+            print(f"{layout:<18} {label:<11} {_percentile(values, 0.50):>8.1f} {_percentile(values, 0.95):>8.1f} "
+                  f"{_percentile(values, 0.99):>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
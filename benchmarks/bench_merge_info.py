@@ -0,0 +1,60 @@
+"""
+Benchmark detailed-table cell-merge info: the former per-row forward scan
+(O(rows x run length)) against the run-length pass used by the webapp (O(rows)).
+
+    python benchmarks/bench_merge_info.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "webapp"))
+
+from app import _calculate_table_merge_info  # noqa: E402
+from const import MERGE_COLUMNS  # noqa: E402
+
+ROWS_PER_LAP = 300  # ~1 km laps with one row per second
+
+
+def _forward_scan(rows):
+    """Previous implementation: for each row, scan ahead to count its rowspan"""
+    result = []
+    for i, row in enumerate(rows):
+        merge_info = {}
+        for col in MERGE_COLUMNS:
+            if col in row:
+                if i == 0 or rows[i - 1].get(col) != row[col]:
+                    rowspan = 1
+                    for j in range(i + 1, len(rows)):
+                        if rows[j].get(col) == row[col]:
+                            rowspan += 1
+                        else:
+                            break
+                    merge_info[col] = {"show": True, "rowspan": rowspan}
+                else:
+                    merge_info[col] = {"show": False, "rowspan": 1}
+        result.append(merge_info)
+    return result
+
+
+def _make_table(lap_count):
+    rows = []
+    for lap in range(1, lap_count + 1):
+        lap_fields = {"LapNumber": lap, "LapStartTime": f"lap-{lap}", "LapTotalTime_s": 300.0,
+                      "LapDistance_m": 1000.0, "Pace_min_per_km": 5.0, "_source_file": "run.tcx"}
+        rows.extend(dict(lap_fields, Time=i) for i in range(ROWS_PER_LAP))
+    return rows
+
+
+def main():
+    print(f"{'laps':>6} {'rows':>8} {'forward scan':>14} {'run-length':>12} {'speedup':>8}")
+    for lap_count in (1, 5, 21, 42):
+        rows = _make_table(lap_count)
+        assert _forward_scan(rows) == _calculate_table_merge_info(rows)
+        old = min(timeit.repeat(lambda: _forward_scan(rows), number=1, repeat=3))
+        new = min(timeit.repeat(lambda: _calculate_table_merge_info(rows), number=1, repeat=3))
+        print(f"{lap_count:>6} {len(rows):>8} {old * 1000:>11.1f} ms {new * 1000:>9.1f} ms {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
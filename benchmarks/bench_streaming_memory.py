@@ -0,0 +1,91 @@
+"""
+Benchmark peak Python memory of the webapp's client-side detailed pass on a synthetic
+dataset: the former list() materialization of every trackpoint against the streaming
+pass over the cursor used by the webapp. Rows are generated lazily, like a cursor
+returning batches, so only what the code under test keeps alive is counted.
+
+    python benchmarks/bench_streaming_memory.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "webapp"))
+
+import app  # noqa: E402
+
+POINTS_PER_RUN = 3600  # one hour at one trackpoint per second
+POINTS_PER_LAP = 300
+
+
+class _SyntheticCursor:
+    def __init__(self, run_count):
+        self.run_count = run_count
+
+    def sort(self, *args, **kwargs):
+        for run in range(self.run_count):
+            source = f"run_{run:04d}.tcx"
+            for i in range(POINTS_PER_RUN):
+                lap = 1 + i // POINTS_PER_LAP
+                yield {"LapNumber": lap, "LapStartTime": f"2025-01-01T{lap:02d}:00:00Z", "LapTotalTime_s": 300.0,
+                       "LapDistance_m": 1000.0, "Pace_min_per_km": 5.0,
+                       "Time": f"2025-01-01T{i // 3600:02d}:{i // 60 % 60:02d}:{i % 60:02d}Z",
+                       "Latitude": 41.0 + i * 1e-5, "Longitude": 2.0 + i * 1e-5, "Altitude_m": 100.0 + (i % 50) * 0.5,
+                       "Distance_m": i * 3.3, "_source_file": source}
+
+
+class _SyntheticCollection:
+    def __init__(self, run_count):
+        self.run_count = run_count
+
+    def find(self, *args, **kwargs):
+        return _SyntheticCursor(self.run_count)
+
+    def distinct(self, *args, **kwargs):
+        return []
+
+
+def _materialized(db):
+    """Previous implementation: list() the whole cursor, group it, then sample each source"""
+    rows = list(db[app.COLLECTION_DETAILED].find({}, {app.COL_ID: 0}).sort(app.COL_TIME, 1))
+    by_source = defaultdict(list)
+    for row in rows:
+        by_source[row.get(app.COL_SOURCE_FILE, "Unknown")].append(row)
+    return app.DetailedView(
+        {source: app._calculate_lap_altitude_deltas(points) for source, points in by_source.items()},
+        {source: app._filter_data_by_interval(points) for source, points in by_source.items()},
+    )
+
+
+def _streamed(db):
+    return app._detailed_view_from_rows(app._iter_detailed_rows(db))
+
+
+def _measure(fn, db):
+    tracemalloc.start()
+    start = time.perf_counter()
+    view = fn(db)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return view, peak / 1e6, elapsed
+
+
+def main():
+    print(f"{'runs':>6} {'points':>9} {'samples':>8} {'list() peak':>12} {'streamed peak':>14} {'ratio':>7}")
+    for run_count in (5, 20, 60):
+        db = {name: _SyntheticCollection(run_count)
+              for name in (app.COLLECTION_DETAILED, app.COLLECTION_DETAILED_PACKED)}
+        db[app.COLLECTION_DETAILED_PACKED].run_count = 0
+        old_view, old_peak, old_s = _measure(_materialized, db)
+        new_view, new_peak, new_s = _measure(_streamed, db)
+        assert old_view == new_view
+        samples = sum(len(rows) for rows in new_view.samples.values())
+        print(f"{run_count:>6} {run_count * POINTS_PER_RUN:>9} {samples:>8} {old_peak:>9.1f} MB "
+              f"{new_peak:>11.1f} MB {old_peak / new_peak:>6.1f}x   ({old_s:.2f}s vs {new_s:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
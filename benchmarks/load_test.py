@@ -0,0 +1,86 @@
+"""
+Load-test a running webapp: a fixed number of client threads issue GET requests for a fixed
+duration and the script reports requests/sec and latency percentiles per path.
+
+Against a local Mongo, for example:
+
+    docker compose up -d mongodb
+    python src/trainparser.py samples/ --mongo
+    (cd webapp && gunicorn --config gunicorn.conf.py app:app)     # or: python app.py
+    python benchmarks/load_test.py --url http://localhost:5000 --concurrency 16 --duration 20
+"""
+import argparse
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def _client(base_url, paths, deadline, headers, latencies, statuses, lock, offset):
+    local_latencies = defaultdict(list)
+    local_statuses = Counter()
+    i = offset
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        request = urllib.request.Request(base_url + path, headers=headers)
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except OSError as e:
+            status = type(e).__name__
+        local_latencies[path].append(time.perf_counter() - start)
+        local_statuses[status] += 1
+    with lock:
+        for path, values in local_latencies.items():
+            latencies[path].extend(values)
+        statuses.update(local_statuses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Requests/sec and latency of a running RunningTracker webapp")
+    parser.add_argument("--url", default="http://localhost:5000", help="Base URL of the webapp")
+    parser.add_argument("--path", action="append", dest="paths",
+                        help="Path to request; repeat to rotate through several (default: /)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Client threads")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run")
+    parser.add_argument("--gzip", action="store_true", help="Send Accept-Encoding: gzip")
+    args = parser.parse_args()
+
+    paths = args.paths or ["/"]
+    headers = {"Accept-Encoding": "gzip"} if args.gzip else {}
+    latencies, statuses, lock = defaultdict(list), Counter(), threading.Lock()
+    deadline = time.perf_counter() + args.duration
+    threads = [threading.Thread(target=_client, args=(args.url.rstrip("/"), paths, deadline, headers,
+                                                      latencies, statuses, lock, n))
+               for n in range(args.concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    total = sum(statuses.values())
+    print(f"{total} requests in {elapsed:.1f}s with {args.concurrency} clients: {total / elapsed:.1f} req/s")
+    print(f"status codes: {dict(statuses)}")
+    print(f"{'path':<40} {'requests':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for path in paths:
+        values = sorted(latencies[path])
+        print(f"{path:<40} {len(values):>9} {_percentile(values, 0.50) * 1000:>8.1f} "
+              f"{_percentile(values, 0.95) * 1000:>8.1f} {_percentile(values, 0.99) * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+import os
+import stat
+
+
+def _default_file_mode():
+    """Mode a newly created file gets under the current umask"""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def replace_keeping_mode(tmp_path, path):
+    """
+    Atomically move a tempfile.mkstemp file over `path`. mkstemp creates owner-only (0600)
+    files, so the replacement first takes the mode of the file it replaces, or the umask
+    default when `path` does not exist yet.
+    """
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = _default_file_mode()
+    os.chmod(tmp_path, mode)
+    os.replace(tmp_path, path)
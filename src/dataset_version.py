@@ -0,0 +1,15 @@
+from datetime import datetime, timezone
+
+# Single-document collection holding a counter bumped whenever ingest changes stored data.
+# The webapp keys its response cache (and HTTP validators) on it.
+DATASET_VERSION_COLLECTION = "dataset_version"
+DATASET_VERSION_ID = "dataset"
+
+
+def bump_dataset_version(db):
+    """Mark the stored data as changed so the webapp stops serving cached responses"""
+    db[DATASET_VERSION_COLLECTION].update_one(
+        {"_id": DATASET_VERSION_ID},
+        {"$inc": {"version": 1}, "$set": {"updated_at": datetime.now(timezone.utc)}},
+        upsert=True,
+    )
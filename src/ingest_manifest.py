@@ -0,0 +1,185 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime, timezone
+
+from atomic_write import replace_keeping_mode
+
+logger = logging.getLogger(__name__)
+
+# Collection used when the manifest is kept in MongoDB
+MANIFEST_COLLECTION = "ingest_manifest"
+
+# Default manifest filename, stored next to the Excel output
+DEFAULT_MANIFEST_FILENAME = ".ingest_manifest.json"
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path):
+    """Return the hex SHA-256 digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _mode_covers(ingested_mode, requested_mode):
+    """A file ingested in 'both' mode covers any later request; otherwise modes must match"""
+    return ingested_mode == "both" or ingested_mode == requested_mode
+
+
+def _merge_modes(previous_mode, mode):
+    """Summary and detailed data written to one destination by separate runs add up to 'both'"""
+    if previous_mode is None or previous_mode == mode:
+        return mode
+    return "both"
+
+
+def excel_destination(path):
+    return f"excel:{os.path.realpath(path)}"
+
+
+def parquet_destination(directory):
+    return f"parquet:{os.path.realpath(directory)}"
+
+
+def mongo_destination(uri, database):
+    """Destination id of a MongoDB database; credentials in the URI are not stored"""
+    scheme, separator, rest = uri.partition("://")
+    hosts = rest.split("/", 1)[0].rpartition("@")[2]
+    return f"mongo:{scheme}{separator}{hosts}/{database}"
+
+
+def _destination_present(destination):
+    """File outputs must still exist for their recorded contents to count"""
+    kind, _, location = destination.partition(":")
+    if kind in ("excel", "parquet"):
+        return os.path.exists(location)
+    return True
+
+
+class JsonManifestStore:
+    """Manifest persisted as a JSON file, written atomically on save"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable ingest manifest: {e}")
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def save(self, entries, changed_keys):
+        if not changed_keys:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".manifest-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entries, f, indent=1, sort_keys=True)
+            replace_keeping_mode(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+class MongoManifestStore:
+    """Manifest persisted in a MongoDB collection, one document per file keyed by path"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def load(self):
+        entries = {}
+        for doc in self.collection.find({}):
+            path = doc.pop("_id", None)
+            if isinstance(path, str):
+                entries[path] = doc
+        return entries
+
+    def save(self, entries, changed_keys):
+        from pymongo import ReplaceOne
+        operations = [ReplaceOne({"_id": key}, entries[key], upsert=True) for key in changed_keys]
+        if operations:
+            self.collection.bulk_write(operations, ordered=False)
+
+
+class IngestManifest:
+    """
+    Tracks which TCX files have already been ingested, keyed by resolved path.
+    Each entry stores size, mtime, SHA-256 and the export mode written to each destination
+    (Excel workbook, Parquet directory, MongoDB database). A file is only skipped when every
+    destination of the current run already holds it and file destinations still exist.
+    If its size and mtime match the entry it is skipped without being read; if only the
+    mtime moved, the content hash decides.
+    """
+
+    def __init__(self, store, destinations=()):
+        self.store = store
+        self.destinations = list(destinations)
+        self.entries = store.load()
+        self._changed = set()
+
+    @staticmethod
+    def _key(path):
+        return str(os.path.realpath(path))
+
+    def _covers(self, entry, mode):
+        ingested = entry.get("destinations") or {}
+        return all(_mode_covers(ingested.get(destination), mode) and _destination_present(destination)
+                   for destination in self.destinations)
+
+    def is_unchanged(self, path, mode):
+        entry = self.entries.get(self._key(path))
+        if entry is None or not self._covers(entry, mode):
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+
+        if stat.st_size != entry.get("size"):
+            return False
+        if stat.st_mtime_ns == entry.get("mtime_ns"):
+            return True
+
+        # Same size but touched: only the content hash can tell
+        if file_sha256(path) != entry.get("sha256"):
+            return False
+        entry["mtime_ns"] = stat.st_mtime_ns
+        self._changed.add(self._key(path))
+        return True
+
+    def record(self, path, mode):
+        """Record a successfully ingested file in this run's destinations"""
+        stat = os.stat(path)
+        key = self._key(path)
+        sha256 = file_sha256(path)
+        previous = self.entries.get(key) or {}
+        # Other destinations still hold this file only if its content did not change
+        destinations = dict(previous.get("destinations") or {}) if previous.get("sha256") == sha256 else {}
+        for destination in self.destinations:
+            destinations[destination] = _merge_modes(destinations.get(destination), mode)
+        self.entries[key] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256,
+            "destinations": destinations,
+            "ingested_at": datetime.now(timezone.utc).isoformat(),
+        }
+        self._changed.add(key)
+
+    def save(self):
+        self.store.save(self.entries, sorted(self._changed))
+        self._changed.clear()
@@ -0,0 +1,107 @@
+import cProfile
+import os
+import pstats
+import sys
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not available on Windows; peak RSS is then reported as unknown
+    resource = None
+
+# Functions listed in the text profile and allocation sites in the memory report
+PROFILE_TOP_FUNCTIONS = 40
+TRACEMALLOC_TOP_SITES = 25
+TRACEMALLOC_FRAMES = 10
+
+# Writer stages timed per file, in report order (IngestResult field, column title)
+STAGES = [("parse_s", "parse"), ("excel_s", "excel"), ("parquet_s", "parquet"), ("mongo_s", "mongo")]
+
+
+def peak_rss_bytes(children=False):
+    """
+    Peak resident set size of this process, or of its terminated child processes (the
+    --workers parse pool), in bytes. None when the platform does not report it.
+    """
+    if resource is None:
+        return None
+    who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+    max_rss = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def _rate(amount, seconds):
+    return amount / seconds if seconds > 0 else 0.0
+
+
+def _mb(size_bytes):
+    return "unknown" if size_bytes is None else f"{size_bytes / 1e6:.1f} MB"
+
+
+def format_stats_report(results, elapsed_s, excel_save_s=0.0, workers=1):
+    """Per-file stage timings and throughput of a CLI run, plus totals and peak memory, as text lines"""
+    header = f"{'file':<44} {'points':>8} {'MB':>7}" + "".join(f" {title:>8}" for _, title in STAGES)
+    header += f" {'total s':>8} {'points/s':>10} {'MB/s':>7}"
+    lines = ["Ingest statistics:", header]
+    for r in results:
+        total_s = r.parse_s + r.write_s
+        name = os.path.basename(r.file)
+        if len(name) > 44:
+            name = "..." + name[-41:]
+        lines.append(
+            f"{name:<44} {r.trackpoints:>8} {r.size_bytes / 1e6:>7.2f}"
+            + "".join(f" {getattr(r, field):>8.3f}" for field, _ in STAGES)
+            + f" {total_s:>8.3f} {_rate(r.trackpoints, total_s):>10,.0f} {_rate(r.size_bytes / 1e6, total_s):>7.2f}"
+        )
+
+    points = sum(r.trackpoints for r in results)
+    size_mb = sum(r.size_bytes for r in results) / 1e6
+    stage_totals = "".join(f" {sum(getattr(r, field) for r in results):>8.3f}" for field, _ in STAGES)
+    lines.append(
+        f"{f'total ({len(results)} files, wall clock)':<44} {points:>8} {size_mb:>7.2f}{stage_totals}"
+        f" {elapsed_s:>8.3f} {_rate(points, elapsed_s):>10,.0f} {_rate(size_mb, elapsed_s):>7.2f}"
+    )
+    if excel_save_s:
+        lines.append(f"Excel workbook save: {excel_save_s:.3f}s")
+    peak_rss = f"Peak RSS: {_mb(peak_rss_bytes())} (main process)"
+    if workers > 1:
+        peak_rss += f", {_mb(peak_rss_bytes(children=True))} (largest parse worker)"
+    lines.append(peak_rss)
+    return lines
+
+
+@contextmanager
+def profiled(path, trace_memory=False):
+    """
+    Profile the enclosed block with cProfile. Binary stats go to `path` (for pstats/snakeviz)
+    and a cumulative-time listing to `path`.txt. With trace_memory, a tracemalloc snapshot is
+    dumped to `path`.tracemalloc and its top allocation sites to `path`.memory.txt.
+    Only this process is profiled; parse workers started by --workers are not.
+    """
+    if trace_memory:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        if trace_memory:
+            # Snapshot before writing the profile so its own allocations are not included
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        profiler.dump_stats(path)
+        with open(path + ".txt", "w") as f:
+            pstats.Stats(profiler, stream=f).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+        written = [path, path + ".txt"]
+        if trace_memory:
+            snapshot.dump(path + ".tracemalloc")
+            with open(path + ".memory.txt", "w") as f:
+                f.write(f"Peak traced memory: {peak / 1e6:.1f} MB\n")
+                for stat in snapshot.statistics("lineno")[:TRACEMALLOC_TOP_SITES]:
+                    f.write(f"{stat}\n")
+            written += [path + ".tracemalloc", path + ".memory.txt"]
+        print(f"Profile written to {', '.join(written)}")
@@ -0,0 +1,103 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Indexes created on startup, as {collection: [(index name, keys)]}. The webapp creates
+# the same set from webapp/const.py; keep both in sync so names and keys never conflict.
+INDEXES = {
+    "summary": [
+        ("source_lap", [("_source_file", 1), ("LapNumber", 1)]),
+        ("lap_start_time", [("LapStartTime", 1)]),
+    ],
+    "detailed": [
+        ("source_lap_time", [("_source_file", 1), ("LapNumber", 1), ("Time", 1)]),
+        ("time", [("Time", 1)]),
+    ],
+    "detailed_packed": [
+        ("source_lap", [("_source_file", 1), ("LapNumber", 1)]),
+        ("lap_start_time", [("LapStartTime", 1)]),
+    ],
+    # Serve the personal-records recomputation: one sort + limit(1) per record
+    "runs": [
+        ("fastest_lap_time", [("fastest_lap.LapTotalTime_s", 1)]),
+        ("slowest_lap_time", [("slowest_lap.LapTotalTime_s", -1)]),
+        ("total_distance", [("total_distance_m", -1)]),
+        ("total_time", [("total_time_s", -1)]),
+    ],
+}
+
+# Query shapes issued by the webapp dashboard, as (label, collection, filter, sort).
+# "{source}" in a filter is replaced by a real _source_file before running explain().
+WEBAPP_QUERIES = [
+    ("all laps", "summary", {}, None),
+    ("all trackpoints by run", "detailed", {}, [("_source_file", 1), ("LapNumber", 1), ("Time", 1)]),
+    ("all packed laps", "detailed_packed", {}, [("_source_file", 1), ("LapNumber", 1)]),
+    ("all runs", "runs", {}, None),
+    ("personal records", "personal_records", {}, None),
+    ("one run's laps", "summary", {"_source_file": "{source}"}, [("LapNumber", 1)]),
+    ("one run's trackpoints", "detailed", {"_source_file": "{source}"}, [("LapNumber", 1), ("Time", 1)]),
+]
+
+
+def ensure_indexes(db):
+    """Create the summary/detailed indexes if missing; safe to call on every startup"""
+    from pymongo.errors import PyMongoError
+
+    created = []
+    for collection_name, indexes in INDEXES.items():
+        collection = db[collection_name]
+        for name, keys in indexes:
+            try:
+                created.append(collection.create_index(keys, name=name))
+            except PyMongoError as e:
+                # Usually an index with the same keys under another name, which still serves the
+                # query; timeouts and lost connections must not abort the ingest either
+                logger.warning(f"Could not create index {collection_name}.{name}: {e}")
+    return created
+
+
+def _plan_stages(plan):
+    """Flatten an explain() winning plan into its stage names, outermost first"""
+    stages = []
+    while isinstance(plan, dict):
+        if "queryPlan" in plan:
+            plan = plan["queryPlan"]
+            continue
+        stage = plan.get("stage")
+        if stage:
+            index_name = plan.get("indexName")
+            stages.append(f"{stage}({index_name})" if index_name else stage)
+        children = plan.get("inputStages") or [plan.get("inputStage")]
+        plan = children[0]
+    return stages
+
+
+def _substitute_source(query_filter, source):
+    return {k: (source if v == "{source}" else v) for k, v in query_filter.items()}
+
+
+def explain_webapp_queries(db):
+    """Run explain() on each webapp query shape and return one report dict per query"""
+    sample = db["summary"].find_one({}, {"_source_file": 1}) or {}
+    source = sample.get("_source_file", "")
+
+    reports = []
+    for label, collection_name, query_filter, sort in WEBAPP_QUERIES:
+        cursor = db[collection_name].find(_substitute_source(query_filter, source), {"_id": 0})
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = cursor.explain()
+        stats = explain.get("executionStats", {})
+        stages = _plan_stages(explain.get("queryPlanner", {}).get("winningPlan"))
+        # A full scan is only a problem when the query filters or sorts
+        needs_index = bool(query_filter or sort)
+        reports.append({
+            "query": f"{collection_name}: {label}",
+            "plan": " <- ".join(stages) or "unknown",
+            "keys_examined": stats.get("totalKeysExamined"),
+            "docs_examined": stats.get("totalDocsExamined"),
+            "returned": stats.get("nReturned"),
+            "time_ms": stats.get("executionTimeMillis"),
+            "ok": not needs_index or not any(s == "COLLSCAN" or s == "SORT" for s in stages),
+        })
+    return reports
@@ -0,0 +1,55 @@
+import zlib
+
+import numpy as np
+import pandas as pd
+
+# Collection holding the packed layout: one document per lap instead of one per trackpoint
+PACKED_COLLECTION = "detailed_packed"
+
+# Bumped whenever the block encoding changes; the webapp skips documents it does not understand
+PACKED_FORMAT = 1
+
+# Lap fields stored once per document and trackpoint columns stored as compressed blocks
+PACKED_LAP_FIELDS = ["LapNumber", "LapStartTime", "LapTotalTime_s", "LapDistance_m", "Pace_min_per_km"]
+PACKED_NUMERIC_COLUMNS = ["Latitude", "Longitude", "Altitude_m", "Distance_m"]
+
+
+def _pack_times(values):
+    """zlib block of newline-joined ISO timestamps; a missing time is stored as an empty string"""
+    text = "\n".join("" if v is None else str(v) for v in values)
+    return zlib.compress(text.encode("utf-8"))
+
+
+def _pack_floats(values):
+    """zlib block of little-endian float64 values; missing values are NaN"""
+    return zlib.compress(np.asarray(values, dtype="<f8").tobytes())
+
+
+def pack_lap_documents(df, source_file):
+    """
+    Yield one packed document per lap of a detailed DataFrame.
+    Lap fields are stored once; Time and the numeric trackpoint columns are stored
+    as zlib-compressed blocks under "points". The caller assigns _id.
+    """
+    for _, lap in df.groupby("LapNumber", sort=False):
+        doc = {k: v for k, v in lap.iloc[:1].to_dict(orient="records")[0].items() if k in PACKED_LAP_FIELDS}
+        doc["_source_file"] = source_file
+        doc["format"] = PACKED_FORMAT
+        doc["count"] = len(lap)
+        doc["points"] = {"Time": _pack_times(lap["Time"].tolist())}
+        for col in PACKED_NUMERIC_COLUMNS:
+            doc["points"][col] = _pack_floats(lap[col].to_numpy())
+        yield doc
+
+
+def unpack_lap_frame(doc):
+    """Inverse of pack_lap_documents for one document: the lap's trackpoints as a DataFrame"""
+    count = doc.get("count", 0)
+    points = doc["points"]
+    times = zlib.decompress(points["Time"]).decode("utf-8").split("\n") if count else []
+    frame = pd.DataFrame({"Time": [t or None for t in times]})
+    for col in PACKED_NUMERIC_COLUMNS:
+        frame[col] = np.frombuffer(zlib.decompress(points[col]), dtype="<f8") if count else []
+    for field in PACKED_LAP_FIELDS:
+        frame[field] = doc.get(field)
+    return frame
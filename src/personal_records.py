@@ -0,0 +1,84 @@
+from run_summary import RUNS_COLLECTION
+
+# Collection holding one document per personal record, keyed by record name
+RECORDS_COLLECTION = "personal_records"
+
+# Record name -> (runs document field the record is taken from, True if a larger value wins)
+RECORDS = {
+    "fastest_lap": ("fastest_lap.LapTotalTime_s", False),
+    "slowest_lap": ("slowest_lap.LapTotalTime_s", True),
+    "longest_distance": ("total_distance_m", True),
+    "longest_time": ("total_time_s", True),
+}
+
+
+def _field_value(doc, dotted_field):
+    for part in dotted_field.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+
+def _record_from_run(name, run):
+    """The record document a run would hold for `name`, or None if the run has no such value"""
+    value = _field_value(run, RECORDS[name][0])
+    if value is None:
+        return None
+    record = {
+        "_id": name,
+        "_source_file": run["_source_file"],
+        "date": run.get("date"),
+        "value": value,
+        "total_distance_m": run.get("total_distance_m"),
+        "total_time_s": run.get("total_time_s"),
+    }
+    if name in ("fastest_lap", "slowest_lap"):
+        record["lap"] = run[name]
+    return record
+
+
+def _beats(name, value, other):
+    return value > other if RECORDS[name][1] else value < other
+
+
+def _recompute(db, name):
+    """Set a record from the best run in the runs collection; an indexed sort + limit(1)"""
+    field, larger_wins = RECORDS[name]
+    best = list(db[RUNS_COLLECTION].find({field: {"$ne": None}}).sort(field, -1 if larger_wins else 1).limit(1))
+    record = _record_from_run(name, best[0]) if best else None
+    if record is None:
+        db[RECORDS_COLLECTION].delete_one({"_id": name})
+    else:
+        db[RECORDS_COLLECTION].replace_one({"_id": name}, record, upsert=True)
+
+
+def update_records(db, run):
+    """
+    Fold one freshly written runs document into the records. A new value only has to be
+    compared with the current holder; the runs collection is only queried when the
+    holder itself was re-ingested with a worse value.
+    """
+    records = db[RECORDS_COLLECTION]
+    for name in RECORDS:
+        current = records.find_one({"_id": name})
+        candidate = _record_from_run(name, run)
+        if current is not None and current.get("_source_file") == run["_source_file"]:
+            if candidate is not None and not _beats(name, current["value"], candidate["value"]):
+                records.replace_one({"_id": name}, candidate, upsert=True)
+            else:
+                _recompute(db, name)
+        elif candidate is not None and (current is None or _beats(name, candidate["value"], current["value"])):
+            records.replace_one({"_id": name}, candidate, upsert=True)
+
+
+def remove_source_records(db, source_file):
+    """Recompute the records held by a source file whose runs document was deleted"""
+    for record in db[RECORDS_COLLECTION].find({"_source_file": source_file}, {"_id": 1}):
+        _recompute(db, record["_id"])
+
+
+def rebuild_records(db):
+    """Recompute every record from the runs collection"""
+    for name in RECORDS:
+        _recompute(db, name)
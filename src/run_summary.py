@@ -0,0 +1,80 @@
+import math
+
+# Collection holding one pre-computed summary document per source file, written at ingest
+RUNS_COLLECTION = "runs"
+
+# Bumped whenever the document shape changes; the webapp skips documents it does not understand
+RUNS_FORMAT = 1
+
+# Laps shorter than this (in meters) are partial laps and never count as fastest/slowest.
+# Mirrors MIN_VALID_LAP_DISTANCE in webapp/const.py.
+MIN_VALID_LAP_DISTANCE = 990
+
+RUN_LAP_FIELDS = ["LapNumber", "LapStartTime", "LapTotalTime_s", "LapDistance_m", "Pace_min_per_km"]
+
+
+def _number(value):
+    """float(value), or None for missing/NaN values"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+
+def _is_valid_lap(lap):
+    distance = _number(lap.get("LapDistance_m"))
+    return distance is not None and distance >= MIN_VALID_LAP_DISTANCE and _number(lap.get("LapTotalTime_s")) is not None
+
+
+def _lap_records(summary, detailed):
+    """Lap rows as plain dicts, from the summary frame or, without one, the lap columns of the detailed frame"""
+    laps = summary
+    if laps is None:
+        laps = detailed.drop_duplicates("LapNumber")
+    laps = laps.reindex(columns=RUN_LAP_FIELDS).astype(object)
+    laps = laps.where(laps.notna(), None)
+    return laps.to_dict(orient="records")
+
+
+def lap_altitude_deltas(detailed):
+    """Altitude change per lap (last minus first known altitude), keyed by the lap number as a string"""
+    altitudes = detailed[["LapNumber", "Altitude_m"]].dropna()
+    deltas = altitudes.groupby("LapNumber", sort=False)["Altitude_m"].agg(lambda a: a.iloc[-1] - a.iloc[0])
+    # MongoDB document keys must be strings
+    return {str(int(lap)): float(delta) for lap, delta in deltas.items()}
+
+
+def elevation_gain(detailed):
+    """Sum of the climbs between consecutive known altitudes, in meters"""
+    altitudes = detailed["Altitude_m"].dropna()
+    return float(altitudes.diff().clip(lower=0).sum())
+
+
+def build_run_document(summary, detailed, source_file, date):
+    """
+    Pre-computed dashboard summary of one run: totals, lap count, fastest/slowest valid
+    lap and the laps themselves. Elevation fields are only present when the detailed
+    frame was parsed, so a summary-only re-ingest keeps the ones already stored.
+    Either frame may be None, but not both.
+    """
+    laps = _lap_records(summary, detailed)
+    valid = [lap for lap in laps if _is_valid_lap(lap)]
+    by_time = lambda lap: float(lap["LapTotalTime_s"])
+
+    doc = {
+        "_source_file": source_file,
+        "date": date,
+        "format": RUNS_FORMAT,
+        "lap_count": len(laps),
+        "valid_lap_count": len(valid),
+        "total_distance_m": sum(_number(lap["LapDistance_m"]) or 0 for lap in laps),
+        "total_time_s": sum(_number(lap["LapTotalTime_s"]) or 0 for lap in laps),
+        "fastest_lap": min(valid, key=by_time, default=None),
+        "slowest_lap": max(valid, key=by_time, default=None),
+        "laps": laps,
+    }
+    if detailed is not None:
+        doc["elevation_gain_m"] = elevation_gain(detailed)
+        doc["lap_altitude_deltas"] = lap_altitude_deltas(detailed)
+    return doc
@@ -157,6 +157,13 @@ class TestErrorHandling(unittest.TestCase):
             mock_args = MagicMock()
             mock_args.input_path = "/nonexistent/path"
             mock_args.mongo = False
+            mock_args.check_indexes = False
+            mock_args.migrate_to_packed = False
+            mock_args.rebuild_runs = False
+            mock_args.delete_source = None
+            mock_args.stats = False
+            mock_args.profile = None
+            mock_args.profile_memory = False
             mock_parser_instance = MagicMock()
             mock_parser_instance.parse_args.return_value = mock_args
             mock_parser.return_value = mock_parser_instance
@@ -0,0 +1,111 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import tempfile
+import pandas as pd
+from openpyxl import load_workbook
+
+# Add src directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class TestExcelBatchWriter(unittest.TestCase):
+    def setUp(self):
+        # Mock logging_config before importing trainparser
+        with patch.dict('sys.modules', {'logging_config': MagicMock()}):
+            from src import trainparser
+        self.trainparser = trainparser
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output = os.path.join(self.tmp.name, "out.xlsx")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_creates_new_workbook(self):
+        """Test a new workbook is written with header and values, NaN as empty cells"""
+        writer = self.trainparser.ExcelBatchWriter(self.output)
+        writer.add_sheet(pd.DataFrame({"LapNumber": [1, 2], "Pace": [5.5, float("nan")]}), "2024-01-01_summary")
+        writer.save()
+
+        ws = load_workbook(self.output)["2024-01-01_summary"]
+        self.assertEqual([list(r) for r in ws.iter_rows(values_only=True)],
+                         [["LapNumber", "Pace"], [1, 5.5], [2, None]])
+
+    def test_replaces_sheets_and_keeps_others(self):
+        """Test existing sheets are kept in order and same-named sheets are replaced case-insensitively"""
+        first = self.trainparser.ExcelBatchWriter(self.output)
+        first.add_sheet(pd.DataFrame({"a": [1]}), "2024-01-01_summary")
+        first.add_sheet(pd.DataFrame({"a": [2]}), "2024-01-02_summary")
+        first.save()
+
+        second = self.trainparser.ExcelBatchWriter(self.output)
+        second.add_sheet(pd.DataFrame({"a": [3]}), "2024-01-01_SUMMARY")
+        second.add_sheet(pd.DataFrame({"a": [4]}), "2024-01-03_summary")
+        second.save()
+
+        book = load_workbook(self.output)
+        self.assertEqual(book.sheetnames, ["2024-01-02_summary", "2024-01-01_SUMMARY", "2024-01-03_summary"])
+        self.assertEqual(book["2024-01-02_summary"]["A2"].value, 2)
+        self.assertEqual(book["2024-01-01_SUMMARY"]["A2"].value, 3)
+
+    def test_duplicate_sheet_in_batch_keeps_last(self):
+        """Test adding the same sheet twice in one batch keeps the last one"""
+        writer = self.trainparser.ExcelBatchWriter(self.output)
+        writer.add_sheet(pd.DataFrame({"a": [1]}), "2024-01-01_detail")
+        writer.add_sheet(pd.DataFrame({"a": [2]}), "2024-01-01_detail")
+        writer.save()
+
+        book = load_workbook(self.output)
+        self.assertEqual(book.sheetnames, ["2024-01-01_detail"])
+        self.assertEqual(book["2024-01-01_detail"]["A2"].value, 2)
+
+    def test_saves_once_and_noop_when_empty(self):
+        """Test the workbook is saved once per batch and untouched when nothing was added"""
+        self.trainparser.ExcelBatchWriter(self.output).save()
+        self.assertFalse(os.path.exists(self.output))
+
+        writer = self.trainparser.ExcelBatchWriter(self.output)
+        for day in range(1, 4):
+            writer.add_sheet(pd.DataFrame({"a": [day]}), f"2024-01-0{day}_summary")
+        with patch.object(self.trainparser.Workbook, 'save', autospec=True,
+                          side_effect=self.trainparser.Workbook.save) as mock_save:
+            writer.save()
+        self.assertEqual(mock_save.call_count, 1)
+
+    def test_invalid_output_path(self):
+        """Test unsafe output paths are rejected"""
+        with patch.object(self.trainparser, '_validate_safe_path', return_value=False):
+            with self.assertRaises(ValueError):
+                self.trainparser.ExcelBatchWriter("/invalid/path.xlsx")
+
+    @unittest.skipIf(os.name == "nt", "POSIX file modes")
+    def test_saved_workbook_keeps_file_mode(self):
+        """Test a new workbook gets the umask default and a rewritten one keeps its mode, not mkstemp's 0600"""
+        umask = os.umask(0o022)
+        try:
+            writer = self.trainparser.ExcelBatchWriter(self.output)
+            writer.add_sheet(pd.DataFrame({"a": [1]}), "2024-01-01_summary")
+            writer.save()
+            self.assertEqual(os.stat(self.output).st_mode & 0o777, 0o644)
+
+            os.chmod(self.output, 0o640)
+            writer = self.trainparser.ExcelBatchWriter(self.output)
+            writer.add_sheet(pd.DataFrame({"a": [2]}), "2024-01-02_summary")
+            writer.save()
+            self.assertEqual(os.stat(self.output).st_mode & 0o777, 0o640)
+        finally:
+            os.umask(umask)
+
+    def test_save_error_does_not_hide_ingest_failure(self):
+        """Test a failing save after a failed ingest surfaces the ingest error and skips the manifest"""
+        args = MagicMock(output=self.output, format="excel", workers=1, stats=False)
+        manifest = MagicMock()
+        with patch.object(self.trainparser, '_process_files_sequential', side_effect=RuntimeError("parse failed")), \
+             patch.object(self.trainparser.ExcelBatchWriter, 'save', side_effect=OSError("disk full")) as mock_save:
+            with self.assertRaisesRegex(RuntimeError, "parse failed"):
+                self.trainparser._ingest_files(["a.tcx"], args, manifest=manifest)
+        mock_save.assert_called_once()
+        manifest.save.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import io
+import pstats
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+
+# Add src directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingest_stats import format_stats_report, profiled, peak_rss_bytes
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'samples')
+SAMPLE_FILE = os.path.join(SAMPLES_DIR, 'RunnerUp_2025-08-05-08-24-01_Running.tcx')
+
+class TestIngestStats(unittest.TestCase):
+    def setUp(self):
+        # Mock logging_config before importing trainparser
+        with patch.dict('sys.modules', {'logging_config': MagicMock()}):
+            from src import trainparser
+        self.trainparser = trainparser
+
+    def test_write_parsed_times_each_stage(self):
+        """Test the writer stage reports Excel and MongoDB time separately within its total"""
+        parsed = self.trainparser.parse_tcx(SAMPLE_FILE)
+        args = MagicMock(mode="both", format="excel", output="out.xlsx", mongo_batch_size=1000, mongo_layout="rows")
+        with patch.object(self.trainparser, 'write_to_excel'), \
+             patch.object(self.trainparser, '_push_parsed_to_mongo'), \
+             patch('builtins.print'):
+            result = self.trainparser.write_parsed(SAMPLE_FILE, parsed, args, MagicMock(), parse_s=0.5)
+
+        self.assertEqual(result.trackpoints, len(parsed.detailed))
+        self.assertEqual(result.parse_s, 0.5)
+        self.assertEqual(result.parquet_s, 0.0)
+        self.assertGreater(result.excel_s, 0.0)
+        self.assertGreater(result.mongo_s, 0.0)
+        self.assertLessEqual(result.excel_s + result.mongo_s, result.write_s)
+
+    def test_stats_report_rates_and_totals(self):
+        """Test the --stats report lists each file with its rates and a wall-clock total"""
+        results = [
+            self.trainparser.IngestResult("/data/a.tcx", 2_000_000, 4000, 1.0, 1.0, 0.5, 0.0, 0.5),
+            self.trainparser.IngestResult("/data/b.tcx", 1_000_000, 2000, 0.5, 0.5, 0.25, 0.0, 0.25),
+        ]
+        lines = format_stats_report(results, 2.0, excel_save_s=0.3, workers=2)
+
+        self.assertTrue(lines[2].startswith("a.tcx"))
+        self.assertIn(" 2,000 ", lines[2])  # 4000 trackpoints in 2 s
+        total = lines[4].split()
+        self.assertEqual(total[5:9], ["6000", "3.00", "1.500", "0.750"])
+        self.assertEqual(total[-2:], ["3,000", "1.50"])
+        self.assertEqual(lines[5], "Excel workbook save: 0.300s")
+        self.assertIn("largest parse worker", lines[6])
+        if peak_rss_bytes() is not None:
+            self.assertGreater(peak_rss_bytes(), 0)
+
+    def test_profile_writes_stats_and_memory_snapshot(self):
+        """Test --profile output loads with pstats and --profile-memory dumps a tracemalloc snapshot"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "run.prof")
+            # pstats writes with print(file=...), so stdout is redirected rather than print patched
+            with redirect_stdout(io.StringIO()):
+                with profiled(path, trace_memory=True):
+                    self.trainparser.parse_tcx(SAMPLE_FILE)
+
+            stats = pstats.Stats(path)
+            self.assertTrue(any(func[2] == "parse_tcx" for func in stats.stats))
+            with open(path + ".txt") as f:
+                self.assertIn("cumulative", f.read())
+            self.assertGreater(len(tracemalloc.Snapshot.load(path + ".tracemalloc").traces), 0)
+            self.assertFalse(tracemalloc.is_tracing())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+from unittest.mock import MagicMock
+import importlib.util
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mongo_indexes import INDEXES, WEBAPP_QUERIES, ensure_indexes, explain_webapp_queries, _plan_stages
+
+WEBAPP_CONST = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'webapp', 'const.py')
+
+def _explain(plan, keys=0, docs=0):
+    return {
+        "queryPlanner": {"winningPlan": plan},
+        "executionStats": {"totalKeysExamined": keys, "totalDocsExamined": docs, "nReturned": docs,
+                           "executionTimeMillis": 1},
+    }
+
+class TestMongoIndexes(unittest.TestCase):
+    def test_ensure_indexes_creates_named_indexes(self):
+        """Test every configured index is created by name on its collection"""
+        db = {name: MagicMock() for name in INDEXES}
+        ensure_indexes(db)
+        db["detailed"].create_index.assert_any_call(
+            [("_source_file", 1), ("LapNumber", 1), ("Time", 1)], name="source_lap_time")
+        db["summary"].create_index.assert_any_call([("_source_file", 1), ("LapNumber", 1)], name="source_lap")
+
+    def test_ensure_indexes_survives_driver_errors(self):
+        """Test any pymongo error on one index is logged and the remaining indexes are still created"""
+        from pymongo.errors import AutoReconnect, OperationFailure
+        db = {name: MagicMock() for name in INDEXES}
+        db["summary"].create_index.side_effect = [OperationFailure("IndexOptionsConflict"), "lap_start_time"]
+        db["detailed"].create_index.side_effect = [AutoReconnect("connection reset"), "time"]
+
+        created = ensure_indexes(db)
+
+        self.assertIn("lap_start_time", created)
+        self.assertIn("time", created)
+        self.assertEqual(db["runs"].create_index.call_count, len(INDEXES["runs"]))
+
+    def test_indexes_match_webapp(self):
+        """Test the CLI and the webapp bootstrap the same index names and keys"""
+        spec = importlib.util.spec_from_file_location("webapp_const", WEBAPP_CONST)
+        const = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(const)
+        self.assertEqual(const.MONGO_INDEXES, INDEXES)
+
+    def test_plan_stages_classic_and_sbe(self):
+        """Test winning plans are flattened for both classic and slot-based explain output"""
+        plan = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "time"}}
+        self.assertEqual(_plan_stages(plan), ["FETCH", "IXSCAN(time)"])
+        self.assertEqual(_plan_stages({"queryPlan": plan, "slotBasedPlan": {}}), ["FETCH", "IXSCAN(time)"])
+        self.assertEqual(_plan_stages(None), [])
+
+    def test_explain_flags_unindexed_sort(self):
+        """Test a sorted query answered by COLLSCAN + SORT is reported as not ok"""
+        db = {collection: MagicMock() for _, collection, _, _ in WEBAPP_QUERIES}
+        db["summary"].find_one.return_value = {"_source_file": "run.tcx"}
+        cursor = db["detailed"].find.return_value.sort.return_value
+        cursor.explain.return_value = _explain({"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}, docs=100)
+        db["summary"].find.return_value.explain.return_value = _explain({"stage": "COLLSCAN"}, docs=5)
+        db["detailed_packed"].find.return_value.sort.return_value.explain.return_value = _explain(
+            {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "source_lap"}}, keys=3, docs=3)
+        db["summary"].find.return_value.sort.return_value.explain.return_value = _explain(
+            {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "source_lap"}}, keys=5, docs=5)
+
+        reports = {r["query"]: r for r in explain_webapp_queries(db)}
+        self.assertTrue(reports["summary: all laps"]["ok"])
+        self.assertTrue(reports["summary: one run's laps"]["ok"])
+        self.assertTrue(reports["detailed_packed: all packed laps"]["ok"])
+        self.assertFalse(reports["detailed: all trackpoints by run"]["ok"])
+        self.assertEqual(reports["detailed: all trackpoints by run"]["plan"], "SORT <- COLLSCAN")
+        db["detailed"].find.assert_any_call({"_source_file": "run.tcx"}, {"_id": 0})
+
+if __name__ == '__main__':
+    unittest.main()
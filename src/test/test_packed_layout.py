@@ -0,0 +1,80 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import zlib
+import numpy as np
+import pandas as pd
+
+# Add src directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from packed_layout import pack_lap_documents, PACKED_FORMAT
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'samples')
+SAMPLE_FILE = os.path.join(SAMPLES_DIR, 'RunnerUp_2025-08-05-08-24-01_Running.tcx')
+
+class TestPackedLayout(unittest.TestCase):
+    def setUp(self):
+        # Mock logging_config before importing trainparser
+        with patch.dict('sys.modules', {'logging_config': MagicMock()}):
+            from src import trainparser
+        self.trainparser = trainparser
+        self.detailed = trainparser.parse_tcx(SAMPLE_FILE, summary=False).detailed
+
+    def test_one_document_per_lap_round_trips(self):
+        """Test each lap packs into one document whose blocks decode to the original columns"""
+        docs = list(pack_lap_documents(self.detailed, "run.tcx"))
+        self.assertEqual(len(docs), self.detailed["LapNumber"].nunique())
+        self.assertEqual(sum(d["count"] for d in docs), len(self.detailed))
+
+        first = docs[0]
+        lap = self.detailed[self.detailed["LapNumber"] == first["LapNumber"]]
+        self.assertEqual(first["format"], PACKED_FORMAT)
+        self.assertEqual(first["_source_file"], "run.tcx")
+        self.assertEqual(first["LapStartTime"], lap["LapStartTime"].iloc[0])
+        self.assertEqual(zlib.decompress(first["points"]["Time"]).decode("utf-8").split("\n"), lap["Time"].tolist())
+        altitude = np.frombuffer(zlib.decompress(first["points"]["Altitude_m"]), dtype="<f8")
+        np.testing.assert_array_equal(altitude, lap["Altitude_m"].to_numpy())
+
+    def test_missing_values_are_kept(self):
+        """Test missing times become empty strings and missing numbers NaN"""
+        df = pd.DataFrame({"LapNumber": [1, 1], "LapStartTime": ["s", "s"], "LapTotalTime_s": [1.0, 1.0],
+                           "LapDistance_m": [2.0, 2.0], "Pace_min_per_km": [None, None], "Time": ["t1", None],
+                           "Latitude": [1.0, np.nan], "Longitude": [1.0, 2.0], "Altitude_m": [1.0, 2.0],
+                           "Distance_m": [1.0, 2.0]})
+        doc = next(pack_lap_documents(df, "run.tcx"))
+        self.assertEqual(zlib.decompress(doc["points"]["Time"]), b"t1\n")
+        self.assertTrue(np.isnan(np.frombuffer(zlib.decompress(doc["points"]["Latitude"]), dtype="<f8")[1]))
+        self.assertIsNone(doc["Pace_min_per_km"])
+
+    def test_push_packed_upserts_laps_and_drops_stale(self):
+        """Test packed upserts are keyed by source + lap and laps no longer in the file are removed"""
+        collection = MagicMock()
+        collection.bulk_write.return_value = MagicMock(upserted_count=5, matched_count=0, modified_count=0)
+        with patch('pymongo.ReplaceOne') as mock_replace_one:
+            stats = self.trainparser.push_packed_to_mongo(self.detailed, collection, "run.tcx")
+
+        ids = [c.args[0]["_id"] for c in mock_replace_one.call_args_list]
+        self.assertEqual(ids[0], self.trainparser._record_id(["run.tcx", 1]))
+        self.assertEqual(len(set(ids)), self.detailed["LapNumber"].nunique())
+        self.assertEqual(stats.inserted, 5)
+        collection.delete_many.assert_called_once_with({"_source_file": "run.tcx", "_id": {"$nin": ids}})
+
+    def test_migrate_detailed_to_packed(self):
+        """Test migration packs each source file and then removes its trackpoint documents"""
+        rows = self.detailed.assign(_source_file="run.tcx").to_dict(orient="records")
+        detailed, packed = MagicMock(), MagicMock()
+        detailed.distinct.return_value = ["run.tcx"]
+        detailed.find.return_value.sort.return_value = rows
+        db = {"detailed": detailed, "detailed_packed": packed}
+
+        with patch('pymongo.ReplaceOne'):
+            migrated = self.trainparser.migrate_detailed_to_packed(db)
+
+        self.assertEqual(migrated, 1)
+        self.assertEqual(len(packed.bulk_write.call_args.args[0]), self.detailed["LapNumber"].nunique())
+        detailed.delete_many.assert_called_once_with({"_source_file": "run.tcx"})
+
+if __name__ == '__main__':
+    unittest.main()
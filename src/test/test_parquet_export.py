@@ -0,0 +1,72 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import tempfile
+import pandas as pd
+
+# Add src directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'samples')
+SAMPLE_FILE = os.path.join(SAMPLES_DIR, 'RunnerUp_2025-08-05-08-24-01_Running.tcx')
+
+@unittest.skipUnless(HAS_PYARROW, "pyarrow is not installed")
+class TestParquetExport(unittest.TestCase):
+    def setUp(self):
+        # Mock logging_config before importing trainparser
+        with patch.dict('sys.modules', {'logging_config': MagicMock()}):
+            from src import trainparser
+        self.trainparser = trainparser
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_write_to_parquet_partitions_by_date(self):
+        """Test summary and detailed frames land in date partitions with typed columns"""
+        parsed = self.trainparser.parse_tcx(SAMPLE_FILE)
+        self.trainparser.write_to_parquet(parsed, SAMPLE_FILE, self.tmp.name)
+
+        path = os.path.join(self.tmp.name, "detailed", "date=2025-08-05", "RunnerUp_2025-08-05-08-24-01_Running.parquet")
+        self.assertTrue(os.path.exists(path))
+        detailed = pd.read_parquet(path)
+        self.assertEqual(len(detailed), len(parsed.detailed))
+        self.assertEqual(str(detailed["Time"].dtype), "datetime64[ns, UTC]")
+        self.assertEqual(detailed["Latitude"].dtype, "float64")
+        self.assertEqual(detailed["LapNumber"].dtype, "int64")
+        self.assertEqual(detailed["_source_file"].iloc[0], "RunnerUp_2025-08-05-08-24-01_Running.tcx")
+
+        summary = pd.read_parquet(os.path.join(self.tmp.name, "summary"))
+        self.assertEqual(len(summary), 5)
+        self.assertEqual(str(summary["date"].iloc[0]), "2025-08-05")
+
+    def test_write_to_parquet_replaces_stale_partition(self):
+        """Test re-ingesting a source whose run date changed leaves a single copy"""
+        parsed = self.trainparser.parse_tcx(SAMPLE_FILE, detailed=False)
+        self.trainparser.write_to_parquet(parsed._replace(date="2025-01-01"), SAMPLE_FILE, self.tmp.name)
+        self.trainparser.write_to_parquet(parsed, SAMPLE_FILE, self.tmp.name)
+
+        summary_dir = os.path.join(self.tmp.name, "summary")
+        self.assertEqual(sorted(os.listdir(summary_dir)), ["date=2025-01-01", "date=2025-08-05"])
+        self.assertEqual(os.listdir(os.path.join(summary_dir, "date=2025-01-01")), [])
+        self.assertEqual(len(pd.read_parquet(summary_dir)), 5)
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, "detailed")))
+
+    def test_write_parsed_parquet_only_skips_excel(self):
+        """Test --format parquet writes no Excel sheets"""
+        parsed = self.trainparser.parse_tcx(SAMPLE_FILE, detailed=False)
+        args = MagicMock(format="parquet", parquet_dir=self.tmp.name, output=os.path.join(self.tmp.name, "out.xlsx"))
+        excel_writer = MagicMock()
+        self.trainparser.write_parsed(SAMPLE_FILE, parsed, args, excel_writer=excel_writer)
+        excel_writer.add_sheet.assert_not_called()
+        self.assertTrue(os.path.isdir(os.path.join(self.tmp.name, "summary", "date=2025-08-05")))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import tempfile
+import pandas as pd
+
+# Add src directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'samples')
+SAMPLE_FILE = os.path.join(SAMPLES_DIR, 'RunnerUp_2025-08-05-08-24-01_Running.tcx')
+
+class TestParsing(unittest.TestCase):
+    def setUp(self):
+        # Mock logging_config before importing trainparser
+        with patch.dict('sys.modules', {'logging_config': MagicMock()}):
+            from src import trainparser
+        self.trainparser = trainparser
+
+    def test_parse_tcx_single_parse(self):
+        """Test parse_tcx reads the XML once for date, summary and detail"""
+        with patch.object(self.trainparser.ET, 'parse', wraps=self.trainparser.ET.parse) as mock_parse:
+            parsed = self.trainparser.parse_tcx(SAMPLE_FILE)
+        self.assertEqual(mock_parse.call_count, 1)
+        self.assertEqual(parsed.date, "2025-08-05")
+        self.assertEqual(len(parsed.summary), 5)
+        self.assertEqual(len(parsed.detailed), 2423)
+
+    def test_parse_tcx_matches_individual_parsers(self):
+        """Test parse_tcx output matches the standalone date/summary parsers"""
+        parsed = self.trainparser.parse_tcx(SAMPLE_FILE)
+        self.assertEqual(parsed.date, self.trainparser.get_first_lap_date(SAMPLE_FILE))
+        pd.testing.assert_frame_equal(parsed.summary, self.trainparser.parse_tcx_summary(SAMPLE_FILE))
+
+        # Lap columns on detail rows come from the same lap table as the summary
+        lap_columns = list(parsed.summary.columns)
+        first_rows = parsed.detailed.groupby("LapNumber", as_index=False).first()[lap_columns]
+        pd.testing.assert_frame_equal(first_rows, parsed.summary)
+
+    def test_parse_tcx_skips_unrequested_frames(self):
+        """Test parse_tcx only materializes the requested frames"""
+        parsed = self.trainparser.parse_tcx(SAMPLE_FILE, summary=True, detailed=False)
+        self.assertIsNotNone(parsed.summary)
+        self.assertIsNone(parsed.detailed)
+
+        parsed = self.trainparser.parse_tcx(SAMPLE_FILE, summary=False, detailed=True)
+        self.assertIsNone(parsed.summary)
+        self.assertEqual(list(parsed.detailed.columns[:5]),
+                         ["LapNumber", "LapStartTime", "LapTotalTime_s", "LapDistance_m", "Pace_min_per_km"])
+
+    def test_parse_tcx_stream_matches_tree(self):
+        """Test the streaming engine produces the same frames as the tree engine"""
+        tree = self.trainparser.parse_tcx(SAMPLE_FILE)
+        stream = self.trainparser.parse_tcx_stream(SAMPLE_FILE)
+        self.assertEqual(stream.date, tree.date)
+        pd.testing.assert_frame_equal(stream.summary, tree.summary)
+        pd.testing.assert_frame_equal(stream.detailed, tree.detailed)
+
+    def test_parse_tcx_stream_detaches_consumed_elements(self):
+        """Test consumed Trackpoint and Lap elements are removed from the tree, not just emptied"""
+        roots = []
+        iterparse = self.trainparser.ET.iterparse
+
+        def recording_iterparse(*args, **kwargs):
+            for event, elem in iterparse(*args, **kwargs):
+                if not roots:
+                    roots.append(elem)
+                yield event, elem
+
+        with patch.object(self.trainparser.ET, 'iterparse', side_effect=recording_iterparse):
+            parsed = self.trainparser.parse_tcx_stream(SAMPLE_FILE)
+        self.assertEqual(len(parsed.detailed), 2423)
+        remaining = {elem.tag.rsplit("}", 1)[-1] for elem in roots[0].iter()}
+        self.assertNotIn("Trackpoint", remaining)
+        self.assertNotIn("Lap", remaining)
+
+    def test_parse_tcx_stream_invalid_xml(self):
+        """Test the streaming engine reports malformed XML as ValueError"""
+        with tempfile.NamedTemporaryFile('w', suffix='.tcx', delete=False) as f:
+            f.write('<TrainingCenterDatabase><Activities>')
+        try:
+            with self.assertRaises(ValueError):
+                self.trainparser.parse_tcx_stream(f.name)
+        finally:
+            os.unlink(f.name)
+
+    def test_parse_tcx_stream_forbids_entities(self):
+        """Test the streaming engine keeps the defusedxml entity protections"""
+        with tempfile.NamedTemporaryFile('w', suffix='.tcx', delete=False) as f:
+            f.write('<?xml version="1.0"?><!DOCTYPE r [<!ENTITY e "boom">]>'
+                    '<TrainingCenterDatabase>&e;</TrainingCenterDatabase>')
+        try:
+            with self.assertRaises(self.trainparser.ET.EntitiesForbidden):
+                self.trainparser.parse_tcx_stream(f.name)
+        finally:
+            os.unlink(f.name)
+
+    def test_parse_tcx_detailed_column_dtypes(self):
+        """Test the columnar builder yields typed numeric columns"""
+        detailed = self.trainparser.parse_tcx(SAMPLE_FILE, summary=False).detailed
+        self.assertEqual(list(detailed.columns),
+                         self.trainparser.LAP_COLUMNS + self.trainparser.TRACKPOINT_COLUMNS)
+        for col in ["Latitude", "Longitude", "Altitude_m", "Distance_m", "LapTotalTime_s", "LapDistance_m"]:
+            self.assertEqual(detailed[col].dtype, "float64", col)
+        self.assertEqual(detailed["LapNumber"].dtype, "int64")
+        self.assertEqual(detailed["Time"].iloc[0], "2025-08-05T06:24:02Z")
+
+    def test_trackpoint_columns_empty(self):
+        """Test an empty accumulator builds an empty frame with the detailed layout"""
+        frame = self.trainparser._TrackpointColumns().to_frame(pd.DataFrame())
+        self.assertEqual(len(frame), 0)
+        self.assertEqual(list(frame.columns),
+                         self.trainparser.LAP_COLUMNS + self.trainparser.TRACKPOINT_COLUMNS)
+
+    def test_process_files_parallel_writes_in_input_order(self):
+        """Test the pool hands results to the single writer stage in input order"""
+        from concurrent.futures import ThreadPoolExecutor
+        from openpyxl import load_workbook
+        files = [os.path.join(SAMPLES_DIR, name) for name in sorted(os.listdir(SAMPLES_DIR))]
+        with tempfile.TemporaryDirectory() as tmp:
+            args = MagicMock(mode="summary", engine="tree", workers=2, output=os.path.join(tmp, "out.xlsx"))
+            # Threads stand in for processes so the test does not depend on pickling the module
+            with patch.object(self.trainparser, 'ProcessPoolExecutor', ThreadPoolExecutor):
+                results = self.trainparser._process_files_parallel(files, args)
+            self.assertEqual([r.file for r in results], files)
+            self.assertEqual(load_workbook(args.output).sheetnames,
+                             ["2025-08-05_summary", "2025-08-09_summary"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import unittest
+import sys
+import os
+
+# Add src directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from personal_records import RECORDS_COLLECTION, update_records, remove_source_records, rebuild_records
+from run_summary import RUNS_COLLECTION
+
+
+class FakeCollection:
+    """Just enough of a pymongo collection for the records code: _id lookups, $ne filters, sort + limit"""
+
+    def __init__(self):
+        self.docs = {}
+        self.queries = 0
+
+    def find_one(self, query):
+        doc = self.docs.get(query["_id"])
+        return dict(doc) if doc else None
+
+    def replace_one(self, query, doc, upsert=False):
+        self.docs[query["_id"]] = dict(doc)
+
+    def delete_one(self, query):
+        self.docs.pop(query["_id"], None)
+
+    def find(self, query=None, projection=None):
+        self.queries += 1
+        query = query or {}
+        docs = []
+        for doc in self.docs.values():
+            if all(self._matches(doc, field, cond) for field, cond in query.items()):
+                docs.append(doc)
+        return FakeCursor(docs)
+
+    @staticmethod
+    def _value(doc, field):
+        for part in field.split("."):
+            doc = doc.get(part) if isinstance(doc, dict) else None
+        return doc
+
+    def _matches(self, doc, field, cond):
+        value = self._value(doc, field)
+        if isinstance(cond, dict):
+            return value != cond["$ne"]
+        return value == cond
+
+
+class FakeCursor(list):
+    def sort(self, field, direction):
+        return FakeCursor(sorted(self, key=lambda d: FakeCollection._value(d, field), reverse=direction < 0))
+
+    def limit(self, n):
+        return FakeCursor(self[:n])
+
+
+def _run(source, lap_times, distance):
+    laps = [{"LapNumber": i + 1, "LapTotalTime_s": t, "LapDistance_m": 1000.0} for i, t in enumerate(lap_times)]
+    return {
+        "_source_file": source, "date": "2025-01-01", "total_distance_m": distance,
+        "total_time_s": float(sum(lap_times)),
+        "fastest_lap": min(laps, key=lambda lap: lap["LapTotalTime_s"], default=None),
+        "slowest_lap": max(laps, key=lambda lap: lap["LapTotalTime_s"], default=None),
+    }
+
+
+class TestPersonalRecords(unittest.TestCase):
+    def setUp(self):
+        self.db = {RUNS_COLLECTION: FakeCollection(), RECORDS_COLLECTION: FakeCollection()}
+
+    def ingest(self, run):
+        self.db[RUNS_COLLECTION].docs[run["_source_file"]] = run
+        update_records(self.db, run)
+
+    def holders(self):
+        return {name: (doc["_source_file"], doc["value"]) for name, doc in self.db[RECORDS_COLLECTION].docs.items()}
+
+    def assert_matches_full_rebuild(self):
+        incremental = self.holders()
+        rebuild_records(self.db)
+        self.assertEqual(incremental, self.holders())
+
+    def test_new_runs_only_compare_with_current_holder(self):
+        """Test ingesting runs updates records without querying the runs collection"""
+        self.ingest(_run("a.tcx", [300.0, 320.0], 2000.0))
+        self.ingest(_run("b.tcx", [290.0, 310.0, 305.0], 3000.0))
+        self.ingest(_run("c.tcx", [330.0], 1000.0))
+
+        self.assertEqual(self.holders(), {
+            "fastest_lap": ("b.tcx", 290.0), "slowest_lap": ("c.tcx", 330.0),
+            "longest_distance": ("b.tcx", 3000.0), "longest_time": ("b.tcx", 905.0),
+        })
+        self.assertEqual(self.db[RUNS_COLLECTION].queries, 0)
+        self.assert_matches_full_rebuild()
+
+    def test_reingested_holder_with_worse_value_is_recomputed(self):
+        """Test a record holder re-ingested with a worse value hands the record to the next best run"""
+        self.ingest(_run("a.tcx", [300.0, 320.0], 2000.0))
+        self.ingest(_run("b.tcx", [290.0, 310.0], 3000.0))
+        self.ingest(_run("b.tcx", [305.0], 1000.0))
+
+        self.assertEqual(self.holders()["fastest_lap"], ("a.tcx", 300.0))
+        self.assertEqual(self.holders()["longest_distance"], ("a.tcx", 2000.0))
+        self.assertEqual(self.holders()["slowest_lap"], ("a.tcx", 320.0))
+        self.assert_matches_full_rebuild()
+
+    def test_deleted_source_releases_its_records(self):
+        """Test deleting a run recomputes only the records it held, and drops records nobody holds"""
+        self.ingest(_run("a.tcx", [300.0], 1000.0))
+        self.ingest(_run("b.tcx", [], 500.0))
+
+        del self.db[RUNS_COLLECTION].docs["a.tcx"]
+        remove_source_records(self.db, "a.tcx")
+
+        self.assertEqual(self.holders(), {"longest_distance": ("b.tcx", 500.0), "longest_time": ("b.tcx", 0.0)})
+        self.assert_matches_full_rebuild()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# Add src directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from run_summary import build_run_document, RUNS_COLLECTION, RUNS_FORMAT
+from personal_records import RECORDS_COLLECTION
+from dataset_version import DATASET_VERSION_COLLECTION
+from packed_layout import pack_lap_documents
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'samples')
+SAMPLE_FILE = os.path.join(SAMPLES_DIR, 'RunnerUp_2025-08-05-08-24-01_Running.tcx')
+
+class TestRunSummary(unittest.TestCase):
+    def setUp(self):
+        # Mock logging_config before importing trainparser
+        with patch.dict('sys.modules', {'logging_config': MagicMock()}):
+            from src import trainparser
+        self.trainparser = trainparser
+        self.parsed = trainparser.parse_tcx(SAMPLE_FILE)
+
+    def test_document_totals_and_lap_records(self):
+        """Test the run document carries totals, lap counts and the fastest/slowest valid lap"""
+        summary, detailed = self.parsed.summary, self.parsed.detailed
+        doc = build_run_document(summary, detailed, "run.tcx", self.parsed.date)
+
+        self.assertEqual(doc["format"], RUNS_FORMAT)
+        self.assertEqual(doc["date"], "2025-08-05")
+        self.assertEqual(doc["lap_count"], len(summary))
+        self.assertAlmostEqual(doc["total_distance_m"], summary["LapDistance_m"].sum())
+        self.assertAlmostEqual(doc["total_time_s"], summary["LapTotalTime_s"].sum())
+        valid = summary[summary["LapDistance_m"] >= 990]
+        self.assertEqual(doc["valid_lap_count"], len(valid))
+        self.assertEqual(doc["fastest_lap"]["LapTotalTime_s"], valid["LapTotalTime_s"].min())
+        self.assertEqual(doc["slowest_lap"]["LapTotalTime_s"], valid["LapTotalTime_s"].max())
+        self.assertIsInstance(doc["laps"][0]["LapNumber"], int)
+
+    def test_elevation_from_detailed_only(self):
+        """Test lap deltas and elevation gain skip missing altitudes and are omitted without trackpoints"""
+        detailed = pd.DataFrame({
+            "LapNumber": [1, 1, 1, 2, 2], "LapStartTime": ["t"] * 5, "LapTotalTime_s": [300.0] * 5,
+            "LapDistance_m": [1000.0] * 5, "Pace_min_per_km": [5.0] * 5,
+            "Altitude_m": [10.0, np.nan, 14.0, 12.0, 15.5],
+        })
+        doc = build_run_document(None, detailed, "run.tcx", "2025-08-05")
+        self.assertEqual(doc["lap_count"], 2)
+        self.assertEqual(doc["lap_altitude_deltas"], {"1": 4.0, "2": 3.5})
+        self.assertEqual(doc["elevation_gain_m"], 7.5)
+
+        doc = build_run_document(self.parsed.summary, None, "run.tcx", "2025-08-05")
+        self.assertNotIn("elevation_gain_m", doc)
+        self.assertNotIn("lap_altitude_deltas", doc)
+
+    def test_ingest_upserts_run_document(self):
+        """Test pushing a parsed file to MongoDB upserts its run document with $set"""
+        db = {name: MagicMock() for name in ("summary", "detailed", "detailed_packed", RUNS_COLLECTION, RECORDS_COLLECTION,
+                                             DATASET_VERSION_COLLECTION)}
+        db[RECORDS_COLLECTION].find_one.return_value = None
+        client = MagicMock()
+        client.__getitem__.return_value = db
+        frames = [("summary", self.parsed.summary), ("detailed", self.parsed.detailed)]
+        with patch.object(self.trainparser, 'push_to_mongo', return_value=self.trainparser.MongoWriteStats(0, 0, 0)):
+            self.trainparser._push_parsed_to_mongo(SAMPLE_FILE, frames, client, run_date=self.parsed.date)
+
+        query, update = db[RUNS_COLLECTION].update_one.call_args.args
+        self.assertEqual(query, {"_id": "RunnerUp_2025-08-05-08-24-01_Running.tcx"})
+        self.assertEqual(update["$set"]["lap_count"], len(self.parsed.summary))
+        self.assertIn("elevation_gain_m", update["$set"])
+        self.assertTrue(db[RUNS_COLLECTION].update_one.call_args.kwargs["upsert"])
+        self.assertEqual(db[RECORDS_COLLECTION].replace_one.call_count, 4)
+        version_update = db[DATASET_VERSION_COLLECTION].update_one.call_args.args[1]
+        self.assertEqual(version_update["$inc"], {"version": 1})
+
+    def test_rebuild_from_packed_layout(self):
+        """Test --rebuild-runs recomputes a run stored in the packed layout"""
+        source = "run.tcx"
+        detailed = self.parsed.detailed.assign(_source_file=source)
+        db = {name: MagicMock() for name in ("summary", "detailed", "detailed_packed", RUNS_COLLECTION, RECORDS_COLLECTION)}
+        db[RECORDS_COLLECTION].find_one.return_value = None
+        db["summary"].distinct.return_value = [source]
+        db["detailed"].distinct.return_value = []
+        db["detailed_packed"].distinct.return_value = [source]
+        db["summary"].find.return_value.sort.return_value = self.parsed.summary.to_dict(orient="records")
+        db["detailed"].find.return_value.sort.return_value = []
+        db["detailed_packed"].find.return_value.sort.return_value = list(pack_lap_documents(detailed, source))
+
+        self.assertEqual(self.trainparser.rebuild_run_summaries(db), 1)
+
+        rebuilt = db[RUNS_COLLECTION].update_one.call_args.args[1]["$set"]
+        expected = build_run_document(self.parsed.summary, self.parsed.detailed, source, self.parsed.date)
+        self.assertEqual(rebuilt["date"], "2025-08-05")
+        self.assertEqual(rebuilt["lap_altitude_deltas"], expected["lap_altitude_deltas"])
+        self.assertAlmostEqual(rebuilt["elevation_gain_m"], expected["elevation_gain_m"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,19 +3,60 @@ from defusedxml import ElementTree as ET
 import pandas as pd
 import os
 import logging
-from openpyxl import load_workbook
+from openpyxl import load_workbook, Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
 from pymongo import MongoClient
 from pymongo.errors import ServerSelectionTimeoutError
 from pathlib import Path
-from collections import namedtuple
+from collections import namedtuple, deque
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import math
+import tempfile
+import time
+import hashlib
+import json
+import numpy as np
 
 # Configure logging
 from logging_config import setup_logging
 logger = setup_logging()
 
+from ingest_manifest import (IngestManifest, JsonManifestStore, MongoManifestStore, MANIFEST_COLLECTION,
+                             DEFAULT_MANIFEST_FILENAME, excel_destination, parquet_destination, mongo_destination)
+from mongo_indexes import ensure_indexes, explain_webapp_queries
+from packed_layout import PACKED_COLLECTION, pack_lap_documents, unpack_lap_frame
+from run_summary import RUNS_COLLECTION, build_run_document
+from personal_records import RECORDS_COLLECTION, update_records, remove_source_records, rebuild_records
+from dataset_version import bump_dataset_version
+from atomic_write import replace_keeping_mode
+from ingest_stats import format_stats_report, profiled
+
 # Define namedtuple for lap data to avoid multiple return values
 LapData = namedtuple('LapData', ['start_time', 'total_time_s', 'distance_m', 'pace'])
 
+# Result of a single-pass TCX parse; summary/detailed are None when not requested
+ParsedTcx = namedtuple('ParsedTcx', ['date', 'summary', 'detailed'])
+
+# Column layout of the summary (lap) and detailed (lap + trackpoint) frames
+LAP_COLUMNS = ["LapNumber", "LapStartTime", "LapTotalTime_s", "LapDistance_m", "Pace_min_per_km"]
+TRACKPOINT_COLUMNS = ["Time", "Latitude", "Longitude", "Altitude_m", "Distance_m"]
+
+# MongoDB database used for all collections
+MONGO_DATABASE = "RunningTracker"
+
+# Per-file ingest timings reported by the CLI; write_s covers the excel/parquet/mongo stages
+IngestResult = namedtuple('IngestResult', ['file', 'size_bytes', 'trackpoints', 'parse_s', 'write_s',
+                                           'excel_s', 'parquet_s', 'mongo_s'], defaults=(0.0, 0.0, 0.0))
+
+# Upsert outcome counts returned by push_to_mongo
+MongoWriteStats = namedtuple('MongoWriteStats', ['inserted', 'updated', 'unchanged'])
+
+# Operations sent per MongoDB bulk_write call
+DEFAULT_MONGO_BATCH_SIZE = 1000
+
 
 
 def sanitize_for_log(value):
@@ -101,19 +142,13 @@ def _extract_lap_data(lap, ns):
     return LapData(lap_start, total_time_s, distance_m, pace)
 
 
-def _extract_trackpoint_data(tp, ns):
-    """Extract trackpoint-level data from XML trackpoint element"""
+def _extract_trackpoint_values(tp, ns):
+    """Extract (time, latitude, longitude, altitude, distance) from XML trackpoint element"""
     # Validate namespace to prevent injection
     if not isinstance(ns, dict) or "tcx" not in ns:
         raise ValueError("Invalid namespace provided")
 
-    data = {
-        "Time": None,
-        "Latitude": None,
-        "Longitude": None,
-        "Altitude_m": None,
-        "Distance_m": None,
-    }
+    time_value = latitude = longitude = altitude = distance = None
 
     # Extract time with validation
     time_elem = tp.find("tcx:Time", ns)
@@ -121,7 +156,7 @@ def _extract_trackpoint_data(tp, ns):
         # Validate text content to prevent injection
         text_content = time_elem.text
         if isinstance(text_content, str):
-            data["Time"] = text_content
+            time_value = text_content
 
     # Extract position (latitude/longitude) with validation
     pos_elem = tp.find("tcx:Position", ns)
@@ -129,63 +164,78 @@ def _extract_trackpoint_data(tp, ns):
         try:
             lat_elem = pos_elem.find("tcx:LatitudeDegrees", ns)
             lon_elem = pos_elem.find("tcx:LongitudeDegrees", ns)
-            data["Latitude"] = _extract_float_from_element(lat_elem)
-            data["Longitude"] = _extract_float_from_element(lon_elem)
+            latitude = _extract_float_from_element(lat_elem)
+            longitude = _extract_float_from_element(lon_elem)
         except (AttributeError, TypeError):
-            data["Latitude"] = data["Longitude"] = None
+            latitude = longitude = None
 
     # Extract altitude and distance with validation
     try:
         altitude_elem = tp.find("tcx:AltitudeMeters", ns)
         distance_elem = tp.find("tcx:DistanceMeters", ns)
-        data["Altitude_m"] = _extract_float_from_element(altitude_elem)
-        data["Distance_m"] = _extract_float_from_element(distance_elem)
+        altitude = _extract_float_from_element(altitude_elem)
+        distance = _extract_float_from_element(distance_elem)
     except (AttributeError, TypeError):
-        data["Altitude_m"] = data["Distance_m"] = None
+        altitude = distance = None
 
-    return data
+    return time_value, latitude, longitude, altitude, distance
 
 
-def parse_tcx_detailed(tcx_file):
-    try:
-        ns = {"tcx": "http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2"}
-        # Validate namespace
-        if not isinstance(ns, dict) or "tcx" not in ns:
-            raise ValueError("Invalid namespace configuration")
-        tree = ET.parse(tcx_file)
-        root = tree.getroot()
-        logger.info(f"Successfully parsed TCX file for detailed analysis: {sanitize_for_log(tcx_file)}")
-    except ET.ParseError as e:
-        logger.error(f"XML parsing error in {sanitize_for_log(tcx_file)}: {sanitize_for_log(e)}")
-        raise ValueError(f"Invalid XML file: {e}")
-    except FileNotFoundError as e:
-        logger.error(f"TCX file not found: {sanitize_for_log(tcx_file)}")
-        raise
-    except Exception as e:
-        logger.error(f"Unexpected error parsing {sanitize_for_log(tcx_file)}: {sanitize_for_log(e)}")
-        raise
+def _extract_trackpoint_data(tp, ns):
+    """Extract trackpoint-level data from XML trackpoint element"""
+    return dict(zip(TRACKPOINT_COLUMNS, _extract_trackpoint_values(tp, ns)))
 
-    rows = []
-    lap_counter = 0
 
-    for lap in root.findall(".//tcx:Lap", ns):
-        lap_counter += 1
-        lap_data = _extract_lap_data(lap, ns)
+def _nan_if_none(value):
+    return np.nan if value is None else value
 
-        for tp in lap.findall(".//tcx:Trackpoint", ns):
-            trackpoint_data = _extract_trackpoint_data(tp, ns)
 
-            row = {
-                "LapNumber": lap_counter,
-                "LapStartTime": lap_data.start_time,
-                "LapTotalTime_s": lap_data.total_time_s,
-                "LapDistance_m": lap_data.distance_m,
-                "Pace_min_per_km": lap_data.pace,
-                **trackpoint_data
-            }
-            rows.append(row)
+class _TrackpointColumns:
+    """
+    Columnar trackpoint accumulator.
+    Numeric fields go into typed float64 arrays and each point stores only its lap
+    index; lap fields are broadcast from the lap table when the frame is built.
+    """
 
-    return pd.DataFrame(rows)
+    def __init__(self):
+        self.lap_index = array('q')
+        self.time = []
+        self.latitude = array('d')
+        self.longitude = array('d')
+        self.altitude = array('d')
+        self.distance = array('d')
+
+    def append(self, lap_index, tp, ns):
+        time_value, latitude, longitude, altitude, distance = _extract_trackpoint_values(tp, ns)
+        self.lap_index.append(lap_index)
+        self.time.append(time_value)
+        self.latitude.append(_nan_if_none(latitude))
+        self.longitude.append(_nan_if_none(longitude))
+        self.altitude.append(_nan_if_none(altitude))
+        self.distance.append(_nan_if_none(distance))
+
+    def to_frame(self, lap_table):
+        """Build the detailed DataFrame, broadcasting lap_table rows by lap index"""
+        lap_index = np.frombuffer(self.lap_index, dtype=np.int64) if self.lap_index else np.empty(0, dtype=np.int64)
+        columns = {}
+        for col in LAP_COLUMNS:
+            lap_values = lap_table[col].to_numpy() if col in lap_table else np.empty(0, dtype=object)
+            columns[col] = lap_values.take(lap_index)
+        columns["Time"] = np.array(self.time, dtype=object)
+        for col, values in zip(TRACKPOINT_COLUMNS[1:], (self.latitude, self.longitude, self.altitude, self.distance)):
+            columns[col] = np.frombuffer(values, dtype=np.float64) if values else np.empty(0, dtype=np.float64)
+        return pd.DataFrame(columns)
+
+
+def _lap_columns(lap_number, lap_data):
+    """Build the lap-level columns shared by summary and detailed rows"""
+    return {
+        "LapNumber": lap_number,
+        "LapStartTime": lap_data.start_time,
+        "LapTotalTime_s": lap_data.total_time_s,
+        "LapDistance_m": lap_data.distance_m,
+        "Pace_min_per_km": lap_data.pace,
+    }
 
 
 def _parse_tcx_file(tcx_file, operation="analysis"):
@@ -221,33 +271,131 @@ def parse_tcx_summary(tcx_file):
     for lap in root.findall(".//tcx:Lap", ns):
         lap_counter += 1
         lap_data = _extract_lap_data(lap, ns)
-
-        rows.append({
-            "LapNumber": lap_counter,
-            "LapStartTime": lap_data.start_time,
-            "LapTotalTime_s": lap_data.total_time_s,
-            "LapDistance_m": lap_data.distance_m,
-            "Pace_min_per_km": lap_data.pace,
-        })
+        rows.append(_lap_columns(lap_counter, lap_data))
 
     return pd.DataFrame(rows)
 
 
+def parse_tcx_detailed(tcx_file):
+    return parse_tcx(tcx_file, summary=False, detailed=True).detailed
+
+
+def _date_from_first_lap(first_lap, tcx_file):
+    """Extract the run date (YYYY-MM-DD) from the first lap's StartTime attribute"""
+    if first_lap is not None and "StartTime" in first_lap.attrib:
+        start_time = first_lap.attrib["StartTime"]
+        # Safely split timestamp to extract date
+        if "T" in start_time:
+            date = start_time.split("T")[0]
+            logger.debug(f"Extracted date {sanitize_for_log(date)} from {sanitize_for_log(tcx_file)}")
+            return date
+        else:
+            logger.warning(f"Invalid timestamp format in {sanitize_for_log(tcx_file)}: {sanitize_for_log(start_time)}")
+    else:
+        logger.warning(f"No lap with StartTime found in {sanitize_for_log(tcx_file)}")
+
+    return "UnknownDate"
+
+
+def parse_tcx(tcx_file, summary=True, detailed=True):
+    """
+    Parse a TCX file once and build the run date plus the requested frames.
+    Frames that are not requested are returned as None.
+    """
+    root, ns = _parse_tcx_file(tcx_file, "combined analysis")
+
+    laps = root.findall(".//tcx:Lap", ns)
+    date_str = _date_from_first_lap(laps[0] if laps else None, tcx_file)
+
+    lap_rows = []
+    trackpoints = _TrackpointColumns()
+
+    for lap_counter, lap in enumerate(laps, start=1):
+        lap_data = _extract_lap_data(lap, ns)
+        lap_rows.append(_lap_columns(lap_counter, lap_data))
+
+        if detailed:
+            for tp in lap.findall(".//tcx:Trackpoint", ns):
+                trackpoints.append(lap_counter - 1, tp, ns)
+
+    lap_table = pd.DataFrame(lap_rows)
+    return ParsedTcx(
+        date_str,
+        lap_table if summary else None,
+        trackpoints.to_frame(lap_table) if detailed else None,
+    )
+
+
+def parse_tcx_stream(tcx_file, summary=True, detailed=True):
+    """
+    Streaming variant of parse_tcx for very large TCX files.
+    Uses incremental parsing and detaches each Trackpoint/Lap element from its parent
+    once consumed, so the XML tree never has to be held in memory. Produces the same ParsedTcx.
+    """
+    if not _validate_safe_path(tcx_file):
+        raise ValueError(f"Invalid or unsafe file path: {tcx_file}")
+    ns = {"tcx": "http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2"}
+    lap_tag = f"{{{ns['tcx']}}}Lap"
+    trackpoint_tag = f"{{{ns['tcx']}}}Trackpoint"
+
+    date_str = None
+    lap_rows = []
+    trackpoints = _TrackpointColumns()
+    in_lap = False
+    # Open elements, root first: the last one is the parent of the element being closed
+    open_elements = []
+
+    try:
+        for event, elem in ET.iterparse(tcx_file, events=("start", "end")):
+            if event == "start":
+                open_elements.append(elem)
+                if elem.tag == lap_tag:
+                    in_lap = True
+                    if date_str is None:
+                        date_str = _date_from_first_lap(elem, tcx_file)
+                continue
+
+            open_elements.pop()
+            if elem.tag == trackpoint_tag:
+                # Trackpoints outside a Lap (e.g. courses) are ignored, as in parse_tcx
+                if detailed and in_lap:
+                    trackpoints.append(len(lap_rows), elem, ns)
+            elif elem.tag == lap_tag:
+                # Lap totals may follow the track, so the lap row is added once it closes
+                lap_rows.append(_lap_columns(len(lap_rows) + 1, _extract_lap_data(elem, ns)))
+                in_lap = False
+            else:
+                continue
+            # A cleared element still attached to its parent would keep the tree growing
+            elem.clear()
+            if open_elements:
+                open_elements[-1].remove(elem)
+        logger.info(f"Successfully stream-parsed TCX file: {sanitize_for_log(tcx_file)}")
+    except ET.ParseError as e:
+        logger.error(f"XML parsing error in {sanitize_for_log(tcx_file)}: {sanitize_for_log(e)}")
+        raise ValueError(f"Invalid XML file: {e}")
+    except FileNotFoundError as e:
+        logger.error(f"TCX file not found: {sanitize_for_log(tcx_file)}")
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error parsing {sanitize_for_log(tcx_file)}: {sanitize_for_log(e)}")
+        raise
+
+    if date_str is None:
+        date_str = _date_from_first_lap(None, tcx_file)
+
+    lap_table = pd.DataFrame(lap_rows)
+    return ParsedTcx(
+        date_str,
+        lap_table if summary else None,
+        trackpoints.to_frame(lap_table) if detailed else None,
+    )
+
+
 def get_first_lap_date(tcx_file):
     try:
         root, ns = _parse_tcx_file(tcx_file, "date extraction")
-        first_lap = root.find(".//tcx:Lap", ns)
-        if first_lap is not None and "StartTime" in first_lap.attrib:
-            start_time = first_lap.attrib["StartTime"]
-            # Safely split timestamp to extract date
-            if "T" in start_time:
-                date = start_time.split("T")[0]
-                logger.debug(f"Extracted date {sanitize_for_log(date)} from {sanitize_for_log(tcx_file)}")
-                return date
-            else:
-                logger.warning(f"Invalid timestamp format in {sanitize_for_log(tcx_file)}: {sanitize_for_log(start_time)}")
-        else:
-            logger.warning(f"No lap with StartTime found in {sanitize_for_log(tcx_file)}")
+        return _date_from_first_lap(root.find(".//tcx:Lap", ns), tcx_file)
     except ET.ParseError as e:
         logger.error(f"XML parsing error while extracting date from {sanitize_for_log(tcx_file)}: {sanitize_for_log(e)}")
     except Exception as e:
@@ -294,6 +442,175 @@ def write_to_excel(df, output_file, sheet_name):
         raise
 
 
+def _excel_value(value):
+    """Convert a DataFrame cell to a value openpyxl can store; NaN becomes an empty cell"""
+    if value is None:
+        return None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, np.generic):
+        return _excel_value(value.item())
+    return value
+
+
+class ExcelBatchWriter:
+    """
+    Collects all sheets for one CLI invocation and writes the workbook once.
+    New sheets are streamed into an openpyxl write-only workbook as they are added,
+    so large detail sheets are never held as cell objects in memory. On save, sheets
+    of the existing output that are not replaced (case-insensitive) are copied over
+    by value, keeping their original order, and the file is replaced atomically.
+    """
+
+    def __init__(self, output_file):
+        # Validate output file path to prevent path traversal
+        if not _validate_safe_path(output_file):
+            logger.error(f"Invalid or unsafe output path: {sanitize_for_log(output_file)}")
+            raise ValueError("Invalid output file path")
+        self.output_file = output_file
+        self._workbook = None
+        self._sheets = {}
+
+    def add_sheet(self, df, sheet_name):
+        """Add or replace a sheet; a later sheet with the same name wins"""
+        if self._workbook is None:
+            self._workbook = Workbook(write_only=True)
+
+        previous = self._sheets.pop(sheet_name.lower(), None)
+        if previous is not None:
+            # Finish the streamed sheet before dropping it so its temp file is released
+            previous.close()
+            self._workbook.remove(previous)
+
+        ws = self._workbook.create_sheet(title=sheet_name)
+        header = []
+        for col in df.columns:
+            cell = WriteOnlyCell(ws, value=str(col))
+            cell.font = Font(bold=True)
+            header.append(cell)
+        ws.append(header)
+        for row in df.itertuples(index=False, name=None):
+            ws.append([_excel_value(v) for v in row])
+        self._sheets[sheet_name.lower()] = ws
+
+    def save(self):
+        """Merge in untouched sheets from the existing file and save once. No-op if nothing was added."""
+        if not self._sheets:
+            return
+        try:
+            if os.path.exists(self.output_file):
+                self._copy_existing_sheets()
+
+            directory = os.path.dirname(os.path.abspath(self.output_file))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".excel-", suffix=".xlsx")
+            os.close(fd)
+            try:
+                self._workbook.save(tmp_path)
+                replace_keeping_mode(tmp_path, self.output_file)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            logger.info(f"Wrote {len(self._sheets)} sheet(s) to Excel file: {sanitize_for_log(self.output_file)}")
+            print(f"✅ Data written to Excel file '{self.output_file}' ({len(self._sheets)} sheet(s))")
+        except PermissionError as e:
+            logger.error(f"Permission denied writing to Excel file {sanitize_for_log(self.output_file)}: {sanitize_for_log(e)}")
+            raise
+        except Exception as e:
+            logger.error(f"Error writing to Excel file {sanitize_for_log(self.output_file)}: {sanitize_for_log(e)}")
+            raise
+        finally:
+            self._workbook = None
+            self._sheets = {}
+
+    def _copy_existing_sheets(self):
+        existing = load_workbook(self.output_file, read_only=True)
+        try:
+            copied = []
+            for name in existing.sheetnames:
+                if name.lower() in self._sheets:
+                    logger.info(f"Replaced existing sheet: {sanitize_for_log(name)} in {sanitize_for_log(self.output_file)}")
+                    continue
+                ws = self._workbook.create_sheet(title=name)
+                for row in existing[name].iter_rows(values_only=True):
+                    ws.append(row)
+                copied.append(ws)
+        finally:
+            existing.close()
+
+        # Existing sheets keep their order ahead of the newly added ones
+        for position, ws in enumerate(copied):
+            self._workbook.move_sheet(ws.title, position - self._workbook.index(ws))
+
+
+def _wants_excel(args):
+    return args.format != "parquet"
+
+
+def _wants_parquet(args):
+    return args.format in ("parquet", "both")
+
+
+def _parquet_dir(args):
+    return args.parquet_dir or os.path.join(os.path.dirname(os.path.abspath(args.output)), "parquet")
+
+
+def _parquet_engine_available():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _typed_for_parquet(df, source_file):
+    """Copy of df with ISO timestamp strings as UTC datetimes and the source file column"""
+    typed = df.copy()
+    for col in ("LapStartTime", "Time"):
+        if col in typed:
+            typed[col] = pd.to_datetime(typed[col], utc=True, errors="coerce", format="ISO8601")
+    typed["_source_file"] = source_file
+    return typed
+
+
+def write_to_parquet(parsed, tcx_file, base_dir):
+    """
+    Write the parsed frames as Parquet partitioned by run date:
+    <base_dir>/<summary|detailed>/date=YYYY-MM-DD/<source>.parquet
+    One file per source, replaced on re-ingest (also when the run date changed).
+    """
+    if not _validate_safe_path(base_dir):
+        logger.error(f"Invalid or unsafe Parquet output path: {sanitize_for_log(base_dir)}")
+        raise ValueError("Invalid Parquet output path")
+
+    source_file = _safe_source_filename(tcx_file)
+    filename = f"{os.path.splitext(source_file)[0]}.parquet"
+    partition = f"date={parsed.date}"
+
+    for dataset, df in (("summary", parsed.summary), ("detailed", parsed.detailed)):
+        if df is None:
+            continue
+        dataset_dir = os.path.join(base_dir, dataset)
+        target_dir = os.path.join(dataset_dir, partition)
+        os.makedirs(target_dir, exist_ok=True)
+
+        # Drop copies of this source left in other date partitions
+        for stale in Path(dataset_dir).glob(f"date=*/{filename}"):
+            if stale.parent.name != partition:
+                stale.unlink()
+
+        target = os.path.join(target_dir, filename)
+        tmp_path = f"{target}.tmp"
+        try:
+            _typed_for_parquet(df, source_file).to_parquet(tmp_path, engine="pyarrow", index=False)
+            os.replace(tmp_path, target)
+        except Exception as e:
+            logger.error(f"Error writing Parquet file {sanitize_for_log(target)}: {sanitize_for_log(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        logger.info(f"Wrote Parquet file: {sanitize_for_log(target)}")
+
+
 def _sanitize_mongo_value(value):
     """Sanitize values for MongoDB queries to prevent NoSQL injection"""
     if value is None:
@@ -304,10 +621,18 @@ def _sanitize_mongo_value(value):
     # Convert other types to string to prevent injection
     return str(value)
 
-def push_to_mongo(df, collection, unique_keys):
+def _record_id(key_values):
+    """Deterministic 24-hex-digit _id for a record, hashed from its key values"""
+    payload = json.dumps(key_values, default=str, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def push_to_mongo(df, collection, unique_keys, batch_size=DEFAULT_MONGO_BATCH_SIZE):
     """
-    Upsert each row in df to the mongo collection using bulk operations.
-    unique_keys: list of column names for the unique query filter.
+    Upsert each row in df to the mongo collection using unordered, chunked bulk operations.
+    unique_keys: list of column names the deterministic _id is derived from, so every
+    upsert is a primary-key lookup and re-ingesting a file replaces its own records.
+    Returns a MongoWriteStats with inserted/updated/unchanged counts.
     """
     # Validate unique_keys to prevent injection
     if not isinstance(unique_keys, list) or not all(isinstance(k, str) for k in unique_keys):
@@ -318,96 +643,397 @@ def push_to_mongo(df, collection, unique_keys):
     records = df.to_dict(orient="records")
 
     for rec in records:
-        # Sanitize and validate query values
-        query = {}
+        # Sanitize and validate key values
+        key_values = []
         for k in unique_keys:
-            if k in rec and rec[k] is not None:
-                sanitized_val = _sanitize_mongo_value(rec[k])
-                if sanitized_val is not None:
-                    query[k] = sanitized_val
+            sanitized_val = _sanitize_mongo_value(rec[k]) if rec.get(k) is not None else None
+            key_values.append(sanitized_val)
 
-        # Skip if no valid query keys
-        if not query:
+        # Skip if no valid key values
+        if all(v is None for v in key_values):
             continue
 
         # Sanitize all record values
         sanitized_rec = {k: _sanitize_mongo_value(v) for k, v in rec.items()}
-        operations.append(ReplaceOne(query, sanitized_rec, upsert=True))
+        sanitized_rec["_id"] = _record_id(key_values)
+        operations.append(ReplaceOne({"_id": sanitized_rec["_id"]}, sanitized_rec, upsert=True))
 
-    # Execute bulk operations if any
-    if operations:
-        collection.bulk_write(operations)
+    return _bulk_upsert(collection, operations, batch_size)
 
 
-def process_file(tcx_file, args, mongo_client=None):
+def push_packed_to_mongo(df, collection, source_file, batch_size=DEFAULT_MONGO_BATCH_SIZE):
+    """
+    Upsert a detailed DataFrame in the packed layout: one document per lap, keyed by
+    source file + lap number. Laps the file no longer has are removed.
+    Returns a MongoWriteStats with inserted/updated/unchanged counts.
+    """
+    from pymongo import ReplaceOne
+    operations = []
+    lap_ids = []
+    for doc in pack_lap_documents(df, source_file):
+        doc["_id"] = _record_id([source_file, doc.get("LapNumber")])
+        lap_ids.append(doc["_id"])
+        operations.append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
+
+    stats = _bulk_upsert(collection, operations, batch_size)
+    collection.delete_many({"_source_file": source_file, "_id": {"$nin": lap_ids}})
+    return stats
+
+
+def _bulk_upsert(collection, operations, batch_size):
+    """Execute ReplaceOne upserts as unordered bulk_write chunks and sum the outcome counts"""
+    inserted = updated = unchanged = 0
+    if not operations:
+        return MongoWriteStats(inserted, updated, unchanged)
+
+    for start in range(0, len(operations), batch_size):
+        result = collection.bulk_write(operations[start:start + batch_size], ordered=False)
+        inserted += result.upserted_count
+        updated += result.modified_count
+        unchanged += result.matched_count - result.modified_count
+    return MongoWriteStats(inserted, updated, unchanged)
+
+
+def _parse_for_mode(tcx_file, mode, engine="tree"):
+    """Parse a TCX file once with the selected engine, building only the frames --mode needs"""
+    parse = parse_tcx_stream if engine == "stream" else parse_tcx
+    return parse(
+        tcx_file,
+        summary=mode in ("summary", "both"),
+        detailed=mode in ("detailed", "both"),
+    )
+
+
+def _parse_worker(tcx_file, mode, engine):
+    """Process-pool entry point: parse one file and return (ParsedTcx, parse seconds)"""
+    start = time.perf_counter()
+    parsed = _parse_for_mode(tcx_file, mode, engine)
+    return parsed, time.perf_counter() - start
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def process_file(tcx_file, args, mongo_client=None, excel_writer=None):
     logger.info(f"Starting processing of file: {sanitize_for_log(tcx_file)}")
     print(f"Processing {tcx_file}")
 
-    date_str = get_first_lap_date(tcx_file)
+    start = time.perf_counter()
+    parsed = _parse_for_mode(tcx_file, args.mode, args.engine)
+    return write_parsed(tcx_file, parsed, args, mongo_client, time.perf_counter() - start, excel_writer)
+
+
+def write_parsed(tcx_file, parsed, args, mongo_client=None, parse_s=0.0, excel_writer=None):
+    """
+    Writer stage: write one parsed file to Excel and/or Parquet, and optionally MongoDB.
+    Always runs in the main process so the workbook is never written concurrently.
+    With an ExcelBatchWriter the sheets are added to the batch instead of saved right away.
+    Returns an IngestResult with the file's timings.
+    """
+    start = time.perf_counter()
+    date_str = parsed.date
 
     dfs_to_write = []
     dfs_to_mongo = []
 
-    if args.mode in ("summary", "both"):
-        df_summary = parse_tcx_summary(tcx_file)
+    if parsed.summary is not None:
+        df_summary = parsed.summary
         sheet_summary = f"{date_str}_summary"
         dfs_to_write.append((df_summary, sheet_summary))
         if mongo_client:
             dfs_to_mongo.append(("summary", df_summary))
 
-    if args.mode in ("detailed", "both"):
-        df_detail = parse_tcx_detailed(tcx_file)
+    if parsed.detailed is not None:
+        df_detail = parsed.detailed
         sheet_detail = f"{date_str}_detail"
         dfs_to_write.append((df_detail, sheet_detail))
         if mongo_client:
             dfs_to_mongo.append(("detailed", df_detail))
 
-    # Write Excel sheets
-    for df, sheet_name in dfs_to_write:
-        write_to_excel(df, args.output, sheet_name)
+    excel_s = parquet_s = mongo_s = 0.0
 
-    print(f"✅ Data written to Excel file '{args.output}'")
+    # Write Excel sheets, or queue them on the batch writer when one is in use
+    stage_start = time.perf_counter()
+    if _wants_excel(args):
+        if excel_writer is not None:
+            for df, sheet_name in dfs_to_write:
+                excel_writer.add_sheet(df, sheet_name)
+        else:
+            for df, sheet_name in dfs_to_write:
+                write_to_excel(df, args.output, sheet_name)
+            print(f"✅ Data written to Excel file '{args.output}'")
+        excel_s = time.perf_counter() - stage_start
+
+    if _wants_parquet(args):
+        stage_start = time.perf_counter()
+        write_to_parquet(parsed, tcx_file, _parquet_dir(args))
+        parquet_s = time.perf_counter() - stage_start
 
-    # Push to MongoDB
     if mongo_client:
-        # Validate database name to prevent injection
-        db_name = "RunningTracker"
-        if not isinstance(db_name, str) or not db_name.isalnum():
-            logger.error("Invalid database name")
-            return
-        db = mongo_client[db_name]
+        stage_start = time.perf_counter()
+        _push_parsed_to_mongo(tcx_file, dfs_to_mongo, mongo_client, args.mongo_batch_size, args.mongo_layout,
+                              run_date=date_str)
+        mongo_s = time.perf_counter() - stage_start
+
+    result = IngestResult(
+        tcx_file,
+        _file_size(tcx_file),
+        len(parsed.detailed) if parsed.detailed is not None else 0,
+        parse_s,
+        time.perf_counter() - start,
+        excel_s,
+        parquet_s,
+        mongo_s,
+    )
+    _print_file_throughput(result)
+    return result
 
-        for mode_name, df in dfs_to_mongo:
-            # Validate collection name to prevent injection
-            if not isinstance(mode_name, str) or mode_name not in ["summary", "detailed"]:
-                logger.error(f"Invalid collection name: {sanitize_for_log(mode_name)}")
-                continue
-            collection = db[mode_name]
 
-            # Determine unique keys for upsert based on mode with validation
-            allowed_summary_keys = ["LapStartTime", "LapNumber", "LapTotalTime_s", "LapDistance_m", "Pace_min_per_km"]
-            allowed_detailed_keys = ["LapStartTime", "LapNumber", "Time"]
+def _safe_source_filename(tcx_file):
+    """Return the validated basename used to tag records with their source file"""
+    filename = os.path.basename(tcx_file)
+    if not _validate_safe_path(filename):
+        filename = 'sanitized_file.tcx'
+    # Validate filename to prevent injection
+    if not isinstance(filename, str) or len(filename) > 255:
+        filename = 'invalid_file.tcx'
+    # Sanitize filename for MongoDB
+    return _sanitize_mongo_value(filename)
 
-            if mode_name == "summary":
-                unique_keys = [k for k in allowed_summary_keys if isinstance(k, str) and k.replace('_', '').isalnum()]
-            else:  # detailed
-                unique_keys = [k for k in allowed_detailed_keys if isinstance(k, str) and k.replace('_', '').isalnum()]
 
-            # Add filename to each record for uniqueness and traceability
-            filename = os.path.basename(tcx_file)
-            if not _validate_safe_path(filename):
-                filename = 'sanitized_file.tcx'
-            # Validate filename to prevent injection
-            if not isinstance(filename, str) or len(filename) > 255:
-                filename = 'invalid_file.tcx'
-            # Sanitize filename for MongoDB
-            safe_filename = _sanitize_mongo_value(filename)
-            df["_source_file"] = safe_filename
+def push_run_summary(db, source_file, run_date, summary=None, detailed=None):
+    """Upsert the pre-computed 'runs' document the dashboard reads for one source file, then the records"""
+    if summary is None and detailed is None:
+        return
+    doc = build_run_document(summary, detailed, source_file, run_date)
+    # $set keeps stored elevation fields when only the summary was re-ingested
+    db[RUNS_COLLECTION].update_one({"_id": source_file}, {"$set": doc}, upsert=True)
+    update_records(db, doc)
+
+
+def delete_source(db, source_file):
+    """Remove every document of one source file from MongoDB and recompute the records it held"""
+    for collection_name in ("summary", "detailed", PACKED_COLLECTION):
+        db[collection_name].delete_many({"_source_file": source_file})
+    deleted = db[RUNS_COLLECTION].delete_one({"_id": source_file}).deleted_count
+    remove_source_records(db, source_file)
+    return deleted
+
+
+def _push_parsed_to_mongo(tcx_file, dfs_to_mongo, mongo_client, batch_size=DEFAULT_MONGO_BATCH_SIZE, layout="rows",
+                          run_date=None):
+    """Upsert the parsed (collection name, DataFrame) pairs for one file, then its run summary"""
+    # Validate database name to prevent injection
+    db_name = MONGO_DATABASE
+    if not isinstance(db_name, str) or not db_name.isalnum():
+        logger.error("Invalid database name")
+        return
+    db = mongo_client[db_name]
+    source_file = _safe_source_filename(tcx_file)
+
+    reports = []
+    for mode_name, df in dfs_to_mongo:
+        # Validate collection name to prevent injection
+        if not isinstance(mode_name, str) or mode_name not in ["summary", "detailed"]:
+            logger.error(f"Invalid collection name: {sanitize_for_log(mode_name)}")
+            continue
+        collection = db[mode_name]
+
+        # Keys the deterministic _id is derived from: source file + lap + time
+        if mode_name == "summary":
+            id_keys = ["_source_file", "LapNumber", "LapStartTime"]
+        else:  # detailed
+            id_keys = ["_source_file", "LapNumber", "Time"]
+
+        # Add filename to each record for uniqueness and traceability
+        df["_source_file"] = source_file
+
+        if mode_name == "detailed" and layout == "packed":
+            stats = push_packed_to_mongo(df, db[PACKED_COLLECTION], source_file, batch_size)
+            # A file lives in exactly one layout; drop any per-trackpoint copy
+            collection.delete_many({"_source_file": source_file})
+            mode_name = PACKED_COLLECTION
+        else:
+            stats = push_to_mongo(df, collection, id_keys, batch_size)
+            # Records ingested before deterministic ids carry ObjectIds; drop them so they are not duplicated
+            collection.delete_many({"_source_file": source_file, "_id": {"$not": {"$type": "string"}}})
+            if mode_name == "detailed":
+                db[PACKED_COLLECTION].delete_many({"_source_file": source_file})
+
+        reports.append(
+            f"{mode_name}: {stats.inserted} inserted, {stats.updated} updated, {stats.unchanged} unchanged"
+        )
 
-            # Use bulk operations for better performance
-            push_to_mongo(df, collection, unique_keys + ["_source_file"])
+    frames = dict(dfs_to_mongo)
+    push_run_summary(db, source_file, run_date, frames.get("summary"), frames.get("detailed"))
+    bump_dataset_version(db)
+    print(f"✅ Data pushed to MongoDB ({'; '.join(reports)})")
 
-        print("✅ Data pushed to MongoDB")
+
+def migrate_detailed_to_packed(db, batch_size=DEFAULT_MONGO_BATCH_SIZE):
+    """
+    Move every source file in the per-trackpoint 'detailed' collection to the packed
+    layout, one file at a time. Returns the number of files migrated.
+    """
+    detailed = db["detailed"]
+    migrated = 0
+    for source_file in detailed.distinct("_source_file"):
+        if not isinstance(source_file, str):
+            continue
+        rows = list(detailed.find({"_source_file": source_file}, {"_id": 0})
+                    .sort([("LapNumber", 1), ("Time", 1)]))
+        df = pd.DataFrame(rows)
+        if df.empty or "LapNumber" not in df or "Time" not in df:
+            logger.warning(f"Skipping migration of {sanitize_for_log(source_file)}: no lap/time data")
+            continue
+        df = df.reindex(columns=LAP_COLUMNS + TRACKPOINT_COLUMNS)
+        push_packed_to_mongo(df, db[PACKED_COLLECTION], source_file, batch_size)
+        # Only drop the trackpoint documents once the packed copy is written
+        detailed.delete_many({"_source_file": source_file})
+        migrated += 1
+        print(f"Migrated {source_file}: {len(df)} trackpoints")
+    return migrated
+
+
+def _stored_detailed_frame(db, source_file):
+    """A source file's trackpoints from whichever detailed layout holds them, or None"""
+    rows = list(db["detailed"].find({"_source_file": source_file}, {"_id": 0}).sort([("LapNumber", 1), ("Time", 1)]))
+    if rows:
+        return pd.DataFrame(rows).reindex(columns=LAP_COLUMNS + TRACKPOINT_COLUMNS)
+    laps = [unpack_lap_frame(doc) for doc in db[PACKED_COLLECTION].find({"_source_file": source_file}).sort("LapNumber", 1)]
+    if laps:
+        return pd.concat(laps, ignore_index=True).reindex(columns=LAP_COLUMNS + TRACKPOINT_COLUMNS)
+    return None
+
+
+def rebuild_run_summaries(db):
+    """
+    Recompute the 'runs' document of every source file already stored in MongoDB,
+    e.g. for data ingested before the collection existed. Returns the number of runs written.
+    """
+    sources = set()
+    for collection_name in ("summary", "detailed", PACKED_COLLECTION):
+        sources.update(s for s in db[collection_name].distinct("_source_file") if isinstance(s, str))
+
+    rebuilt = 0
+    for source_file in sorted(sources):
+        laps = list(db["summary"].find({"_source_file": source_file}, {"_id": 0}).sort("LapNumber", 1))
+        summary = pd.DataFrame(laps).reindex(columns=LAP_COLUMNS) if laps else None
+        detailed = _stored_detailed_frame(db, source_file)
+        first = summary if summary is not None else detailed
+        start_time = first["LapStartTime"].iloc[0] if first is not None and len(first) else None
+        run_date = start_time.split("T")[0] if isinstance(start_time, str) and "T" in start_time else "UnknownDate"
+        push_run_summary(db, source_file, run_date, summary, detailed)
+        rebuilt += 1
+    rebuild_records(db)
+    return rebuilt
+
+
+def _print_file_throughput(result):
+    total_s = result.parse_s + result.write_s
+    print(
+        f"⏱  {os.path.basename(result.file)}: {result.trackpoints} trackpoints, "
+        f"{result.size_bytes / 1e6:.2f} MB in {total_s:.2f}s "
+        f"(parse {result.parse_s:.2f}s, write {result.write_s:.2f}s)"
+    )
+
+
+def _print_throughput_summary(results, elapsed_s):
+    """Print aggregate throughput for a CLI run"""
+    if not results or elapsed_s <= 0:
+        return
+    total_points = sum(r.trackpoints for r in results)
+    total_mb = sum(r.size_bytes for r in results) / 1e6
+    print(
+        f"Processed {len(results)} file(s) in {elapsed_s:.2f}s: "
+        f"{len(results) / elapsed_s:.2f} files/s, {total_points / elapsed_s:,.0f} trackpoints/s, "
+        f"{total_mb / elapsed_s:.2f} MB/s"
+    )
+
+
+def _process_files_parallel(files, args, mongo_client=None, manifest=None, excel_writer=None):
+    """
+    Parse files in a process pool and hand results to the writer stage in input order.
+    At most 2 * workers parsed files are held in memory while waiting to be written.
+    """
+    results = []
+    pending = deque()
+    file_iter = iter(files)
+
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        for tcx_file in itertools.islice(file_iter, args.workers * 2):
+            pending.append((tcx_file, executor.submit(_parse_worker, tcx_file, args.mode, args.engine)))
+
+        while pending:
+            tcx_file, future = pending.popleft()
+            logger.info(f"Starting processing of file: {sanitize_for_log(tcx_file)}")
+            print(f"Processing {tcx_file}")
+            parsed, parse_s = future.result()
+
+            next_file = next(file_iter, None)
+            if next_file is not None:
+                pending.append((next_file, executor.submit(_parse_worker, next_file, args.mode, args.engine)))
+
+            results.append(write_parsed(tcx_file, parsed, args, mongo_client, parse_s, excel_writer))
+            if manifest is not None:
+                manifest.record(tcx_file, args.mode)
+
+    return results
+
+
+def _process_files_sequential(files, args, mongo_client=None, manifest=None, excel_writer=None):
+    results = []
+    for tcx_file in files:
+        results.append(process_file(tcx_file, args, mongo_client, excel_writer))
+        if manifest is not None:
+            manifest.record(tcx_file, args.mode)
+    return results
+
+
+def _manifest_destinations(args):
+    """Outputs written by this run; a file is skipped only if all of them already hold it"""
+    destinations = []
+    if _wants_excel(args):
+        destinations.append(excel_destination(args.output))
+    if _wants_parquet(args):
+        destinations.append(parquet_destination(_parquet_dir(args)))
+    if args.mongo:
+        destinations.append(mongo_destination(args.mongo_uri, MONGO_DATABASE))
+    return destinations
+
+
+def _open_manifest(args, mongo_client=None):
+    """Open the ingest manifest selected by --manifest, or None when it is disabled"""
+    if args.manifest == "off":
+        return None
+    destinations = _manifest_destinations(args)
+    if args.manifest == "mongo":
+        return IngestManifest(MongoManifestStore(mongo_client[MONGO_DATABASE][MANIFEST_COLLECTION]), destinations)
+
+    manifest_file = args.manifest_file or os.path.join(
+        os.path.dirname(os.path.abspath(args.output)), DEFAULT_MANIFEST_FILENAME
+    )
+    if not _validate_safe_path(manifest_file):
+        raise ValueError("Invalid manifest file path")
+    return IngestManifest(JsonManifestStore(manifest_file), destinations)
+
+
+def _skip_unchanged_files(files, manifest, mode):
+    """Drop files the manifest shows as already ingested and unchanged"""
+    changed = []
+    for tcx_file in files:
+        if manifest.is_unchanged(tcx_file, mode):
+            logger.debug(f"Skipping unchanged file: {sanitize_for_log(tcx_file)}")
+        else:
+            changed.append(tcx_file)
+    skipped = len(files) - len(changed)
+    if skipped:
+        print(f"Skipping {skipped} unchanged file(s) (use --force to reprocess)")
+    return changed
 
 
 def _discover_tcx_files(input_path):
@@ -458,6 +1084,71 @@ def _setup_mongo_connection(args):
         print(f"ERROR: MongoDB connection failed: {e}")
         return None
 
+def _print_index_report(reports):
+    """Print the --check-indexes explain() summary, one line per webapp query"""
+    print("Index check for webapp queries:")
+    for report in reports:
+        status = "OK  " if report["ok"] else "SLOW"
+        print(
+            f"  [{status}] {report['query']}: {report['plan']} "
+            f"(keys examined: {report['keys_examined']}, docs examined: {report['docs_examined']}, "
+            f"returned: {report['returned']}, {report['time_ms']} ms)"
+        )
+
+
+def _positive_int(value):
+    """argparse type for options that must be an integer >= 1"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid integer value: '{value}'")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def _save_ingested(excel_writer, manifest):
+    """
+    Save the workbook, then the manifest, and return the seconds spent on the workbook.
+    The manifest is only saved once the workbook is, so a failed save reprocesses those files.
+    """
+    excel_save_s = 0.0
+    if excel_writer is not None:
+        save_start = time.perf_counter()
+        excel_writer.save()
+        excel_save_s = time.perf_counter() - save_start
+    if manifest is not None:
+        manifest.save()
+    return excel_save_s
+
+
+def _ingest_files(files, args, mongo_client=None, manifest=None):
+    """Parse and write every file, then print the throughput summary (and --stats report)"""
+    # The workbook is opened and saved once for the whole run
+    excel_writer = ExcelBatchWriter(args.output) if _wants_excel(args) else None
+    results = []
+    start = time.perf_counter()
+    try:
+        if args.workers > 1 and len(files) > 1:
+            results = _process_files_parallel(files, args, mongo_client, manifest, excel_writer)
+        else:
+            results = _process_files_sequential(files, args, mongo_client, manifest, excel_writer)
+    except BaseException:
+        # Persist whatever was ingested before the failure, without letting a save
+        # error replace the exception that stopped the run
+        try:
+            _save_ingested(excel_writer, manifest)
+        except Exception as e:
+            logger.error(f"Could not save data ingested before the failure: {sanitize_for_log(e)}")
+        raise
+    excel_save_s = _save_ingested(excel_writer, manifest)
+    elapsed_s = time.perf_counter() - start
+    _print_throughput_summary(results, elapsed_s)
+    if args.stats:
+        print("\n".join(format_stats_report(results, elapsed_s, excel_save_s, args.workers)))
+    return results
+
+
 def main():
     parser = argparse.ArgumentParser(
         description=(
@@ -467,7 +1158,7 @@ def main():
         formatter_class=argparse.RawTextHelpFormatter,
     )
 
-    parser.add_argument("input_path", help="Path to TCX file or folder containing TCX files.")
+    parser.add_argument("input_path", nargs="?", help="Path to TCX file or folder containing TCX files.")
     parser.add_argument("--output", help="Path to Excel file. Default: tcx_data.xlsx", default="tcx_data.xlsx")
     parser.add_argument(
         "--mode",
@@ -475,6 +1166,15 @@ def main():
         default="both",
         help="Export mode: summary, detailed, or both (default).",
     )
+    parser.add_argument(
+        "--engine",
+        choices=["tree", "stream"],
+        default="tree",
+        help=(
+            "XML parser engine: tree (default) builds the full XML tree; "
+            "stream parses incrementally with bounded memory for very large files."
+        ),
+    )
     parser.add_argument(
         "--mongo",
         action="store_true",
@@ -485,11 +1185,143 @@ def main():
         default="mongodb://localhost:27017",
         help="MongoDB connection URI (default: mongodb://localhost:27017).",
     )
+    parser.add_argument(
+        "--mongo-batch-size",
+        type=_positive_int,
+        default=DEFAULT_MONGO_BATCH_SIZE,
+        help=f"Number of upserts sent per MongoDB bulk write (default: {DEFAULT_MONGO_BATCH_SIZE}).",
+    )
+    parser.add_argument(
+        "--mongo-layout",
+        choices=["rows", "packed"],
+        default="rows",
+        help=(
+            "MongoDB storage for detailed data: rows (default) stores one document per trackpoint; "
+            f"packed stores one document per lap in '{PACKED_COLLECTION}' with compressed column blocks."
+        ),
+    )
+    parser.add_argument(
+        "--migrate-to-packed",
+        action="store_true",
+        help="Convert existing per-trackpoint detailed data in MongoDB to the packed layout, then exit (requires --mongo).",
+    )
+    parser.add_argument(
+        "--rebuild-runs",
+        action="store_true",
+        help=(
+            f"Recompute the per-run summaries in '{RUNS_COLLECTION}' from the data already in MongoDB, "
+            "then exit (requires --mongo)."
+        ),
+    )
+    parser.add_argument(
+        "--delete-source",
+        metavar="FILE_NAME",
+        help=(
+            "Delete all MongoDB data of one source file (e.g. RunnerUp_2025-08-05-08-24-01_Running.tcx) "
+            f"and update '{RECORDS_COLLECTION}', then exit (requires --mongo). "
+            "Use --force to ingest the file again afterwards."
+        ),
+    )
+    parser.add_argument(
+        "--check-indexes",
+        action="store_true",
+        help=(
+            "Create missing MongoDB indexes, run explain() on the webapp's queries and report "
+            "whether each one is served by an index, then exit (requires --mongo)."
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        type=_positive_int,
+        default=1,
+        help=(
+            "Number of processes used to parse files in parallel (default: 1). "
+            "Excel and MongoDB writes always happen in a single writer stage."
+        ),
+    )
+
+    parser.add_argument(
+        "--manifest",
+        choices=["local", "mongo", "off"],
+        default="local",
+        help=(
+            "Where to keep the ingest manifest used to skip unchanged files: "
+            "local JSON file (default), the MongoDB 'ingest_manifest' collection (requires --mongo), or off."
+        ),
+    )
+    parser.add_argument(
+        "--manifest-file",
+        help=f"Path of the local manifest file. Default: {DEFAULT_MANIFEST_FILENAME} next to --output.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Reprocess every file even if the manifest shows it unchanged.",
+    )
+
+    parser.add_argument(
+        "--format",
+        choices=["excel", "parquet", "both"],
+        default="excel",
+        help=(
+            "File output format: excel (default), parquet, or both. Parquet output is partitioned "
+            "by run date and requires 'pyarrow'."
+        ),
+    )
+    parser.add_argument(
+        "--parquet-dir",
+        help="Directory for Parquet output. Default: 'parquet' next to --output.",
+    )
+
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help=(
+            "After the run, report per-file parse/Excel/Parquet/MongoDB timings, trackpoints/s, "
+            "bytes/s and peak memory (RSS)."
+        ),
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help=(
+            "Profile the run with cProfile: binary stats are written to PATH (open with pstats or snakeviz) "
+            "and a cumulative-time listing to PATH.txt. Parse workers started by --workers are not "
+            "profiled; use --workers 1 to include parsing."
+        ),
+    )
+    parser.add_argument(
+        "--profile-memory",
+        action="store_true",
+        help="With --profile, also trace allocations: tracemalloc snapshot in PATH.tracemalloc, top sites in PATH.memory.txt.",
+    )
 
     args = parser.parse_args()
 
+    maintenance_only = args.check_indexes or args.migrate_to_packed or args.rebuild_runs or args.delete_source
+    if args.input_path is None and not maintenance_only:
+        parser.error("the following arguments are required: input_path")
+    if args.check_indexes and not args.mongo:
+        parser.error("--check-indexes requires --mongo")
+    if args.migrate_to_packed and not args.mongo:
+        parser.error("--migrate-to-packed requires --mongo")
+    if args.rebuild_runs and not args.mongo:
+        parser.error("--rebuild-runs requires --mongo")
+    if args.delete_source and not args.mongo:
+        parser.error("--delete-source requires --mongo")
+    if args.delete_source and os.path.basename(args.delete_source) != args.delete_source:
+        parser.error("--delete-source takes a file name, not a path")
+    if args.manifest == "mongo" and not args.mongo:
+        parser.error("--manifest mongo requires --mongo")
+    if _wants_parquet(args) and not _parquet_engine_available():
+        parser.error("--format parquet requires the 'pyarrow' package")
+    if args.profile_memory and not args.profile:
+        parser.error("--profile-memory requires --profile")
+    if args.profile and not _validate_safe_path(args.profile):
+        parser.error("Invalid or unsafe --profile path")
+
     # Validate input path
-    if not os.path.exists(args.input_path):
+    if not maintenance_only and not os.path.exists(args.input_path):
         print(f"Input path '{args.input_path}' does not exist.")
         return
 
@@ -498,6 +1330,26 @@ def main():
         return
 
     try:
+        if mongo_client:
+            ensure_indexes(mongo_client[MONGO_DATABASE])
+        if args.migrate_to_packed:
+            migrated = migrate_detailed_to_packed(mongo_client[MONGO_DATABASE], args.mongo_batch_size)
+            print(f"✅ Migrated {migrated} file(s) to the packed layout")
+        if args.rebuild_runs:
+            rebuilt = rebuild_run_summaries(mongo_client[MONGO_DATABASE])
+            print(f"✅ Rebuilt {rebuilt} run summar{'y' if rebuilt == 1 else 'ies'}")
+        if args.delete_source:
+            if delete_source(mongo_client[MONGO_DATABASE], args.delete_source):
+                print(f"✅ Deleted {args.delete_source} from MongoDB")
+            else:
+                print(f"No run named '{args.delete_source}' in MongoDB")
+        if args.migrate_to_packed or args.rebuild_runs or args.delete_source:
+            bump_dataset_version(mongo_client[MONGO_DATABASE])
+        if args.check_indexes:
+            _print_index_report(explain_webapp_queries(mongo_client[MONGO_DATABASE]))
+        if maintenance_only:
+            return
+
         # Validate input path to prevent path traversal
         if not _validate_safe_path(args.input_path):
             print(f"Invalid or unsafe input path: '{args.input_path}'")
@@ -507,8 +1359,15 @@ def main():
         if not files:
             return
 
-        for f in files:
-            process_file(f, args, mongo_client)
+        manifest = _open_manifest(args, mongo_client)
+        if manifest is not None and not args.force:
+            files = _skip_unchanged_files(files, manifest, args.mode)
+
+        if args.profile:
+            with profiled(args.profile, trace_memory=args.profile_memory):
+                _ingest_files(files, args, mongo_client, manifest)
+        else:
+            _ingest_files(files, args, mongo_client, manifest)
     finally:
         if mongo_client:
             mongo_client.close()
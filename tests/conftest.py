@@ -46,6 +46,8 @@ def mock_dependencies():
         'pandas': mock_pandas,
         'flask': mock_flask,
         'openpyxl': mock_openpyxl,
+        'openpyxl.cell': mock_openpyxl.cell,
+        'openpyxl.styles': mock_openpyxl.styles,
         'defusedxml': mock_defusedxml,
         'defusedxml.ElementTree': mock_defusedxml.ElementTree,
         'const': MagicMock()
@@ -2,7 +2,7 @@
 Unified tests for trainparser module
 """
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, ANY
 
 
 class TestTrainparserCore:
@@ -86,6 +86,38 @@ class TestTrainparserMongo:
         with pytest.raises(ValueError):
             mock_trainparser.push_to_mongo(mock_df, mock_collection, [123, "valid"])
 
+    @patch('pymongo.ReplaceOne')
+    def test_push_to_mongo_deterministic_id(self, mock_replace_one, mock_trainparser):
+        """Test upserts filter on an _id that is stable across runs and unique per key"""
+        mock_df = MagicMock()
+        mock_df.to_dict.return_value = [
+            {"_source_file": "a.tcx", "LapNumber": 1, "Time": "t1"},
+            {"_source_file": "a.tcx", "LapNumber": 1, "Time": "t2"},
+            {"_source_file": "a.tcx", "LapNumber": 1, "Time": "t1"},
+        ]
+        keys = ["_source_file", "LapNumber", "Time"]
+        mock_trainparser.push_to_mongo(mock_df, MagicMock(), keys)
+
+        filters = [c.args[0] for c in mock_replace_one.call_args_list]
+        assert filters[0] == {"_id": mock_trainparser._record_id(["a.tcx", 1, "t1"])}
+        assert filters[0] == filters[2]
+        assert filters[0] != filters[1]
+        assert mock_replace_one.call_args_list[0].args[1]["_id"] == filters[0]["_id"]
+
+    @patch('pymongo.ReplaceOne')
+    def test_push_to_mongo_batches_and_counts(self, mock_replace_one, mock_trainparser):
+        """Test writes are chunked, unordered, and outcome counts are summed"""
+        mock_df = MagicMock()
+        mock_df.to_dict.return_value = [{"key": i} for i in range(5)]
+        mock_collection = MagicMock()
+        mock_collection.bulk_write.return_value = MagicMock(upserted_count=1, matched_count=1, modified_count=0)
+
+        stats = mock_trainparser.push_to_mongo(mock_df, mock_collection, ["key"], batch_size=2)
+
+        assert [len(c.args[0]) for c in mock_collection.bulk_write.call_args_list] == [2, 2, 1]
+        assert all(c.kwargs["ordered"] is False for c in mock_collection.bulk_write.call_args_list)
+        assert stats == mock_trainparser.MongoWriteStats(inserted=3, updated=0, unchanged=3)
+
 
 class TestTrainparserErrorHandling:
     """Test error handling scenarios"""
@@ -172,12 +204,29 @@ class TestMissingTrainparserFunctions:
         
         mock_client = MagicMock()
         
-        with patch('trainparser.get_first_lap_date', return_value="2024-01-01"):
-            with patch('trainparser.parse_tcx_summary', return_value=MagicMock()):
-                with patch('trainparser.write_to_excel'):
-                    with patch('os.path.basename', return_value="invalid..file"):
-                        with patch('trainparser._validate_safe_path', return_value=False):
-                            mock_trainparser.process_file("test.tcx", args, mock_client)
+        parsed = mock_trainparser.ParsedTcx("2024-01-01", MagicMock(), None)
+        with patch('trainparser.parse_tcx', return_value=parsed):
+            with patch('trainparser.write_to_excel'):
+                with patch('os.path.basename', return_value="invalid..file"):
+                    with patch('trainparser._validate_safe_path', return_value=False), \
+                         patch('trainparser.push_run_summary') as mock_run_summary:
+                        mock_trainparser.process_file("test.tcx", args, mock_client)
+        assert mock_run_summary.call_args.args[1] == "sanitized_file.tcx"
+    
+    def test_process_file_parses_once(self, mock_trainparser):
+        """Test process_file parses the TCX file a single time for all outputs"""
+        args = MagicMock()
+        args.mode = "both"
+        args.output = "test.xlsx"
+        
+        parsed = mock_trainparser.ParsedTcx("2024-01-01", MagicMock(), MagicMock())
+        with patch('trainparser.parse_tcx', return_value=parsed) as mock_parse:
+            with patch('trainparser.write_to_excel') as mock_write:
+                mock_trainparser.process_file("test.tcx", args)
+        
+        mock_parse.assert_called_once_with("test.tcx", summary=True, detailed=True)
+        sheets = [call.args[2] for call in mock_write.call_args_list]
+        assert sheets == ["2024-01-01_summary", "2024-01-01_detail"]
     
     def test_sanitize_for_log_control_chars(self, mock_trainparser):
         """Test log sanitization with control characters"""
@@ -242,6 +291,13 @@ class TestMainFunctionPaths:
         """Test main with unsafe input path"""
         args = MagicMock()
         args.input_path = "../../../etc/passwd"
+        args.check_indexes = False
+        args.migrate_to_packed = False
+        args.rebuild_runs = False
+        args.delete_source = None
+        args.stats = False
+        args.profile = None
+        args.profile_memory = False
         mock_args.return_value = args
         mock_exists.return_value = True
         mock_validate.return_value = False
@@ -261,7 +317,16 @@ class TestMainFunctionPaths:
         """Test main function with MongoDB client cleanup"""
         args = MagicMock()
         args.input_path = "/valid/path"
+        args.check_indexes = False
+        args.migrate_to_packed = False
+        args.rebuild_runs = False
+        args.delete_source = None
+        args.stats = False
+        args.profile = None
+        args.profile_memory = False
         args.mongo = True
+        args.workers = 1
+        args.manifest = "off"
         mock_args.return_value = args
         mock_exists.return_value = True
         mock_validate.return_value = True
@@ -270,8 +335,127 @@ class TestMainFunctionPaths:
         mock_discover.return_value = ["file1.tcx"]
         
         import trainparser
+        mock_process.return_value = trainparser.IngestResult("file1.tcx", 1000, 10, 0.1, 0.1)
         trainparser.main()
         
         mock_client.close.assert_called_once()
+        mock_client.__getitem__.assert_called_with("RunningTracker")
+
+    @patch('trainparser.explain_webapp_queries')
+    @patch('trainparser.ensure_indexes')
+    @patch('trainparser._discover_tcx_files')
+    @patch('trainparser._setup_mongo_connection')
+    @patch('argparse.ArgumentParser.parse_args')
+    def test_main_check_indexes(self, mock_args, mock_mongo, mock_discover, mock_ensure, mock_explain, capsys):
+        """Test --check-indexes bootstraps indexes, reports explain() results and skips ingest"""
+        args = MagicMock()
+        args.input_path = None
+        args.mongo = True
+        args.check_indexes = True
+        args.migrate_to_packed = False
+        args.rebuild_runs = False
+        args.delete_source = None
+        args.stats = False
+        args.profile = None
+        args.profile_memory = False
+        mock_args.return_value = args
+        mock_client = MagicMock()
+        mock_mongo.return_value = mock_client
+        mock_explain.return_value = [{"query": "detailed: all trackpoints by run", "plan": "FETCH <- IXSCAN(source_lap_time)",
+                                      "keys_examined": 5, "docs_examined": 5, "returned": 5, "time_ms": 0, "ok": True}]
+
+        import trainparser
+        trainparser.main()
+
+        mock_ensure.assert_called_once()
+        mock_discover.assert_not_called()
+        mock_client.close.assert_called_once()
+        assert "[OK  ] detailed: all trackpoints by run: FETCH <- IXSCAN(source_lap_time)" in capsys.readouterr().out
+    
+    @patch('trainparser._process_files_parallel')
+    @patch('trainparser.process_file')
+    @patch('trainparser._discover_tcx_files')
+    @patch('trainparser._setup_mongo_connection')
+    @patch('trainparser._validate_safe_path')
+    @patch('os.path.exists')
+    @patch('argparse.ArgumentParser.parse_args')
+    def test_main_with_workers_uses_pool(self, mock_args, mock_exists, mock_validate, mock_mongo, mock_discover, mock_process, mock_parallel):
+        """Test main dispatches to the process pool when --workers > 1"""
+        args = MagicMock()
+        args.input_path = "/valid/path"
+        args.check_indexes = False
+        args.migrate_to_packed = False
+        args.rebuild_runs = False
+        args.delete_source = None
+        args.stats = False
+        args.profile = None
+        args.profile_memory = False
+        args.mongo = False
+        args.workers = 4
+        args.manifest = "off"
+        mock_args.return_value = args
+        mock_exists.return_value = True
+        mock_validate.return_value = True
+        mock_mongo.return_value = None
+        mock_discover.return_value = ["file1.tcx", "file2.tcx"]
+        mock_parallel.return_value = []
+        
+        import trainparser
+        trainparser.main()
+        
+        mock_parallel.assert_called_once_with(["file1.tcx", "file2.tcx"], args, None, None, ANY)
+        mock_process.assert_not_called()
+    
+    @patch('trainparser._process_files_sequential')
+    @patch('trainparser._open_manifest')
+    @patch('trainparser._discover_tcx_files')
+    @patch('trainparser._setup_mongo_connection')
+    @patch('trainparser._validate_safe_path')
+    @patch('os.path.exists')
+    @patch('argparse.ArgumentParser.parse_args')
+    def test_main_skips_unchanged_files(self, mock_args, mock_exists, mock_validate, mock_mongo, mock_discover, mock_manifest, mock_sequential):
+        """Test main only processes files the manifest reports as new or changed"""
+        args = MagicMock()
+        args.input_path = "/valid/path"
+        args.check_indexes = False
+        args.migrate_to_packed = False
+        args.rebuild_runs = False
+        args.delete_source = None
+        args.stats = False
+        args.profile = None
+        args.profile_memory = False
+        args.mongo = False
+        args.workers = 1
+        args.force = False
+        args.mode = "both"
+        mock_args.return_value = args
+        mock_exists.return_value = True
+        mock_validate.return_value = True
+        mock_mongo.return_value = None
+        mock_discover.return_value = ["old.tcx", "new.tcx"]
+        manifest = MagicMock()
+        manifest.is_unchanged.side_effect = lambda path, mode: path == "old.tcx"
+        mock_manifest.return_value = manifest
+        mock_sequential.return_value = []
+        
+        import trainparser
+        trainparser.main()
+        mock_sequential.assert_called_once_with(["new.tcx"], args, None, manifest, ANY)
+        manifest.save.assert_called_once()
+        
+        # --force bypasses the manifest check but still records ingested files
+        args.force = True
+        mock_sequential.reset_mock()
+        trainparser.main()
+        mock_sequential.assert_called_once_with(["old.tcx", "new.tcx"], args, None, manifest, ANY)
+    
+    def test_positive_int(self, mock_trainparser):
+        """Test --workers argument validation"""
+        import argparse
+        assert mock_trainparser._positive_int("3") == 3
+        with pytest.raises(argparse.ArgumentTypeError):
+            mock_trainparser._positive_int("0")
+        with pytest.raises(argparse.ArgumentTypeError):
+            mock_trainparser._positive_int("many")
 
 
@@ -1,11 +1,22 @@
 import re
 import os
 import sys
+import zlib
+import math
+import json
+import time
+import atexit
 import logging
-from flask import Flask, render_template
+import threading
+import contextvars
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from flask import Flask, render_template, request, jsonify, abort, make_response, g
 from pymongo import MongoClient
-from collections import defaultdict
-from datetime import timedelta
+from collections import defaultdict, namedtuple, deque
+from itertools import groupby
+from datetime import datetime, timedelta, timezone
 
 # Add current directory to Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
@@ -18,7 +29,18 @@ try:
                        COL_TIME, COL_LAP_TOTAL_TIME_FORMATTED, COL_LAP_DISTANCE_FORMATTED, COL_ALTITUDE_FORMATTED,
                        COL_ALTITUDE_DELTA_FORMATTED, COL_DISTANCE_FORMATTED, FIELD_SOURCE, FIELD_DATE,
                        FIELD_TOTAL_DISTANCE, FIELD_TOTAL_DISTANCE_FORMATTED, FIELD_TOTAL_TIME,
-                       FIELD_TOTAL_TIME_FORMATTED, FIELD_MERGE_INFO)
+                       FIELD_TOTAL_TIME_FORMATTED, FIELD_LAP_COUNT, FIELD_VALID_LAP_COUNT, FIELD_MERGE_INFO, MONGO_INDEXES,
+                       COLLECTION_DETAILED_PACKED, PACKED_FORMAT, PACKED_LAP_FIELDS, PACKED_NUMERIC_COLUMNS,
+                       TRACKPOINTS_PAGE_SIZE, TRACKPOINTS_MAX_PAGE_SIZE, COLLECTION_RUNS, RUNS_FORMAT,
+                       COLLECTION_PERSONAL_RECORDS, COLLECTION_DATASET_VERSION, DATASET_VERSION_ID,
+                       RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL_S, DATASET_VERSION_POLL_INTERVAL_S,
+                       MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, QUERY_CONCURRENCY_DEFAULT,
+                       SUMMARY_CURSOR_BATCH_SIZE, DETAILED_CURSOR_BATCH_SIZE, PACKED_CURSOR_BATCH_SIZE)
+    from response_cache import ResponseCache
+    from metrics import (MetricsRegistry, MetricsDirectory, MongoCommandMetrics, REQUEST_SECONDS, PHASE_SECONDS, start_request,
+                         current_timings, end_request, phase, timed)
+    from http_cache import (release_tag, choose_encoding, compress_body, body_digest, MIN_COMPRESS_SIZE,
+                            COMPRESSIBLE_MIMETYPES)
 except ImportError as e:
     print(f"Import error: {e}")
     print(f"Current working directory: {os.getcwd()}")
@@ -28,6 +50,8 @@ except ImportError as e:
 
 # Setup logging
 logger = setup_webapp_logging()
+# One JSON line per request with its phase timings, when METRICS=on
+timing_logger = logging.getLogger("webapp.timing")
 
 app = Flask(__name__)
 
@@ -37,36 +61,256 @@ DEBUG = False  # Always False in production
 MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017')
 DATABASE_NAME = os.getenv('DATABASE_NAME', 'RunningTracker')
 
+# Connections each serving process may open; size it to the threads per worker
+MONGO_POOL_MAX = int(os.getenv('MONGO_MAX_POOL_SIZE', MONGO_MAX_POOL_SIZE))
+MONGO_POOL_MIN = int(os.getenv('MONGO_MIN_POOL_SIZE', MONGO_MIN_POOL_SIZE))
+
+# Threads per process that run a request's independent queries concurrently; 1 runs them in order
+QUERY_CONCURRENCY = int(os.getenv('QUERY_CONCURRENCY', QUERY_CONCURRENCY_DEFAULT))
+
+# Where detailed trackpoints are sampled: "server" (MongoDB aggregation) or "client" (Python)
+DETAILED_SAMPLING = os.getenv('DETAILED_SAMPLING', 'server')
+
+# Where per-file totals and lap counts are computed: "server" ($group aggregation) or "client" (Python)
+FILE_SUMMARIES = os.getenv('FILE_SUMMARIES', 'server')
+
+# Cache of rendered pages and per-run data, keyed on the dataset version ingest bumps.
+# RESPONSE_CACHE=off disables it.
+RESPONSE_CACHE = os.getenv('RESPONSE_CACHE', 'on') != 'off'
+response_cache = ResponseCache(
+    int(os.getenv('RESPONSE_CACHE_SIZE', RESPONSE_CACHE_MAX_ENTRIES)) if RESPONSE_CACHE else 0,
+    float(os.getenv('RESPONSE_CACHE_TTL', RESPONSE_CACHE_TTL_S)),
+)
+
+# Opt-in request instrumentation: Server-Timing headers, timing log lines, /metrics and
+# MongoDB command latency. METRICS=on enables it
+METRICS = os.getenv('METRICS', 'off') == 'on'
+metrics_registry = MetricsRegistry()
+# Registries are per process; with several workers they share snapshots through METRICS_DIR
+METRICS_DIR = os.getenv('METRICS_DIR')
+metrics_directory = MetricsDirectory(METRICS_DIR) if METRICS and METRICS_DIR else None
+
+DATASET_VERSION_POLL_S = float(os.getenv('DATASET_VERSION_POLL', DATASET_VERSION_POLL_INTERVAL_S))
+
+# Part of every ETag: a new deploy must not be answered with 304 for pages rendered by the old one
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+RELEASE = release_tag([os.path.join(_APP_DIR, name) for name in ("app.py", "const.py", "templates")])
+
+# Ingest-maintained dataset version and the time of the ingest that set it
+DatasetVersion = namedtuple('DatasetVersion', ['version', 'updated_at'])
+_dataset_version = {"checked_at": None, "value": None}
+
 # Only enable debug mode if explicitly set by server admin
 if os.getenv('FLASK_DEBUG') == 'true':
     DEBUG = True
 
-# Global client variable for proper resource management
+# Per-request detailed data: {source: {lap number: altitude delta}} and {source: [sampled rows]}
+DetailedView = namedtuple('DetailedView', ['lap_deltas', 'samples'])
+
+# Merge info shared by every cell hidden under a rowspan; templates only read it
+_HIDDEN_CELL = {"show": False, "rowspan": 1}
+
+# Global client variable for proper resource management. MongoClient is not fork-safe, so
+# the client remembers the process that created it and a forked worker opens its own
 client = None
 db = None
+_client_pid = None
+_client_lock = threading.Lock()
 
 def get_db_connection():
     """Get database connection with proper error handling"""
-    global client, db
-    if client is None:
-        try:
-            client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
-            db = client[DATABASE_NAME]
-            # Test connection
-            client.server_info()
-            logger.info(f"Successfully connected to MongoDB: {DATABASE_NAME}")
-        except Exception as e:
-            logger.error(f"Failed to connect to MongoDB: {e}")
-            raise
+    global client, db, _client_pid
+    if client is not None and _client_pid == os.getpid():
+        return db
+    with _client_lock:
+        if client is None or _client_pid != os.getpid():
+            try:
+                # Never close a client inherited across fork; its sockets belong to the parent
+                new_client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000,
+                                         maxPoolSize=MONGO_POOL_MAX, minPoolSize=MONGO_POOL_MIN,
+                                         event_listeners=[MongoCommandMetrics(metrics_registry)] if METRICS else [])
+                # Test connection
+                new_client.server_info()
+                logger.info(f"Successfully connected to MongoDB: {DATABASE_NAME} (pid {os.getpid()})")
+                ensure_indexes(new_client[DATABASE_NAME])
+            except Exception as e:
+                logger.error(f"Failed to connect to MongoDB: {e}")
+                client = db = _client_pid = None
+                raise
+            client, db, _client_pid = new_client, new_client[DATABASE_NAME], os.getpid()
     return db
 
+_query_pool = None
+_query_pool_pid = None
+
+def _query_executor():
+    """The process's query thread pool; threads do not survive fork, so each worker makes its own"""
+    global _query_pool, _query_pool_pid
+    if _query_pool is None or _query_pool_pid != os.getpid():
+        with _client_lock:
+            if _query_pool is None or _query_pool_pid != os.getpid():
+                _query_pool = ThreadPoolExecutor(max_workers=QUERY_CONCURRENCY, thread_name_prefix="query")
+                _query_pool_pid = os.getpid()
+    return _query_pool
+
+def run_concurrently(*calls):
+    """
+    Run independent zero-argument data-access calls on the query pool and return their
+    results in call order, re-raising the first failure. Calls must not submit to the pool themselves.
+    """
+    if QUERY_CONCURRENCY <= 1 or len(calls) < 2:
+        return [call() for call in calls]
+    # Each call runs in a copy of the request's context so its timings reach the request
+    futures = [_query_executor().submit(contextvars.copy_context().run, call) for call in calls]
+    return [future.result() for future in futures]
+
+def ensure_indexes(db):
+    """Create the indexes the dashboard queries rely on; a no-op when they already exist"""
+    for collection_name, indexes in MONGO_INDEXES.items():
+        for name, keys in indexes:
+            try:
+                db[collection_name].create_index(keys, name=name)
+            except Exception as e:
+                # Missing indexes only slow queries down, so keep serving
+                logger.warning(f"Could not create index {collection_name}.{name}: {e}")
+
 def close_db_connection():
-    """Close database connection properly"""
-    global client, db
-    if client:
-        client.close()
-        client = None
-        db = None
+    """Close this process's database connection; registered to run at interpreter exit"""
+    global client, db, _client_pid
+    with _client_lock:
+        if client is not None and _client_pid == os.getpid():
+            client.close()
+            logger.info("Closed MongoDB connection")
+        client = db = _client_pid = None
+
+atexit.register(close_db_connection)
+
+def get_dataset_state():
+    """
+    The ingest-maintained DatasetVersion, or None if it cannot be read. MongoDB is asked at
+    most once every DATASET_VERSION_POLL_S seconds; in between the last answer is reused.
+    """
+    now = time.monotonic()
+    checked_at = _dataset_version["checked_at"]
+    if checked_at is not None and now - checked_at < DATASET_VERSION_POLL_S:
+        return _dataset_version["value"]
+    try:
+        doc = get_db_connection()[COLLECTION_DATASET_VERSION].find_one({COL_ID: DATASET_VERSION_ID})
+    except Exception as e:
+        logger.warning(f"Could not read dataset version: {e}")
+        return None
+
+    # Before the first versioned ingest the data counts as version 0
+    updated_at = doc.get("updated_at") if doc else None
+    if isinstance(updated_at, datetime) and updated_at.tzinfo is None:
+        # pymongo returns naive UTC datetimes
+        updated_at = updated_at.replace(tzinfo=timezone.utc)
+    value = DatasetVersion(doc.get("version", 0) if doc else 0, updated_at)
+    _dataset_version.update(checked_at=now, value=value)
+    return value
+
+def get_dataset_version():
+    """The ingest-maintained dataset version (0 before the first versioned ingest), or None if unreadable"""
+    state = get_dataset_state()
+    return None if state is None else state.version
+
+def _cache_key(*parts):
+    """Response cache key for the current dataset version, or None when nothing should be cached"""
+    if not response_cache.enabled:
+        return None
+    version = get_dataset_version()
+    return None if version is None else (version,) + parts
+
+def _not_modified(etag):
+    """
+    Whether the request's ETag shows the client already has this version. If-Modified-Since
+    alone is never trusted: Last-Modified only tracks ingests, not deploys of new code or templates.
+    """
+    return bool(request.if_none_match) and request.if_none_match.contains_weak(etag)
+
+def conditional_on_dataset(view):
+    """
+    Tag a view's 200 responses with an ETag/Last-Modified derived from the dataset version,
+    and answer matching conditional requests with 304 before the view runs, so neither
+    MongoDB nor the template engine is touched.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        state = get_dataset_state()
+        if state is None:
+            return view(*args, **kwargs)
+        etag = f"{state.version}-{RELEASE}"
+        if _not_modified(etag):
+            response = app.response_class(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            # Error pages (even those sent as 200) must not be pinned to the version by a 304
+            if response.status_code != 200 or g.get("render_failed"):
+                return response
+        # Weak: the same version may be sent gzip-, brotli- or un-encoded
+        response.set_etag(etag, weak=True)
+        if state.updated_at is not None:
+            response.last_modified = state.updated_at
+        # Browsers must revalidate, which is a cheap 304 until the next ingest
+        response.cache_control.no_cache = True
+        response.vary.add("Accept-Encoding")
+        return response
+    return wrapper
+
+@app.before_request
+def start_request_timing():
+    if METRICS:
+        start_request()
+
+@app.after_request
+def record_request_timing(response):
+    """Server-Timing header, timing log line and metrics for the request; runs after compression"""
+    timings = current_timings()
+    if timings is None:
+        return response
+    total = timings.elapsed()
+    endpoint = request.endpoint or "unmatched"
+    response.headers["Server-Timing"] = timings.server_timing(total)
+    metrics_registry.observe(REQUEST_SECONDS, total, endpoint=endpoint, status=str(response.status_code))
+    for name, seconds in timings.phases.items():
+        metrics_registry.observe(PHASE_SECONDS, seconds, endpoint=endpoint, phase=name)
+    if metrics_directory is not None:
+        metrics_directory.publish(metrics_registry)
+    timing_logger.info(json.dumps({
+        "method": request.method, "path": request.path, "endpoint": endpoint, "status": response.status_code,
+        "total_ms": round(total * 1000, 2),
+        "phases_ms": {name: round(seconds * 1000, 2) for name, seconds in timings.phases.items()},
+    }, separators=(",", ":")))
+    return response
+
+@app.teardown_request
+def end_request_timing(error):
+    end_request()
+
+@app.after_request
+def compress_response(response):
+    """gzip/brotli-encode text responses for clients that accept it"""
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES or "Content-Encoding" in response.headers):
+        return response
+    encoding = choose_encoding(request.accept_encodings)
+    data = response.get_data()
+    if encoding is None or len(data) < MIN_COMPRESS_SIZE:
+        return response
+
+    etag, _ = response.get_etag()
+    if etag:
+        # Versioned pages repeat byte for byte; reuse the compressed body keyed on those bytes
+        with phase("compress"):
+            body = response_cache.get_or_compute(("encoded", body_digest(data), encoding),
+                                                 lambda: compress_body(data, encoding))
+    else:
+        with phase("compress"):
+            body = compress_body(data, encoding)
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    return response
 
 @app.template_filter('regex_search')
 def regex_search(s, pattern):
@@ -139,43 +383,193 @@ def _is_valid_lap(lap):
     except (ValueError, TypeError):
         return False
 
-def _calculate_lap_altitude_delta(lap, source_detailed):
-    """Calculate altitude delta for a single lap"""
-    lap_num = lap.get(COL_LAP_NUMBER)
-    if lap_num is None:
-        return 0
+def _calculate_lap_altitude_deltas(source_detailed):
+    """Altitude delta per lap number for one run, in a single pass over its trackpoints"""
+    deltas = {}
+    previous = {}
+    invalid = set()
+    for point in source_detailed:
+        lap_num = point.get(COL_LAP_NUMBER)
+        altitude = point.get(COL_ALTITUDE_M)
+        if lap_num is None or altitude is None or lap_num in invalid:
+            continue
+        try:
+            altitude = float(altitude)
+        except (ValueError, TypeError):
+            # One bad altitude voids the whole lap, as before
+            invalid.add(lap_num)
+            continue
+        if lap_num in previous:
+            deltas[lap_num] += altitude - previous[lap_num]
+        else:
+            deltas[lap_num] = 0
+        previous[lap_num] = altitude
 
-    lap_points = [p for p in source_detailed
-                  if p.get(COL_LAP_NUMBER) == lap_num and p.get(COL_ALTITUDE_M) is not None]
+    for lap_num in invalid:
+        deltas[lap_num] = 0
+    return deltas
 
-    if not lap_points:
-        return 0
+def _unpack_lap_document(doc):
+    """Expand a packed lap document into per-trackpoint rows shaped like the rows layout"""
+    count = doc.get("count", 0)
+    points = doc["points"]
+    times = zlib.decompress(points[COL_TIME]).decode("utf-8").split("\n") if count else []
+    columns = [(COL_TIME, [t or None for t in times])]
+    for col in PACKED_NUMERIC_COLUMNS:
+        values = array("d")
+        values.frombytes(zlib.decompress(points[col]))
+        if sys.byteorder == "big":
+            values.byteswap()
+        columns.append((col, values))
 
-    try:
-        altitudes = [float(p[COL_ALTITUDE_M]) for p in lap_points]
-        return sum(altitudes[i] - altitudes[i-1] for i in range(1, len(altitudes)))
-    except (ValueError, TypeError):
-        return 0
+    lap_fields = {k: doc.get(k) for k in PACKED_LAP_FIELDS}
+    rows = []
+    for i in range(count):
+        row = dict(lap_fields)
+        for col, values in columns:
+            row[col] = values[i]
+        row[COL_SOURCE_FILE] = doc.get(COL_SOURCE_FILE)
+        rows.append(row)
+    return rows
 
-def _calculate_altitude_deltas(grouped, db):
-    """Calculate altitude deltas for all laps in grouped data"""
-    # Optimize: Load all detailed data once instead of per source (N+1 fix)
-    # Use safe query with no user input
-    query = {}
+def _packed_sources(db, source_query=None):
+    """Source files stored in the packed layout, optionally limited to one source"""
+    query = dict(source_query or {}, format=PACKED_FORMAT)
+    return {source for source in db[COLLECTION_DETAILED_PACKED].distinct(COL_SOURCE_FILE, query)
+            if isinstance(source, str)}
+
+def _iter_packed_rows(db, source_query=None):
+    """Stream packed-layout trackpoints as rows, one lap document in memory at a time"""
+    # Queries only ever match on a validated source file name
     projection = {COL_ID: 0}
-    all_detailed = list(db[COLLECTION_DETAILED].find(query, projection).sort(COL_TIME, 1))
-    detailed_by_source = defaultdict(list)
+    packed_docs = db[COLLECTION_DETAILED_PACKED].find(
+        source_query or {}, projection, batch_size=PACKED_CURSOR_BATCH_SIZE
+    ).sort([(COL_SOURCE_FILE, 1), (COL_LAP_NUMBER, 1)])
+    for doc in packed_docs:
+        if doc.get("format") != PACKED_FORMAT:
+            continue
+        try:
+            rows = _unpack_lap_document(doc)
+        except (KeyError, ValueError, zlib.error) as e:
+            logger.warning(f"Skipping unreadable packed lap document: {e}")
+            continue
+        yield from rows
 
-    # Group detailed data by source
-    for row in all_detailed:
-        source = row.get(COL_SOURCE_FILE, "Unknown")
-        detailed_by_source[source].append(row)
+def _rows_layout_query(packed_sources, source_query=None):
+    """A file lives in one layout; skip per-trackpoint leftovers of files already packed"""
+    if not packed_sources:
+        return dict(source_query or {})
+    exclude_packed = {COL_SOURCE_FILE: {"$nin": sorted(packed_sources)}}
+    return {"$and": [source_query, exclude_packed]} if source_query else exclude_packed
+
+def _iter_detailed_rows(db, source_query=None):
+    """
+    Stream detailed trackpoints from both storage layouts. Rows arrive grouped by source
+    file and in time order within each source, so callers can work one run at a time.
+    """
+    query = _rows_layout_query(_packed_sources(db, source_query), source_query)
+    # Sorted like the source_lap_time index, so MongoDB streams it without an in-memory sort
+    yield from db[COLLECTION_DETAILED].find(query, {COL_ID: 0}, batch_size=DETAILED_CURSOR_BATCH_SIZE).sort(
+        [(COL_SOURCE_FILE, 1), (COL_LAP_NUMBER, 1), (COL_TIME, 1)])
+    yield from _iter_packed_rows(db, source_query)
+
+def _detailed_view_from_rows(detailed_rows, with_samples=True, with_lap_deltas=True):
+    """
+    Lap altitude deltas and sampled rows computed in Python in one pass over trackpoint rows
+    grouped by source. Only the sampled rows are kept, so memory is bounded by the output.
+    """
+    view = DetailedView({}, {})
+    for source, rows in groupby(detailed_rows, key=lambda row: row.get(COL_SOURCE_FILE, "Unknown")):
+        if with_samples:
+            samples = view.samples.setdefault(source, [])
+            rows = _sampling_tap(rows, samples)
+        if with_lap_deltas:
+            view.lap_deltas.setdefault(source, {}).update(_calculate_lap_altitude_deltas(rows))
+        else:
+            # Drain the rows through the sampling tap
+            deque(rows, maxlen=0)
+    return view
+
+def _sample_bucket_expr():
+    """
+    Aggregation twin of _sample_bucket: the DETAILED_DATA_SAMPLE_INTERVAL-second window of
+    elapsed time since the run's first trackpoint, from the fields set by _sampling_pipeline
+    """
+    return {"$floor": {"$divide": [
+        {"$subtract": ["$_sample_ms", "$_run_start_ms"]},
+        DETAILED_DATA_SAMPLE_INTERVAL * 1000,
+    ]}}
+
+def _lap_altitude_delta_pipeline(match):
+    """Per-lap altitude delta; the sum of consecutive differences telescopes to last minus first"""
+    return [
+        {"$match": dict(match, **{COL_LAP_NUMBER: {"$ne": None}, COL_ALTITUDE_M: {"$type": "number"}})},
+        {"$group": {
+            "_id": {"source": "$" + COL_SOURCE_FILE, "lap": "$" + COL_LAP_NUMBER},
+            "first": {"$top": {"sortBy": {COL_TIME: 1}, "output": "$" + COL_ALTITUDE_M}},
+            "last": {"$bottom": {"sortBy": {COL_TIME: 1}, "output": "$" + COL_ALTITUDE_M}},
+        }},
+        {"$project": {"_id": 0, "source": "$_id.source", "lap": "$_id.lap",
+                      "delta": {"$subtract": ["$last", "$first"]}}},
+    ]
+
+def _sampling_pipeline(match):
+    """First trackpoint of every sampling window per source, so only sampled rows leave the server"""
+    return [
+        {"$match": match},
+        {"$set": {"_sample_ms": {"$toLong": {"$dateFromString": {
+            "dateString": "$" + COL_TIME, "onError": None, "onNull": None}}}}},
+        # The run's start, so windows count elapsed time like the Python path; no window means
+        # the whole partition, so no sort on Time is needed
+        {"$setWindowFields": {"partitionBy": "$" + COL_SOURCE_FILE,
+                              "output": {"_run_start_ms": {"$min": "$_sample_ms"}}}},
+        {"$group": {
+            "_id": {"source": "$" + COL_SOURCE_FILE, "bucket": _sample_bucket_expr()},
+            "row": {"$top": {"sortBy": {COL_TIME: 1}, "output": "$$ROOT"}},
+        }},
+        {"$replaceRoot": {"newRoot": "$row"}},
+        {"$project": {COL_ID: 0, "_sample_ms": 0, "_run_start_ms": 0}},
+        {"$sort": {COL_TIME: 1}},
+    ]
+
+def _load_detailed_view_server(db, source_query=None, with_samples=True, with_lap_deltas=True):
+    """Sample and compute lap deltas inside MongoDB; packed files are streamed through Python"""
+    view = _detailed_view_from_rows(_iter_packed_rows(db, source_query), with_samples, with_lap_deltas)
+    match = _rows_layout_query(_packed_sources(db, source_query), source_query)
+    collection = db[COLLECTION_DETAILED]
 
+    if with_lap_deltas:
+        for doc in collection.aggregate(_lap_altitude_delta_pipeline(match), allowDiskUse=True):
+            view.lap_deltas.setdefault(doc.get("source", "Unknown"), {})[doc.get("lap")] = doc.get("delta")
+    if with_samples:
+        for row in collection.aggregate(_sampling_pipeline(match), allowDiskUse=True):
+            view.samples.setdefault(row.get(COL_SOURCE_FILE, "Unknown"), []).append(row)
+    return view
+
+def _sources_query(sources):
+    """Match on a list of validated source file names, or None for every source"""
+    return {COL_SOURCE_FILE: {"$in": list(sources)}} if sources is not None else None
+
+def load_detailed_view(source=None, with_samples=True, sources=None, with_lap_deltas=True):
+    """Lap altitude deltas and sampled detail rows for every run, for one source file or for `sources`"""
+    db = get_db_connection()
+    source_query = {COL_SOURCE_FILE: source} if source is not None else _sources_query(sources)
+    if DETAILED_SAMPLING == "server":
+        try:
+            return _load_detailed_view_server(db, source_query, with_samples, with_lap_deltas)
+        except Exception as e:
+            # e.g. MongoDB older than 5.2 ($top/$bottom); fall back to one full pass
+            logger.warning(f"Server-side sampling failed, sampling in Python: {e}")
+    return _detailed_view_from_rows(_iter_detailed_rows(db, source_query), with_samples, with_lap_deltas)
+
+@timed("altitude_deltas")
+def _calculate_altitude_deltas(grouped, lap_deltas):
+    """Calculate altitude deltas for all laps in grouped data"""
     for source, laps in grouped.items():
-        source_detailed = detailed_by_source.get(source, [])
+        source_deltas = lap_deltas.get(source, {})
 
         for lap in laps:
-            lap[COL_ALTITUDE_DELTA_M] = _calculate_lap_altitude_delta(lap, source_detailed)
+            lap[COL_ALTITUDE_DELTA_M] = source_deltas.get(lap.get(COL_LAP_NUMBER), 0)
             lap[COL_ALTITUDE_DELTA_FORMATTED] = format_altitude(lap[COL_ALTITUDE_DELTA_M])
 
 def _format_summary_data(summary_data):
@@ -200,18 +594,103 @@ def _build_all_laps(grouped):
             all_laps.append(row_copy)
     return all_laps
 
-def load_summary_data():
+def load_grouped_summary(sources=None):
+    """Every summary lap, or those of `sources`, formatted and grouped by source"""
     db = get_db_connection()
     # Use safe query with no user input
-    query = {}
+    query = _sources_query(sources) or {}
     projection = {COL_ID: 0}
-    summary_data = list(db[COLLECTION_SUMMARY].find(query, projection))
-    grouped = _format_summary_data(summary_data)
-    _calculate_altitude_deltas(grouped, db)
+    summary_data = db[COLLECTION_SUMMARY].find(query, projection, batch_size=SUMMARY_CURSOR_BATCH_SIZE)
+    return _format_summary_data(summary_data)
+
+def load_summary_data(lap_deltas=None):
+    grouped = load_grouped_summary()
+    if lap_deltas is None:
+        lap_deltas = load_detailed_view().lap_deltas
+    _calculate_altitude_deltas(grouped, lap_deltas)
     all_laps = _build_all_laps(grouped)
     return grouped, all_laps
 
-def calculate_file_summaries(grouped):
+def _file_summary(source, total_distance, total_time, run_date=None, lap_count=None, valid_lap_count=None):
+    """Dashboard entry for one source file; run_date is used when the file name carries no date"""
+    date = extract_date_from_filename(source)
+    return {
+        FIELD_SOURCE: source,
+        FIELD_DATE: run_date if date == source and run_date else date,
+        FIELD_TOTAL_DISTANCE: total_distance,
+        FIELD_TOTAL_DISTANCE_FORMATTED: format_distance(total_distance),
+        FIELD_TOTAL_TIME: total_time,
+        FIELD_TOTAL_TIME_FORMATTED: format_seconds(total_time),
+        FIELD_LAP_COUNT: lap_count,
+        FIELD_VALID_LAP_COUNT: valid_lap_count,
+    }
+
+def _lap_number_expr(field):
+    """Aggregation twin of float(lap.get(field, 0)): null when the value would not convert"""
+    return {"$cond": [
+        {"$eq": [{"$type": "$" + field}, "missing"]},
+        0,
+        {"$convert": {"input": "$" + field, "to": "double", "onError": None, "onNull": None}},
+    ]}
+
+def _file_laps_pipeline(sources=None):
+    """
+    Summary laps grouped by source, one document per run holding its laps in read order
+    along with their totals and counts. Sources with a lap value that does not convert
+    report invalid_values so totals can be zeroed like the Python path does.
+    """
+    match = [{"$match": _sources_query(sources)}] if sources is not None else []
+    return match + [
+        {"$unset": COL_ID},
+        {"$project": {
+            "lap": "$$ROOT",
+            COL_SOURCE_FILE: {"$ifNull": ["$" + COL_SOURCE_FILE, "Unknown"]},
+            COL_LAP_DISTANCE_M: _lap_number_expr(COL_LAP_DISTANCE_M),
+            COL_LAP_TOTAL_TIME_S: _lap_number_expr(COL_LAP_TOTAL_TIME_S),
+        }},
+        {"$group": {
+            "_id": "$" + COL_SOURCE_FILE,
+            "laps": {"$push": "$lap"},
+            "total_distance": {"$sum": "$" + COL_LAP_DISTANCE_M},
+            "total_time": {"$sum": "$" + COL_LAP_TOTAL_TIME_S},
+            "lap_count": {"$sum": 1},
+            "valid_lap_count": {"$sum": {"$cond": [{"$gte": ["$" + COL_LAP_DISTANCE_M, MIN_VALID_LAP_DISTANCE]}, 1, 0]}},
+            "invalid_values": {"$sum": {"$cond": [{"$or": [
+                {"$eq": ["$" + COL_LAP_DISTANCE_M, None]}, {"$eq": ["$" + COL_LAP_TOTAL_TIME_S, None]},
+            ]}, 1, 0]}},
+        }},
+    ]
+
+def load_file_laps(sources=None):
+    """
+    (grouped laps, {source: totals document}) from a single $group over the summary
+    collection. With FILE_SUMMARIES=client, or when the aggregation fails, the laps are
+    read with find() instead and totals are left to Python (None).
+    """
+    if FILE_SUMMARIES == "server":
+        db = get_db_connection()
+        try:
+            docs = list(db[COLLECTION_SUMMARY].aggregate(_file_laps_pipeline(sources), allowDiskUse=True))
+        except Exception as e:
+            logger.warning(f"File laps aggregation failed, reading laps and summing in Python: {e}")
+        else:
+            laps = [lap for doc in docs for lap in doc.pop("laps")]
+            return _format_summary_data(laps), {doc[COL_ID]: doc for doc in docs}
+    return load_grouped_summary(sources), None
+
+def _python_file_totals(laps, valid):
+    try:
+        total_distance = sum(float(l.get(COL_LAP_DISTANCE_M, 0)) for l in laps)
+        total_time = sum(float(l.get(COL_LAP_TOTAL_TIME_S, 0)) for l in laps)
+    except (ValueError, TypeError):
+        total_distance = total_time = 0
+    return total_distance, total_time, len(laps), len(valid)
+
+def calculate_file_summaries(grouped, file_totals=None):
+    """
+    File summaries plus every and valid lap per source. Totals come from file_totals
+    (see load_file_laps) when it covers the source, otherwise they are summed here.
+    """
     file_summaries = []
     file_all_laps = {}
     file_valid_laps = {}
@@ -219,22 +698,27 @@ def calculate_file_summaries(grouped):
         valid = [l for l in laps if _is_valid_lap(l)]
         file_all_laps[source] = laps
         file_valid_laps[source] = valid
-        try:
-            total_distance = sum(float(l.get(COL_LAP_DISTANCE_M, 0)) for l in laps)
-            total_time = sum(float(l.get(COL_LAP_TOTAL_TIME_S, 0)) for l in laps)
-        except (ValueError, TypeError):
+        totals = (file_totals or {}).get(source)
+        if totals is None:
+            total_distance, total_time, lap_count, valid_lap_count = _python_file_totals(laps, valid)
+        elif totals.get("invalid_values"):
             total_distance = total_time = 0
-        total_time_formatted = format_seconds(total_time)
-        file_summaries.append({
-            FIELD_SOURCE: source,
-            FIELD_DATE: extract_date_from_filename(source),
-            FIELD_TOTAL_DISTANCE: total_distance,
-            FIELD_TOTAL_DISTANCE_FORMATTED: format_distance(total_distance),
-            FIELD_TOTAL_TIME: total_time,
-            FIELD_TOTAL_TIME_FORMATTED: total_time_formatted
-        })
+            lap_count, valid_lap_count = totals["lap_count"], totals["valid_lap_count"]
+        else:
+            total_distance, total_time = totals["total_distance"], totals["total_time"]
+            lap_count, valid_lap_count = totals["lap_count"], totals["valid_lap_count"]
+        file_summaries.append(_file_summary(source, total_distance, total_time,
+                                            lap_count=lap_count, valid_lap_count=valid_lap_count))
     return file_summaries, file_all_laps, file_valid_laps
 
+def _longest_files(file_summaries):
+    try:
+        longest_distance_file = max(file_summaries, key=lambda x: x[FIELD_TOTAL_DISTANCE], default=None)
+        longest_time_file = max(file_summaries, key=lambda x: x[FIELD_TOTAL_TIME], default=None)
+    except (ValueError, TypeError):
+        longest_distance_file = longest_time_file = None
+    return longest_distance_file, longest_time_file
+
 def find_records(all_laps, file_summaries):
     valid_laps = [lap for lap in all_laps if _is_valid_lap(lap)]
 
@@ -243,130 +727,451 @@ def find_records(all_laps, file_summaries):
         slowest_lap = max((lap for lap in valid_laps if lap.get(COL_LAP_TOTAL_TIME_S) is not None), key=lambda x: float(x[COL_LAP_TOTAL_TIME_S]), default=None)
     except (ValueError, TypeError):
         fastest_lap = slowest_lap = None
+    longest_distance_file, longest_time_file = _longest_files(file_summaries)
+
+    return fastest_lap, slowest_lap, longest_distance_file, longest_time_file
+
+def _run_laps(run):
+    """A run document's laps, shaped and formatted like summary rows with their altitude deltas"""
+    source = run[COL_SOURCE_FILE]
+    deltas = run.get("lap_altitude_deltas", {})
+    laps = [dict(lap, **{COL_SOURCE_FILE: source}) for lap in run.get("laps", [])]
+    laps = _format_summary_data(laps).get(source, [])
+    for lap in laps:
+        # Run documents key the deltas by lap number as a string
+        lap[COL_ALTITUDE_DELTA_M] = deltas.get(str(lap.get(COL_LAP_NUMBER)), 0)
+        lap[COL_ALTITUDE_DELTA_FORMATTED] = format_altitude(lap[COL_ALTITUDE_DELTA_M])
+    return laps
+
+def _record_lap(lap, source):
+    """A fastest/slowest lap tagged with its source file and formatted for the Records panel"""
+    if not lap or lap.get(COL_LAP_TOTAL_TIME_S) is None:
+        return None
+    lap = dict(lap, **{COL_SOURCE_FILE: source})
+    lap[COL_LAP_TOTAL_TIME_FORMATTED] = format_seconds(lap[COL_LAP_TOTAL_TIME_S])
+    return lap
+
+def _record_file(record):
+    """A longest distance/time record shaped like a file summary"""
+    if not record:
+        return None
+    return _file_summary(record[COL_SOURCE_FILE], record.get("total_distance_m") or 0,
+                         record.get("total_time_s") or 0, record.get("date"))
+
+def load_personal_records(db):
+    """
+    The four Records panel entries from the incrementally maintained records collection,
+    or None when ingest has not written it yet
+    """
+    records = {doc[COL_ID]: doc for doc in db[COLLECTION_PERSONAL_RECORDS].find({})}
+    if not records:
+        return None
+    fastest, slowest = records.get("fastest_lap"), records.get("slowest_lap")
+    return (
+        _record_lap(fastest.get("lap"), fastest[COL_SOURCE_FILE]) if fastest else None,
+        _record_lap(slowest.get("lap"), slowest[COL_SOURCE_FILE]) if slowest else None,
+        _record_file(records.get("longest_distance")),
+        _record_file(records.get("longest_time")),
+    )
+
+def load_dashboard_from_summary(sources=None):
+    """
+    Dashboard data computed from the summary and detailed collections, for every source or
+    only for `sources`. Detail tables are fetched per run when expanded; only lap deltas are
+    needed here. The summary laps and their totals come from one read, independent of the
+    detailed one.
+    """
+    detailed_view, (grouped, file_totals) = run_concurrently(
+        lambda: load_detailed_view(with_samples=False, sources=sources),
+        lambda: load_file_laps(sources),
+    )
+    _calculate_altitude_deltas(grouped, detailed_view.lap_deltas)
+    file_summaries, file_all_laps, file_valid_laps = calculate_file_summaries(grouped, file_totals)
+    return grouped, file_summaries, file_all_laps, file_valid_laps
+
+def _best_lap(laps, pick):
     try:
-        longest_distance_file = max(file_summaries, key=lambda x: x[FIELD_TOTAL_DISTANCE], default=None)
-        longest_time_file = max(file_summaries, key=lambda x: x[FIELD_TOTAL_TIME], default=None)
+        return pick((lap for lap in laps if lap), key=lambda lap: float(lap[COL_LAP_TOTAL_TIME_S]), default=None)
     except (ValueError, TypeError):
-        longest_distance_file = longest_time_file = None
+        return None
 
-    return fastest_lap, slowest_lap, longest_distance_file, longest_time_file
+def load_dashboard_from_runs():
+    """
+    Dashboard data read from the pre-computed runs collection, one document per run.
+    Sources in the summary collection without a runs document (ingested before the
+    collection existed) are computed from the summary and detailed collections.
+    Returns None when the runs collection has not been built yet, so the caller can
+    fall back to computing everything that way.
+    """
+    db = get_db_connection()
+    runs, records, summary_sources = run_concurrently(
+        lambda: [run for run in db[COLLECTION_RUNS].find({}, {COL_ID: 0})
+                 if run.get("format") == RUNS_FORMAT and run.get(COL_SOURCE_FILE)],
+        lambda: load_personal_records(db),
+        # Served from the source_lap index
+        lambda: db[COLLECTION_SUMMARY].distinct(COL_SOURCE_FILE),
+    )
+    if not runs:
+        return None
+
+    grouped = {}
+    file_summaries = []
+    for run in runs:
+        source = run[COL_SOURCE_FILE]
+        grouped[source] = _run_laps(run)
+        file_summaries.append(_file_summary(source, run.get("total_distance_m", 0), run.get("total_time_s", 0),
+                                            run.get("date"), run.get("lap_count"), run.get("valid_lap_count")))
+    file_valid_laps = {source: [lap for lap in laps if _is_valid_lap(lap)] for source, laps in grouped.items()}
 
-def _calculate_merge_info(filtered_data, i):
-    """Calculate merge info for table cell merging"""
-    merge_info = {}
+    missing = sorted(source for source in summary_sources if isinstance(source, str) and source not in grouped)
+    if missing:
+        logger.info(f"{len(missing)} run(s) have no runs document, computing them from their laps")
+        legacy_grouped, legacy_summaries, _, legacy_valid_laps = load_dashboard_from_summary(missing)
+        grouped.update(legacy_grouped)
+        file_summaries += legacy_summaries
+        file_valid_laps.update(legacy_valid_laps)
+
+    if records is None or missing:
+        # The records collection is maintained from runs documents only, so it cannot hold legacy runs
+        if records is None:
+            fastest = [_record_lap(run.get("fastest_lap"), run[COL_SOURCE_FILE]) for run in runs]
+            slowest = [_record_lap(run.get("slowest_lap"), run[COL_SOURCE_FILE]) for run in runs]
+        else:
+            fastest, slowest = [records[0]], [records[1]]
+        if missing:
+            legacy_fastest, legacy_slowest, _, _ = find_records(_build_all_laps(legacy_grouped), [])
+            fastest.append(legacy_fastest)
+            slowest.append(legacy_slowest)
+        records = (_best_lap(fastest, min), _best_lap(slowest, max), *_longest_files(file_summaries))
+    return grouped, file_summaries, grouped, file_valid_laps, records
+
+@timed("merge_info")
+def _calculate_table_merge_info(rows):
+    """Cell-merge info for every row of a table, from one run-length pass per merge column"""
+    merge_info = [{} for _ in rows]
     for col in MERGE_COLUMNS:
-        if col in filtered_data[i]:
-            # Check if this is the first occurrence of this value
-            is_first = i == 0 or (i > 0 and filtered_data[i-1].get(col) != filtered_data[i][col])
-
-            if is_first:
-                # Count consecutive rows with same value
-                rowspan = 1
-                for j in range(i + 1, len(filtered_data)):
-                    if filtered_data[j].get(col) == filtered_data[i][col]:
-                        rowspan += 1
-                    else:
-                        break
-                merge_info[col] = {"show": True, "rowspan": rowspan}
-            else:
-                merge_info[col] = {"show": False, "rowspan": 1}
+        present = [col in row for row in rows]
+        start = 0
+        for _, run in groupby(row.get(col) for row in rows):
+            length = sum(1 for _ in run)
+            # The first cell of a run spans it; the rest share one read-only hidden marker
+            if present[start]:
+                merge_info[start][col] = {"show": True, "rowspan": length}
+            for j in range(start + 1, start + length):
+                if present[j]:
+                    merge_info[j][col] = _HIDDEN_CELL
+            start += length
     return merge_info
 
+def _sample_time(time_value):
+    """Seconds since the epoch of a trackpoint's Time, or None if it does not parse"""
+    try:
+        return datetime.fromisoformat(str(time_value).replace("Z", "+00:00")).timestamp()
+    except (ValueError, TypeError):
+        return None
+
+def _sample_bucket(timestamp, run_start):
+    """Index of the DETAILED_DATA_SAMPLE_INTERVAL-second window of elapsed time since run_start, or None"""
+    if timestamp is None:
+        return None
+    return int((timestamp - run_start) // DETAILED_DATA_SAMPLE_INTERVAL)
+
+def _sampling_tap(rows, samples):
+    """
+    Pass one run's rows through unchanged, appending the first row of each sampling window to
+    samples. Rows arrive in time order, so the first timestamp is the run's start.
+    """
+    seen_buckets = set()
+    run_start = None
+    for row in rows:
+        timestamp = _sample_time(row.get(COL_TIME))
+        if run_start is None:
+            run_start = timestamp
+        bucket = _sample_bucket(timestamp, run_start)
+        if bucket not in seen_buckets:
+            seen_buckets.add(bucket)
+            samples.append(row)
+        yield row
+
 def _filter_data_by_interval(source_data):
-    """Filter data to show every N seconds"""
+    """Keep the first trackpoint of every DETAILED_DATA_SAMPLE_INTERVAL seconds of elapsed time"""
     filtered_data = []
-    last_time = None
+    for _ in _sampling_tap(source_data, filtered_data):
+        pass
+    return filtered_data
 
-    for i, row in enumerate(source_data):
-        # Always include first row
+def _format_detail_rows(filtered_data):
+    """Add display fields and the altitude delta from the previous sample to sampled rows"""
+    for i, row in enumerate(filtered_data):
+        # Format fields
+        if COL_LAP_DISTANCE_M in row and row[COL_LAP_DISTANCE_M] is not None:
+            row[COL_LAP_DISTANCE_FORMATTED] = format_distance(row[COL_LAP_DISTANCE_M])
+        if COL_DISTANCE_M in row and row[COL_DISTANCE_M] is not None:
+            row[COL_DISTANCE_FORMATTED] = format_distance(row[COL_DISTANCE_M])
+        if COL_ALTITUDE_M in row and row[COL_ALTITUDE_M] is not None:
+            row[COL_ALTITUDE_FORMATTED] = format_altitude(row[COL_ALTITUDE_M])
+        if COL_LAP_TOTAL_TIME_S in row and row[COL_LAP_TOTAL_TIME_S] is not None:
+            row[COL_LAP_TOTAL_TIME_FORMATTED] = format_seconds(row[COL_LAP_TOTAL_TIME_S])
+
+        # Calculate altitude delta from previous sample
         if i == 0:
-            filtered_data.append(row)
-            last_time = i
-        # Include every Nth row (approximately N seconds)
-        elif i - last_time >= DETAILED_DATA_SAMPLE_INTERVAL:
-            filtered_data.append(row)
-            last_time = i
+            row[COL_ALTITUDE_DELTA_M] = 0  # First sample has no delta
+        else:
+            try:
+                prev_alt = float(filtered_data[i-1].get(COL_ALTITUDE_M, 0))
+                curr_alt = float(row.get(COL_ALTITUDE_M, 0))
+                row[COL_ALTITUDE_DELTA_M] = curr_alt - prev_alt
+            except (ValueError, TypeError):
+                row[COL_ALTITUDE_DELTA_M] = 0
+        row[COL_ALTITUDE_DELTA_FORMATTED] = format_altitude(row[COL_ALTITUDE_DELTA_M])
 
-    return filtered_data
+def _add_merge_info(rows):
+    """Attach cell merging info to the rows of one rendered table"""
+    for row, merge_info in zip(rows, _calculate_table_merge_info(rows)):
+        row[FIELD_MERGE_INFO] = merge_info
 
-def load_detailed_data():
-    db = get_db_connection()
-    # Use safe query with no user input
-    query = {}
-    projection = {COL_ID: 0}
-    detailed_data = list(db[COLLECTION_DETAILED].find(query, projection).sort(COL_TIME, 1))
+def load_detailed_data(samples=None):
+    if samples is None:
+        samples = load_detailed_view().samples
     detailed_grouped = defaultdict(list)
 
-    # Optimize: Group data by source more efficiently
-    data_by_source = defaultdict(list)
-    for row in detailed_data:
-        source = row.get(COL_SOURCE_FILE, "Unknown")
-        data_by_source[source].append(row)
-
-    for source, source_data in data_by_source.items():
+    for source, filtered_data in samples.items():
         source_date = extract_date_from_filename(source)
-        filtered_data = _filter_data_by_interval(source_data)
 
         # Format fields and add cell merging info
-
-        for i, row in enumerate(filtered_data):
-            # Format fields
-            if COL_LAP_DISTANCE_M in row and row[COL_LAP_DISTANCE_M] is not None:
-                row[COL_LAP_DISTANCE_FORMATTED] = format_distance(row[COL_LAP_DISTANCE_M])
-            if COL_DISTANCE_M in row and row[COL_DISTANCE_M] is not None:
-                row[COL_DISTANCE_FORMATTED] = format_distance(row[COL_DISTANCE_M])
-            if COL_ALTITUDE_M in row and row[COL_ALTITUDE_M] is not None:
-                row[COL_ALTITUDE_FORMATTED] = format_altitude(row[COL_ALTITUDE_M])
-            if COL_LAP_TOTAL_TIME_S in row and row[COL_LAP_TOTAL_TIME_S] is not None:
-                row[COL_LAP_TOTAL_TIME_FORMATTED] = format_seconds(row[COL_LAP_TOTAL_TIME_S])
-
-            # Calculate altitude delta from previous sample
-            if i == 0:
-                row[COL_ALTITUDE_DELTA_M] = 0  # First sample has no delta
-            else:
-                try:
-                    prev_alt = float(filtered_data[i-1].get(COL_ALTITUDE_M, 0))
-                    curr_alt = float(row.get(COL_ALTITUDE_M, 0))
-                    row[COL_ALTITUDE_DELTA_M] = curr_alt - prev_alt
-                except (ValueError, TypeError):
-                    row[COL_ALTITUDE_DELTA_M] = 0
-            row[COL_ALTITUDE_DELTA_FORMATTED] = format_altitude(row[COL_ALTITUDE_DELTA_M])
-
-            row[FIELD_MERGE_INFO] = _calculate_merge_info(filtered_data, i)
+        _format_detail_rows(filtered_data)
+        _add_merge_info(filtered_data)
 
         detailed_grouped[source_date] = filtered_data
 
     return detailed_grouped
 
+def _is_valid_source(source):
+    """Source file names are short printable strings without path separators"""
+    return isinstance(source, str) and 0 < len(source) <= 255 and "/" not in source and source.isprintable()
+
+def load_run(source):
+    """Laps (with altitude deltas) and formatted sampled trackpoints for a single source file"""
+    db = get_db_connection()
+    view = load_detailed_view(source)
+    samples = view.samples.get(source, [])
+    _format_detail_rows(samples)
+
+    # Use safe query: source is validated and only matched by equality
+    laps = list(db[COLLECTION_SUMMARY].find({COL_SOURCE_FILE: source}, {COL_ID: 0}).sort(COL_LAP_NUMBER, 1))
+    grouped = _format_summary_data(laps)
+    _calculate_altitude_deltas(grouped, view.lap_deltas)
+    return grouped.get(source, []), samples
+
+def load_run_laps(source):
+    """A run's laps with altitude deltas, from its runs document or else from its summary and detailed data"""
+    db = get_db_connection()
+    # Runs documents are keyed by source file
+    run = db[COLLECTION_RUNS].find_one({COL_ID: source}, {COL_ID: 0})
+    if run and run.get("format") == RUNS_FORMAT:
+        return _run_laps(run)
+    # Use safe query: source is validated and only matched by equality
+    laps = list(db[COLLECTION_SUMMARY].find({COL_SOURCE_FILE: source}, {COL_ID: 0}).sort(COL_LAP_NUMBER, 1))
+    grouped = _format_summary_data(laps)
+    _calculate_altitude_deltas(grouped, load_detailed_view(source, with_samples=False).lap_deltas)
+    return grouped.get(source, [])
+
+def load_run_laps_cached(source):
+    """load_run_laps through the response cache"""
+    key = _cache_key("run_laps", source)
+    if key is None:
+        return load_run_laps(source)
+    return response_cache.get_or_compute(key, lambda: load_run_laps(source))
+
+def load_run_cached(source):
+    """load_run through the response cache; callers must copy rows before changing them"""
+    key = _cache_key("run", source)
+    if key is None:
+        return load_run(source)
+    return response_cache.get_or_compute(key, lambda: load_run(source))
+
+def load_run_samples(source):
+    """A run's sampled trackpoints, unformatted; lap altitude deltas are not computed"""
+    return load_detailed_view(source, with_lap_deltas=False).samples.get(source, [])
+
+def load_run_samples_cached(source):
+    """load_run_samples through the response cache; callers must copy rows before changing them"""
+    key = _cache_key("run_samples", source)
+    if key is None:
+        return load_run_samples(source)
+    return response_cache.get_or_compute(key, lambda: load_run_samples(source))
+
+def _format_detail_page(samples, offset, limit):
+    """
+    Formatted copies of samples[offset:offset + limit]. The sample before the page is
+    formatted along with it, as each row's altitude delta is taken from its predecessor.
+    """
+    start = max(offset - 1, 0)
+    rows = [dict(row) for row in samples[start:offset + limit]]
+    _format_detail_rows(rows)
+    return rows[offset - start:]
+
+def _detail_columns(rows):
+    """Table columns of detail rows, as shown in the detailed tables"""
+    if not rows:
+        return []
+    return [key for key in rows[0]
+            if not key.endswith("_formatted") and key not in (FIELD_MERGE_INFO, COL_SOURCE_FILE)]
+
+def _json_safe(value):
+    """NaN/inf are not valid JSON; send them as null"""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+def _parse_page_args(args):
+    """Validated (offset, limit) from the query string, or None if they are malformed"""
+    try:
+        offset = int(args.get("offset", 0))
+        limit = int(args.get("limit", TRACKPOINTS_PAGE_SIZE))
+    except (TypeError, ValueError):
+        return None
+    if offset < 0 or not 1 <= limit <= TRACKPOINTS_MAX_PAGE_SIZE:
+        return None
+    return offset, limit
+
 @app.route("/")
+@conditional_on_dataset
 def index():
+    cache_key = _cache_key("index")
+    if cache_key is not None:
+        html = response_cache.get(cache_key)
+        if html is not None:
+            return html
+
+    failed = False
     try:
         logger.info("Processing index page request")
-        grouped, all_laps = load_summary_data()
-        file_summaries, file_all_laps, file_valid_laps = calculate_file_summaries(grouped)
-        fastest_lap, slowest_lap, longest_distance_file, longest_time_file = find_records(all_laps, file_summaries)
-        detailed_grouped = load_detailed_data()
+        with phase("data"):
+            dashboard = load_dashboard_from_runs()
+        if dashboard is None:
+            # No run summaries yet: compute them from every lap
+            with phase("data"):
+                grouped, file_summaries, file_all_laps, file_valid_laps = load_dashboard_from_summary()
+            records = find_records(_build_all_laps(grouped), file_summaries)
+        else:
+            grouped, file_summaries, file_all_laps, file_valid_laps, records = dashboard
+        fastest_lap, slowest_lap, longest_distance_file, longest_time_file = records
         logger.info(f"Successfully processed data for {len(file_summaries)} files")
     except Exception as e:
         logger.error(f"Error processing index page: {e}")
+        # Flag the failure so the page is neither tagged with the dataset version nor cached
+        failed = g.render_failed = True
         # Return empty data on error
-        grouped, all_laps = defaultdict(list), []
+        grouped = defaultdict(list)
         file_summaries, file_all_laps, file_valid_laps = [], {}, {}
         fastest_lap = slowest_lap = longest_distance_file = longest_time_file = None
-        detailed_grouped = defaultdict(list)
-
-    return render_template(
-        "index.html",
-        grouped=grouped,
-        file_summaries=file_summaries,
-        file_all_laps=file_all_laps,
-        file_valid_laps=file_valid_laps,
-        fastest_lap=fastest_lap,
-        slowest_lap=slowest_lap,
-        longest_distance_file=longest_distance_file,
-        longest_time_file=longest_time_file,
-        detailed=detailed_grouped
-    )
+
+    with phase("render"):
+        html = render_template(
+            "index.html",
+            grouped=grouped,
+            file_summaries=file_summaries,
+            file_all_laps=file_all_laps,
+            file_valid_laps=file_valid_laps,
+            fastest_lap=fastest_lap,
+            slowest_lap=slowest_lap,
+            longest_distance_file=longest_distance_file,
+            longest_time_file=longest_time_file
+        )
+    # Never cache the empty error page
+    if cache_key is not None and not failed:
+        response_cache.set(cache_key, html)
+    return html
+
+@app.route("/run/<source>")
+@conditional_on_dataset
+def run_page(source):
+    if not _is_valid_source(source):
+        abort(404)
+    try:
+        with phase("data"):
+            laps, details = load_run_cached(source)
+    except Exception as e:
+        logger.error(f"Error loading run {source}: {e}")
+        laps, details = [], []
+    if not laps and not details:
+        abort(404)
+    # Rows may be shared with the cache; merge info goes on copies
+    details = [dict(row) for row in details]
+    _add_merge_info(details)
+
+    with phase("render"):
+        return render_template(
+            "run.html",
+            source=source,
+            date=extract_date_from_filename(source),
+            laps=laps,
+            valid_laps=[lap for lap in laps if _is_valid_lap(lap)],
+            details=details
+        )
+
+@app.route("/api/runs/<source>/trackpoints")
+@conditional_on_dataset
+def run_trackpoints(source):
+    """One page of a run's sampled trackpoints, with display fields and cell merging info"""
+    if not _is_valid_source(source):
+        return jsonify({"error": "Invalid source"}), 404
+    page_args = _parse_page_args(request.args)
+    if page_args is None:
+        return jsonify({"error": f"offset must be >= 0 and limit between 1 and {TRACKPOINTS_MAX_PAGE_SIZE}"}), 400
+    offset, limit = page_args
+
+    try:
+        with phase("data"):
+            samples = load_run_samples_cached(source)
+    except Exception as e:
+        logger.error(f"Error loading trackpoints for {source}: {e}")
+        return jsonify({"error": "Could not load trackpoints"}), 500
+
+    # Only the requested page is formatted, on copies of the cached rows
+    page = _format_detail_page(samples, offset, limit)
+    _add_merge_info(page)
+    return jsonify({
+        "source": source,
+        "date": extract_date_from_filename(source),
+        "offset": offset,
+        "limit": limit,
+        "total": len(samples),
+        "columns": [{"key": key, "label": get_friendly_column_name(key)} for key in _detail_columns(page)],
+        "rows": [{key: _json_safe(value) for key, value in row.items()} for row in page],
+    })
+
+@app.route("/run/<source>/laps")
+@conditional_on_dataset
+def run_laps(source):
+    """A run's lap table as an HTML fragment, loaded when its dashboard section is expanded"""
+    if not _is_valid_source(source):
+        abort(404)
+    try:
+        with phase("data"):
+            laps = load_run_laps_cached(source)
+    except Exception as e:
+        logger.error(f"Error loading laps for {source}: {e}")
+        abort(500)
+    if not laps:
+        abort(404)
+
+    with phase("render"):
+        return render_template("_run_laps.html", laps=laps, valid_laps=[lap for lap in laps if _is_valid_lap(lap)])
+
+@app.route("/metrics")
+def metrics():
+    """Request, phase and MongoDB command latency summaries in the Prometheus text format"""
+    if not METRICS:
+        abort(404)
+    registry = metrics_directory.aggregate(metrics_registry) if metrics_directory is not None else metrics_registry
+    return registry.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+@app.route("/api/cache")
+def cache_stats():
+    """Hit/miss statistics of the response cache"""
+    return jsonify(response_cache.stats())
 
 @app.teardown_appcontext
 def close_db(error):
@@ -376,11 +1181,8 @@ def close_db(error):
         error_msg = str(error)[:200]  # Limit length
         error_msg = error_msg.replace('\n', '\\n').replace('\r', '\\r')
         logger.error(f"App context error: {error_msg}")
-    # Connection cleanup handled in finally block of main
+    # The client is shared across requests; close_db_connection runs at process exit
 
 if __name__ == "__main__":
-    try:
-        app.run(debug=DEBUG)
-    finally:
-        # Ensure database connection is closed on shutdown
-        close_db_connection()
\ No newline at end of file
+    # Development server only; production runs under gunicorn (see gunicorn.conf.py)
+    app.run(debug=DEBUG)
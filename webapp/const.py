@@ -19,15 +19,56 @@ FRIENDLY_COLUMN_NAMES = {
     'Cadence_rpm': 'Cadence'
 }
 
-# Data sampling interval (every Nth row for detailed data)
+# Data sampling interval in seconds of elapsed time: windows start at the run's first trackpoint
+# and the first trackpoint of each window is shown
 DETAILED_DATA_SAMPLE_INTERVAL = 60
 
+# Page size of /api/runs/<source>/trackpoints (default and maximum rows per request)
+TRACKPOINTS_PAGE_SIZE = 200
+TRACKPOINTS_MAX_PAGE_SIZE = 1000
+
 # Minimum distance for valid laps (in meters)
 MIN_VALID_LAP_DISTANCE = 990
 
 # Database collection names
 COLLECTION_SUMMARY = "summary"
 COLLECTION_DETAILED = "detailed"
+COLLECTION_DETAILED_PACKED = "detailed_packed"
+COLLECTION_RUNS = "runs"
+COLLECTION_PERSONAL_RECORDS = "personal_records"
+COLLECTION_DATASET_VERSION = "dataset_version"
+
+# Document in COLLECTION_DATASET_VERSION whose counter ingest bumps, see src/dataset_version.py
+DATASET_VERSION_ID = "dataset"
+
+# Seconds the webapp trusts its copy of the dataset version before re-reading it
+# (overridable with DATASET_VERSION_POLL)
+DATASET_VERSION_POLL_INTERVAL_S = 1
+
+# Documents fetched per cursor round trip: laps and trackpoints are small, packed laps hold
+# a few hundred compressed trackpoints each
+SUMMARY_CURSOR_BATCH_SIZE = 1000
+DETAILED_CURSOR_BATCH_SIZE = 5000
+PACKED_CURSOR_BATCH_SIZE = 100
+
+# Response cache defaults (overridable with RESPONSE_CACHE_SIZE / RESPONSE_CACHE_TTL)
+RESPONSE_CACHE_MAX_ENTRIES = 64
+RESPONSE_CACHE_TTL_S = 300
+
+# MongoDB connection pool per serving process (overridable with MONGO_MAX_POOL_SIZE / MONGO_MIN_POOL_SIZE)
+MONGO_MAX_POOL_SIZE = 20
+MONGO_MIN_POOL_SIZE = 0
+
+# Query threads per serving process for a request's independent reads (overridable with QUERY_CONCURRENCY)
+QUERY_CONCURRENCY_DEFAULT = 4
+
+# Packed detailed layout (one document per lap), see src/packed_layout.py
+PACKED_FORMAT = 1
+PACKED_LAP_FIELDS = ['LapNumber', 'LapStartTime', 'LapTotalTime_s', 'LapDistance_m', 'Pace_min_per_km']
+PACKED_NUMERIC_COLUMNS = ['Latitude', 'Longitude', 'Altitude_m', 'Distance_m']
+
+# Pre-computed per-run summaries written at ingest, see src/run_summary.py
+RUNS_FORMAT = 1
 
 # Column names used in database queries and processing
 COL_ID = "_id"
@@ -40,6 +81,29 @@ COL_ALTITUDE_DELTA_M = "AltitudeDelta_m"
 COL_DISTANCE_M = "Distance_m"
 COL_TIME = "Time"
 
+# Indexes created on startup, as {collection: [(index name, keys)]}.
+# Keep in sync with src/mongo_indexes.py, which creates the same set at ingest.
+MONGO_INDEXES = {
+    COLLECTION_SUMMARY: [
+        ("source_lap", [(COL_SOURCE_FILE, 1), (COL_LAP_NUMBER, 1)]),
+        ("lap_start_time", [("LapStartTime", 1)]),
+    ],
+    COLLECTION_DETAILED: [
+        ("source_lap_time", [(COL_SOURCE_FILE, 1), (COL_LAP_NUMBER, 1), (COL_TIME, 1)]),
+        ("time", [(COL_TIME, 1)]),
+    ],
+    COLLECTION_DETAILED_PACKED: [
+        ("source_lap", [(COL_SOURCE_FILE, 1), (COL_LAP_NUMBER, 1)]),
+        ("lap_start_time", [("LapStartTime", 1)]),
+    ],
+    COLLECTION_RUNS: [
+        ("fastest_lap_time", [("fastest_lap.LapTotalTime_s", 1)]),
+        ("slowest_lap_time", [("slowest_lap.LapTotalTime_s", -1)]),
+        ("total_distance", [("total_distance_m", -1)]),
+        ("total_time", [("total_time_s", -1)]),
+    ],
+}
+
 # Formatted column names (suffixed versions)
 COL_LAP_TOTAL_TIME_FORMATTED = "LapTotalTime_formatted"
 COL_LAP_DISTANCE_FORMATTED = "LapDistance_formatted"
@@ -54,6 +118,8 @@ FIELD_TOTAL_DISTANCE = "total_distance"
 FIELD_TOTAL_DISTANCE_FORMATTED = "total_distance_formatted"
 FIELD_TOTAL_TIME = "total_time"
 FIELD_TOTAL_TIME_FORMATTED = "total_time_formatted"
+FIELD_LAP_COUNT = "lap_count"
+FIELD_VALID_LAP_COUNT = "valid_lap_count"
 
 # Merge info field
 FIELD_MERGE_INFO = "_merge_info"
\ No newline at end of file
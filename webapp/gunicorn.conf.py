@@ -0,0 +1,55 @@
+"""
+Production serving profile: gunicorn with forked gthread workers, each holding its own
+MongoDB client (see get_db_connection). All settings are overridable through the environment.
+
+    gunicorn --config gunicorn.conf.py app:app
+"""
+import multiprocessing
+import os
+import tempfile
+
+bind = os.getenv("WEB_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_WORKERS", min(2 * multiprocessing.cpu_count() + 1, 8)))
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", 4))
+# Import the app once in the master so workers fork warm; no MongoClient exists yet at that point
+preload_app = True
+timeout = int(os.getenv("WEB_TIMEOUT", 60))
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+# Recycle workers now and then so slow leaks cannot accumulate
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", 2000))
+max_requests_jitter = max_requests // 10
+accesslog = os.getenv("WEB_ACCESS_LOG") or None
+errorlog = "-"
+
+# With METRICS=on each worker keeps its own registry; a shared directory lets /metrics report
+# every worker whichever one is scraped. Set before the app is imported in the master
+if os.getenv("METRICS", "off") == "on" and not os.getenv("METRICS_DIR"):
+    os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="runningtracker-metrics-")
+
+
+def when_ready(server):
+    """Start from empty metrics, like a single-process restart would"""
+    import app
+    if app.metrics_directory is not None:
+        app.metrics_directory.clear()
+
+
+def post_fork(server, worker):
+    """Drop any client the master might hold; the worker connects on its first request"""
+    import app
+    app.client = app.db = app._client_pid = None
+
+
+def worker_exit(server, worker):
+    """Close the worker's connection pool once in-flight requests have finished"""
+    import app
+    app.close_db_connection()
+
+
+def child_exit(server, worker):
+    """Keep an exited (e.g. recycled) worker's request counts and sums in /metrics"""
+    import app
+    if app.metrics_directory is not None:
+        app.metrics_directory.archive(worker.pid)
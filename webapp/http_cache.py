@@ -0,0 +1,55 @@
+import gzip
+import hashlib
+import os
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+# Responses smaller than this are sent as-is; compression would not pay for itself
+MIN_COMPRESS_SIZE = 1024
+
+COMPRESSIBLE_MIMETYPES = {"text/html", "application/json", "text/css", "text/javascript", "application/javascript"}
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def release_tag(paths):
+    """
+    Short digest of the files that shape rendered output (code and templates), so
+    ETags change on deploy even when the dataset version does not. Missing paths are skipped.
+    """
+    digest = hashlib.blake2b(digest_size=6)
+    for path in sorted(paths):
+        if os.path.isdir(path):
+            release_files = sorted(os.path.join(path, name) for name in os.listdir(path))
+        else:
+            release_files = [path]
+        for file_path in release_files:
+            if os.path.isfile(file_path):
+                with open(file_path, "rb") as f:
+                    digest.update(f.read())
+    return digest.hexdigest()
+
+
+def choose_encoding(accept_encodings):
+    """Best content coding the client accepts (werkzeug MIMEAccept-style object), or None"""
+    if brotli is not None and accept_encodings["br"]:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def body_digest(data):
+    """Key for caching an encoded copy of a response body"""
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def compress_body(data, encoding):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    # mtime=0 keeps the output byte-identical across calls
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
@@ -49,6 +49,11 @@ def get_webapp_logging_config(env='production'):
                 'level': log_level,
                 'propagate': False
             },
+            'webapp.timing': {  # Per-request timing lines, only written when METRICS=on
+                'handlers': ['file', 'console'],
+                'level': 'INFO',
+                'propagate': False
+            },
             'werkzeug': {  # Flask's built-in server
                 'handlers': ['file'],
                 'level': 'WARNING',
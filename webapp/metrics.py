@@ -0,0 +1,301 @@
+import contextvars
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+try:
+    from pymongo.monitoring import CommandListener
+except ImportError:  # the listener only needs started/succeeded/failed
+    CommandListener = object
+
+# Quantiles exported per summary, computed over the most recent observations
+QUANTILES = (0.5, 0.9, 0.99)
+DEFAULT_WINDOW = 1024
+# Seconds between writes of a process's snapshot to a shared metrics directory
+PUBLISH_INTERVAL_S = 5.0
+
+REQUEST_SECONDS = "runningtracker_request_duration_seconds"
+PHASE_SECONDS = "runningtracker_request_phase_seconds"
+MONGO_COMMAND_SECONDS = "runningtracker_mongo_command_duration_seconds"
+MONGO_COMMAND_FAILURES = "runningtracker_mongo_command_failures_total"
+
+HELP = {
+    REQUEST_SECONDS: "Wall time of a request, by endpoint",
+    PHASE_SECONDS: "Time spent in one phase of a request (phases may nest or overlap)",
+    MONGO_COMMAND_SECONDS: "MongoDB command round trip as reported by command monitoring",
+    MONGO_COMMAND_FAILURES: "MongoDB commands that failed",
+}
+
+_current_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+class RollingSummary:
+    """Count and sum since start, plus the last `window` observations for quantiles"""
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def quantiles(self):
+        values = sorted(self.recent)
+        if not values:
+            return {}
+        return {q: values[min(len(values) - 1, int(q * len(values)))] for q in QUANTILES}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(labels):
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels)
+
+
+class MetricsRegistry:
+    """Thread-safe rolling summaries and counters, rendered in the Prometheus text format"""
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self._summaries = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = self._summaries[key] = RollingSummary(self.window)
+            summary.observe(value)
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def snapshot(self):
+        """JSON-serialisable state, for merging the registries of several processes"""
+        with self._lock:
+            return {
+                "summaries": [[name, [list(label) for label in labels], summary.count, summary.sum,
+                               list(summary.recent)] for (name, labels), summary in self._summaries.items()],
+                "counters": [[name, [list(label) for label in labels], value]
+                             for (name, labels), value in self._counters.items()],
+            }
+
+    def merge(self, snapshot):
+        """Add another process's snapshot: counts, sums and counters add up, recent values are pooled"""
+        with self._lock:
+            for name, labels, count, total, recent in snapshot.get("summaries", []):
+                key = (name, tuple(tuple(label) for label in labels))
+                summary = self._summaries.get(key)
+                if summary is None:
+                    summary = self._summaries[key] = RollingSummary(self.window)
+                summary.count += count
+                summary.sum += total
+                summary.recent.extend(recent)
+            for name, labels, value in snapshot.get("counters", []):
+                key = (name, tuple(tuple(label) for label in labels))
+                self._counters[key] = self._counters.get(key, 0) + value
+
+    def quantiles(self, name, **labels):
+        with self._lock:
+            summary = self._summaries.get((name, tuple(sorted(labels.items()))))
+            return summary.quantiles() if summary else {}
+
+    def render(self):
+        lines = []
+        with self._lock:
+            summaries = sorted(self._summaries.items())
+            counters = sorted(self._counters.items())
+            snapshot = [(key, summary.count, summary.sum, summary.quantiles()) for key, summary in summaries]
+
+        declared = set()
+        for (name, labels), count, total, quantiles in snapshot:
+            if name not in declared:
+                declared.add(name)
+                lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} summary"]
+            for q, value in quantiles.items():
+                lines.append(f"{name}{{{_label_text(labels + (('quantile', q),))}}} {value:.6f}")
+            suffix = f"{{{_label_text(labels)}}}" if labels else ""
+            lines.append(f"{name}_sum{suffix} {total:.6f}")
+            lines.append(f"{name}_count{suffix} {count}")
+        for (name, labels), value in counters:
+            if name not in declared:
+                declared.add(name)
+                lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} counter"]
+            suffix = f"{{{_label_text(labels)}}}" if labels else ""
+            lines.append(f"{name}{suffix} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsDirectory:
+    """
+    Registry snapshots of the processes serving one app (gunicorn workers), one JSON file per
+    pid in a shared directory, so whichever worker is scraped reports all of them. Workers
+    publish at most every `publish_interval_s`; the scraped worker publishes first.
+    """
+
+    EXITED = "exited.json"
+
+    def __init__(self, path, publish_interval_s=PUBLISH_INTERVAL_S):
+        self.path = path
+        self.publish_interval_s = publish_interval_s
+        self._published = None
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _read(self, filename):
+        try:
+            with open(os.path.join(self.path, filename), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, filename, snapshot):
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix=".metrics-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, separators=(",", ":"))
+            os.replace(tmp_path, os.path.join(self.path, filename))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def publish(self, registry, force=False):
+        """Write this process's snapshot, unless one was written less than publish_interval_s ago"""
+        now = time.monotonic()
+        with self._lock:
+            if not force and self._published is not None and now - self._published < self.publish_interval_s:
+                return
+            self._published = now
+        self._write(f"{os.getpid()}.json", registry.snapshot())
+
+    def aggregate(self, registry):
+        """One registry with the metrics of every process, plus the counts and sums of exited ones"""
+        self.publish(registry, force=True)
+        merged = MetricsRegistry(window=None)
+        for filename in sorted(os.listdir(self.path)):
+            snapshot = self._read(filename) if filename.endswith(".json") else None
+            if snapshot:
+                merged.merge(snapshot)
+        return merged
+
+    def archive(self, pid):
+        """Fold an exited process's counts and sums into the exited totals and drop its snapshot"""
+        snapshot = self._read(f"{pid}.json")
+        if snapshot is None:
+            return
+        # A zero window keeps counts and sums only; quantiles of a dead process would go stale
+        exited = MetricsRegistry(window=0)
+        exited.merge(self._read(self.EXITED) or {})
+        exited.merge(snapshot)
+        self._write(self.EXITED, exited.snapshot())
+        os.remove(os.path.join(self.path, f"{pid}.json"))
+
+    def clear(self):
+        """Forget snapshots left by a previous server"""
+        for filename in os.listdir(self.path):
+            if filename.endswith(".json"):
+                os.remove(os.path.join(self.path, filename))
+
+
+class RequestTimings:
+    """Per-phase seconds of one request; phases may be recorded from query pool threads"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self._lock = threading.Lock()
+
+    def add(self, phase, seconds):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total):
+        """Server-Timing header value, durations in milliseconds"""
+        entries = [f"{phase};dur={seconds * 1000:.1f}" for phase, seconds in self.phases.items()]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+def start_request():
+    """Begin collecting phase timings for the request running in this context"""
+    timings = RequestTimings()
+    _current_timings.set(timings)
+    return timings
+
+
+def current_timings():
+    return _current_timings.get()
+
+
+def end_request():
+    _current_timings.set(None)
+
+
+@contextmanager
+def phase(name):
+    """Add the time spent in the block to the current request's `name` phase; a no-op outside one"""
+    timings = _current_timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+
+def timed(name):
+    """Decorator form of phase()"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class MongoCommandMetrics(CommandListener):
+    """
+    pymongo command listener: records every command's latency in the registry and adds it
+    to the "mongo" phase of the request that issued it
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def _record(self, event):
+        seconds = event.duration_micros / 1e6
+        self.registry.observe(MONGO_COMMAND_SECONDS, seconds, command=event.command_name)
+        timings = _current_timings.get()
+        if timings is not None:
+            timings.add("mongo", seconds)
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        self._record(event)
+        self.registry.increment(MONGO_COMMAND_FAILURES, command=event.command_name)
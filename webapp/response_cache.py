@@ -0,0 +1,76 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    In-memory LRU cache with a per-entry TTL, shared by the request threads of one process.
+    Callers put the dataset version in their keys, so entries from before an ingest are
+    never hit again and simply age out. max_entries=0 disables caching.
+    """
+
+    def __init__(self, max_entries=64, ttl_s=300.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= self._clock():
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl_s, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Cached value for key, computing and storing it on a miss. Concurrent misses may both compute."""
+        if not self.enabled:
+            return compute()
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            }
@@ -30,7 +30,11 @@ document.addEventListener("DOMContentLoaded", function () {
         });
     });
 
-    const ctx = document.getElementById('lapChart').getContext('2d');
+    const canvas = document.getElementById('lapChart');
+    if (!canvas) {
+        return;
+    }
+    const ctx = canvas.getContext('2d');
     new Chart(ctx, {
         type: 'line',
         data: {
@@ -79,29 +83,6 @@ document.addEventListener("DOMContentLoaded", function () {
         }
     });
 
-    // --- Convert all date strings in the page to local timezone ---
-    // Looks for elements with class 'local-datetime' and converts their text
-    document.querySelectorAll('.local-datetime').forEach(function(el) {
-        const original = el.textContent.trim();
-        // Try to parse as ISO or YYYY-MM-DD or YYYY-MM-DD HH:mm:ss
-        let date = null;
-        if (/^\d{4}-\d{2}-\d{2}$/.test(original)) {
-            // If only date, treat as local midnight
-            date = new Date(original + "T00:00:00");
-        } else if (!isNaN(Date.parse(original))) {
-            date = new Date(original);
-        }
-        if (date && !isNaN(date.getTime())) {
-            // Format as local string (date and time if time is not midnight)
-            let formatted;
-            if (date.getHours() === 0 && date.getMinutes() === 0 && date.getSeconds() === 0) {
-                formatted = date.toLocaleDateString();
-            } else {
-                formatted = date.toLocaleString();
-            }
-            el.textContent = formatted;
-        }
-    });
 });
 
 // Helper for formatting seconds as HH:mm:ss
@@ -6,6 +6,13 @@ function toggleSection(header) {
         content.style.display = 'block';
         icon.textContent = '▼';
         header.classList.remove('collapsed');
+        const section = header.parentElement;
+        if (section.dataset.trackpointsUrl && !section.dataset.loaded) {
+            loadDetailTable(section);
+        }
+        if (section.dataset.lapsUrl && !section.dataset.loaded) {
+            loadLapTable(section);
+        }
     } else {
         content.style.display = 'none';
         icon.textContent = '▶';
@@ -34,10 +41,156 @@ function openDetailSection(date) {
         content.style.display = 'block';
         header.querySelector('.toggle-icon').textContent = '▼';
         header.classList.remove('collapsed');
+        if (!targetSection.dataset.loaded) {
+            loadDetailTable(targetSection);
+        }
         targetSection.scrollIntoView({ behavior: 'smooth', block: 'start' });
     }
 }
 
+function loadLapTable(section) {
+    // Fetch a run's lap table, rendered by the server like the open run's
+    if (section.dataset.loading) {
+        return;
+    }
+    section.dataset.loading = 'true';
+    const container = section.querySelector('.lap-table');
+
+    fetch(section.dataset.lapsUrl)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('HTTP ' + response.status);
+            }
+            return response.text();
+        })
+        .then(html => {
+            container.innerHTML = html;
+            convertLocalDatetimes(container);
+            section.dataset.loaded = 'true';
+        })
+        .catch(error => {
+            container.textContent = 'Could not load laps (' + error.message + ').';
+        })
+        .finally(() => {
+            delete section.dataset.loading;
+        });
+}
+
+// Display fields sent alongside raw detail columns, as {column: formatted field}
+const FORMATTED_DETAIL_FIELDS = {
+    LapDistance_m: 'LapDistance_formatted',
+    Distance_m: 'Distance_formatted',
+    Altitude_m: 'Altitude_formatted',
+    AltitudeDelta_m: 'AltitudeDelta_formatted',
+    LapTotalTime_s: 'LapTotalTime_formatted'
+};
+
+function detailCell(row, key) {
+    // Mirrors the cell rules of detail_table in _tables.html
+    const value = row[key];
+    const text = row[FORMATTED_DETAIL_FIELDS[key]] ?? (value ?? '');
+    const td = document.createElement('td');
+    const span = document.createElement('span');
+    if (key === 'Time' || key === 'LapStartTime') {
+        span.className = 'local-datetime';
+    } else if (key === 'AltitudeDelta_m') {
+        span.style.color = value > 0 ? 'red' : (value < 0 ? 'green' : 'black');
+    }
+    span.textContent = text;
+    td.appendChild(span);
+    return td;
+}
+
+function loadDetailTable(section) {
+    // Fetch the next page of a run's trackpoints and append it to the section's table
+    if (section.dataset.loading) {
+        return;
+    }
+    section.dataset.loading = 'true';
+    const container = section.querySelector('.detail-table');
+    const loadMore = section.querySelector('.load-more');
+    const offset = Number(section.dataset.offset || 0);
+    const url = section.dataset.trackpointsUrl + '?offset=' + offset;
+
+    fetch(url)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('HTTP ' + response.status);
+            }
+            return response.json();
+        })
+        .then(page => {
+            let table = container.querySelector('table');
+            if (!table) {
+                table = document.createElement('table');
+                const header = table.insertRow();
+                page.columns.forEach(column => {
+                    const th = document.createElement('th');
+                    th.textContent = column.label;
+                    header.appendChild(th);
+                });
+                container.appendChild(table);
+            }
+            page.rows.forEach(row => {
+                const tr = table.insertRow();
+                page.columns.forEach(column => {
+                    const merge = (row._merge_info || {})[column.key] || { show: true, rowspan: 1 };
+                    if (merge.show) {
+                        const td = detailCell(row, column.key);
+                        if (merge.rowspan > 1) {
+                            td.rowSpan = merge.rowspan;
+                        }
+                        tr.appendChild(td);
+                    }
+                });
+            });
+            convertLocalDatetimes(table);
+
+            const next = page.offset + page.rows.length;
+            section.dataset.offset = next;
+            section.dataset.loaded = 'true';
+            if (loadMore) {
+                loadMore.hidden = next >= page.total;
+                loadMore.onclick = () => loadDetailTable(section);
+            }
+            if (page.total === 0) {
+                container.textContent = 'No detailed data for this run.';
+            }
+        })
+        .catch(error => {
+            container.textContent = 'Could not load detailed data (' + error.message + ').';
+        })
+        .finally(() => {
+            delete section.dataset.loading;
+        });
+}
+
+// Convert date strings under root to the local timezone
+// Looks for elements with class 'local-datetime' and converts their text
+function convertLocalDatetimes(root) {
+    root.querySelectorAll('.local-datetime').forEach(function(el) {
+        const original = el.textContent.trim();
+        // Try to parse as ISO or YYYY-MM-DD or YYYY-MM-DD HH:mm:ss
+        let date = null;
+        if (/^\d{4}-\d{2}-\d{2}$/.test(original)) {
+            // If only date, treat as local midnight
+            date = new Date(original + "T00:00:00");
+        } else if (!isNaN(Date.parse(original))) {
+            date = new Date(original);
+        }
+        if (date && !isNaN(date.getTime())) {
+            // Format as local string (date and time if time is not midnight)
+            let formatted;
+            if (date.getHours() === 0 && date.getMinutes() === 0 && date.getSeconds() === 0) {
+                formatted = date.toLocaleDateString();
+            } else {
+                formatted = date.toLocaleString();
+            }
+            el.textContent = formatted;
+        }
+    });
+}
+
 // Initialize collapsed state
 document.addEventListener('DOMContentLoaded', function() {
     const sections = document.querySelectorAll('.section-content');
@@ -54,4 +207,6 @@ document.addEventListener('DOMContentLoaded', function() {
             section.style.display = 'block';
         }
     });
-});
\ No newline at end of file
+
+    convertLocalDatetimes(document);
+});
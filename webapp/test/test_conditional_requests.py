@@ -0,0 +1,133 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import gzip
+from datetime import datetime
+
+# Add webapp directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class TestConditionalRequests(unittest.TestCase):
+    def setUp(self):
+        # Mock dependencies before importing app
+        self.patches = [
+            patch.dict('sys.modules', {
+                'logging_config': MagicMock(),
+                'pymongo': MagicMock()
+            }),
+            patch.dict('os.environ', {'FLASK_ENV': 'development'})
+        ]
+
+        for p in self.patches:
+            p.start()
+
+        import app
+        self.app_module = app
+        self.version = MagicMock()
+        self.version.find_one.return_value = {"_id": "dataset", "version": 7,
+                                              "updated_at": datetime(2025, 8, 5, 10, 0, 0, 123000)}
+        self.runs = MagicMock()
+        self.runs.find.return_value = []
+        self.db = {app.COLLECTION_DATASET_VERSION: self.version, app.COLLECTION_RUNS: self.runs}
+        self.client = app.app.test_client()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def get(self, url, body="<html>" + "x" * 4000 + "</html>", fail=False, cache=None, **headers):
+        dashboard = {"side_effect": RuntimeError("no data")} if fail else \
+            {"return_value": ({}, [], {}, {}, (None, None, None, None))}
+        with patch.object(self.app_module, 'get_db_connection', return_value=self.db), \
+             patch.object(self.app_module, 'load_dashboard_from_runs', **dashboard), \
+             patch.object(self.app_module, 'response_cache', cache or self.app_module.ResponseCache(0)), \
+             patch.object(self.app_module, 'render_template', return_value=body) as self.mock_render:
+            return self.client.get(url, headers=headers)
+
+    def test_matching_etag_gets_304_without_rendering(self):
+        """Test If-None-Match with the current ETag is answered with 304 and no render or data query"""
+        first = self.get("/")
+        etag = first.headers["ETag"]
+        self.assertTrue(etag.startswith('W/"7-'))
+        self.assertEqual(first.headers["Last-Modified"], "Tue, 05 Aug 2025 10:00:00 GMT")
+        self.assertIn("no-cache", first.headers["Cache-Control"])
+
+        second = self.get("/", **{"If-None-Match": etag})
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.get_data(), b"")
+        self.assertEqual(second.headers["ETag"], etag)
+        self.mock_render.assert_not_called()
+        # Both requests fall inside one poll interval: the version was read once
+        self.version.find_one.assert_called_once()
+
+    def test_new_dataset_version_changes_etag(self):
+        """Test a bumped dataset version invalidates the client's copy"""
+        etag = self.get("/").headers["ETag"]
+        self.version.find_one.return_value = {"_id": "dataset", "version": 8}
+        with patch.object(self.app_module, 'DATASET_VERSION_POLL_S', 0):
+            response = self.get("/", **{"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers["ETag"].startswith('W/"8-'))
+        self.assertNotIn("Last-Modified", response.headers)
+
+    def test_if_modified_since_alone_is_not_trusted(self):
+        """Test If-Modified-Since without an ETag gets a full response, as a deploy does not move Last-Modified"""
+        self.assertEqual(self.get("/", **{"If-Modified-Since": "Tue, 05 Aug 2025 10:00:00 GMT"}).status_code, 200)
+        self.mock_render.assert_called_once()
+
+    def test_new_release_changes_etag(self):
+        """Test a deploy with unchanged data invalidates the client's copy"""
+        etag = self.get("/").headers["ETag"]
+        with patch.object(self.app_module, 'RELEASE', 'next'):
+            response = self.get("/", **{"If-None-Match": etag,
+                                        "If-Modified-Since": "Tue, 05 Aug 2025 10:00:00 GMT"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["ETag"], 'W/"7-next"')
+
+    def test_error_responses_are_not_tagged(self):
+        """Test 404s carry no validators"""
+        response = self.get("/run/%0A")
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn("ETag", response.headers)
+
+    def test_failed_render_is_not_tagged(self):
+        """Test the empty page served when data loading fails carries no validators"""
+        response = self.get("/", fail=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response.headers)
+        self.assertNotIn("Last-Modified", response.headers)
+
+    def test_failed_render_does_not_poison_compressed_cache(self):
+        """Test a failed render followed by a good one never serves the stale compressed error page"""
+        cache = self.app_module.ResponseCache(60)
+        error_page = "<html>" + "e" * 4000 + "</html>"
+        good_page = "<html>" + "g" * 4000 + "</html>"
+        failed = self.get("/", body=error_page, fail=True, cache=cache, **{"Accept-Encoding": "gzip"})
+        self.assertTrue(gzip.decompress(failed.get_data()).startswith(b"<html>eee"))
+
+        for _ in range(2):
+            response = self.get("/", body=good_page, cache=cache, **{"Accept-Encoding": "gzip"})
+            self.assertEqual(gzip.decompress(response.get_data()).decode(), good_page)
+            self.assertTrue(response.headers["ETag"].startswith('W/"7-'))
+
+    def test_gzip_when_accepted(self):
+        """Test large text responses are gzip-encoded for clients that accept it, small ones are not"""
+        response = self.get("/", **{"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response.headers["Vary"])
+        self.assertTrue(gzip.decompress(response.get_data()).startswith(b"<html>xxx"))
+
+        self.assertNotIn("Content-Encoding", self.get("/", body="<html></html>", **{"Accept-Encoding": "gzip"}).headers)
+        self.assertNotIn("Content-Encoding", self.get("/").headers)
+
+    @unittest.skipUnless(__import__("importlib").util.find_spec("brotli"), "brotli is not installed")
+    def test_brotli_preferred_when_available(self):
+        """Test brotli is chosen over gzip when both are accepted"""
+        import brotli
+        response = self.get("/", **{"Accept-Encoding": "gzip, br"})
+        self.assertEqual(response.headers["Content-Encoding"], "br")
+        self.assertTrue(brotli.decompress(response.get_data()).startswith(b"<html>xxx"))
+
+if __name__ == '__main__':
+    unittest.main()
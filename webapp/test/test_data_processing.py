@@ -7,6 +7,68 @@ from collections import defaultdict
 # Add webapp directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+def _evaluate(expr, doc):
+    """Just enough of the aggregation expression language for the file laps pipeline"""
+    if expr == "$$ROOT":
+        return dict(doc)
+    if isinstance(expr, str) and expr.startswith("$"):
+        return doc.get(expr[1:], _MISSING)
+    if not isinstance(expr, dict):
+        return expr
+    (op, args), = expr.items()
+    if op == "$convert":
+        value = _evaluate(args["input"], doc)
+        if value is None or value is _MISSING:
+            return args["onNull"]
+        try:
+            return float(value)
+        except (ValueError, TypeError):
+            return args["onError"]
+    values = [_evaluate(arg, doc) for arg in (args if isinstance(args, list) else [args])]
+    if op == "$type":
+        return "missing" if values[0] is _MISSING else type(values[0]).__name__
+    if op == "$ifNull":
+        return values[1] if values[0] in (None, _MISSING) else values[0]
+    if op == "$cond":
+        return values[1] if values[0] else values[2]
+    if op == "$eq":
+        return values[0] == values[1]
+    if op == "$or":
+        return any(values)
+    if op == "$gte":
+        # BSON order puts null below every number
+        return values[0] is not None and values[0] >= values[1]
+    raise NotImplementedError(op)
+
+_MISSING = object()
+
+def _aggregate(pipeline, docs):
+    """Run an $unset/$project/$group pipeline over plain dicts"""
+    for stage in pipeline:
+        (op, spec), = stage.items()
+        if op == "$unset":
+            docs = [{k: v for k, v in doc.items() if k != spec} for doc in docs]
+        elif op == "$project":
+            docs = [{k: _evaluate(v, doc) for k, v in spec.items() if v != 0} for doc in docs]
+        elif op == "$group":
+            groups = {}
+            for doc in docs:
+                key = _evaluate(spec["_id"], doc)
+                group = groups.setdefault(key, {"_id": key, **{
+                    k: [] if "$push" in acc else 0 for k, acc in spec.items() if k != "_id"}})
+                for field, acc in spec.items():
+                    if field == "_id":
+                        continue
+                    if "$push" in acc:
+                        group[field].append(_evaluate(acc["$push"], doc))
+                    else:
+                        value = _evaluate(acc["$sum"], doc)
+                        group[field] += value if isinstance(value, (int, float)) else 0
+            docs = list(groups.values())
+        else:
+            raise NotImplementedError(op)
+    return docs
+
 class TestDataProcessing(unittest.TestCase):
     def setUp(self):
         # Mock dependencies before importing app
@@ -195,5 +257,516 @@ class TestDataProcessing(unittest.TestCase):
         self.assertIsNone(fastest)
         self.assertIsNone(slowest)
 
+    def test_ensure_indexes_is_tolerant(self):
+        """Test index bootstrap creates every index and survives a failing one"""
+        db = {self.app_module.COLLECTION_SUMMARY: MagicMock(), self.app_module.COLLECTION_DETAILED: MagicMock()}
+        db[self.app_module.COLLECTION_SUMMARY].create_index.side_effect = Exception("not authorized")
+        self.app_module.ensure_indexes(db)
+        db[self.app_module.COLLECTION_DETAILED].create_index.assert_any_call(
+            [("_source_file", 1), ("LapNumber", 1), ("Time", 1)], name="source_lap_time")
+
+    def _packed_doc(self, source, lap, times, altitudes):
+        import zlib
+        from array import array
+        block = lambda values: zlib.compress(array("d", values).tobytes())
+        return {"_source_file": source, "LapNumber": lap, "LapStartTime": times[0], "LapTotalTime_s": 60.0,
+                "LapDistance_m": 1000.0, "Pace_min_per_km": 1.0, "format": 1, "count": len(times),
+                "points": {"Time": zlib.compress("\n".join(times).encode()), "Latitude": block([1.0] * len(times)),
+                           "Longitude": block([2.0] * len(times)), "Altitude_m": block(altitudes),
+                           "Distance_m": block(range(len(times)))}}
+
+    def test_unpack_lap_document_matches_rows_layout(self):
+        """Test a packed lap expands to rows with the same keys and order as trackpoint documents"""
+        rows = self.app_module._unpack_lap_document(self._packed_doc("a.tcx", 1, ["t1", "t2"], [10.0, 12.5]))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(list(rows[1].keys()), ["LapNumber", "LapStartTime", "LapTotalTime_s", "LapDistance_m",
+                                                "Pace_min_per_km", "Time", "Latitude", "Longitude", "Altitude_m",
+                                                "Distance_m", "_source_file"])
+        self.assertEqual((rows[1]["Time"], rows[1]["Altitude_m"], rows[1]["_source_file"]), ("t2", 12.5, "a.tcx"))
+
+    def test_iter_detailed_rows_reads_both_layouts(self):
+        """Test packed files are streamed from the packed collection and excluded from the rows query"""
+        packed, detailed = MagicMock(), MagicMock()
+        packed.distinct.return_value = ["a.tcx"]
+        packed.find.return_value.sort.return_value = iter([
+            self._packed_doc("a.tcx", 1, ["t1"], [10.0]),
+            {"_source_file": "future.tcx", "format": 99},
+        ])
+        detailed.find.return_value.sort.return_value = iter([{"_source_file": "b.tcx", "Time": "t0"}])
+        db = {self.app_module.COLLECTION_DETAILED_PACKED: packed, self.app_module.COLLECTION_DETAILED: detailed}
+
+        rows = self.app_module._iter_detailed_rows(db)
+        self.assertNotIsInstance(rows, list)
+        self.assertEqual([r["_source_file"] for r in rows], ["b.tcx", "a.tcx"])
+        self.assertEqual(detailed.find.call_args.args[0], {"_source_file": {"$nin": ["a.tcx"]}})
+        self.assertEqual(detailed.find.call_args.kwargs["batch_size"], self.app_module.DETAILED_CURSOR_BATCH_SIZE)
+        self.assertEqual(packed.distinct.call_args.args, ("_source_file", {"format": 1}))
+
+    def test_detailed_view_streams_one_pass(self):
+        """Test the Python view consumes a one-shot iterator and keeps only sampled rows per source"""
+        def trackpoints():
+            for source in ("a.tcx", "b.tcx"):
+                for i in range(180):
+                    yield {"_source_file": source, "LapNumber": 1 + i // 90,
+                           "Time": f"2024-01-01T10:{i // 60:02d}:{i % 60:02d}Z", "Altitude_m": float(i)}
+
+        view = self.app_module._detailed_view_from_rows(trackpoints())
+        self.assertEqual(view.lap_deltas, {"a.tcx": {1: 89.0, 2: 89.0}, "b.tcx": {1: 89.0, 2: 89.0}})
+        self.assertEqual([r["Time"] for r in view.samples["b.tcx"]],
+                         ["2024-01-01T10:00:00Z", "2024-01-01T10:01:00Z", "2024-01-01T10:02:00Z"])
+
+        view = self.app_module._detailed_view_from_rows(trackpoints(), with_samples=False)
+        self.assertEqual(view.samples, {})
+        self.assertEqual(len(view.lap_deltas), 2)
+
+        view = self.app_module._detailed_view_from_rows(trackpoints(), with_lap_deltas=False)
+        self.assertEqual(view.lap_deltas, {})
+        self.assertEqual(len(view.samples["a.tcx"]), 3)
+
+    def test_index_scans_detailed_once(self):
+        """Test the index view reads the detailed collections once, for lap deltas only"""
+        summary, detailed, packed = MagicMock(), MagicMock(), MagicMock()
+        laps = [{"_id": "oid", "_source_file": "run_2024-01-01.tcx", "LapNumber": 1,
+                 "LapDistance_m": 1000, "LapTotalTime_s": 300}]
+        summary.aggregate.side_effect = lambda pipeline, **kwargs: _aggregate(pipeline, laps)
+        detailed.find.return_value.sort.return_value = [
+            {"_source_file": "run_2024-01-01.tcx", "LapNumber": 1, "Time": "t0", "Altitude_m": 10.0},
+            {"_source_file": "run_2024-01-01.tcx", "LapNumber": 1, "Time": "t1", "Altitude_m": 13.0},
+        ]
+        packed.find.return_value.sort.return_value = []
+        runs, records = MagicMock(), MagicMock()
+        runs.find.return_value = records.find.return_value = []
+        db = {self.app_module.COLLECTION_SUMMARY: summary, self.app_module.COLLECTION_DETAILED: detailed,
+              self.app_module.COLLECTION_DETAILED_PACKED: packed, self.app_module.COLLECTION_RUNS: runs,
+              self.app_module.COLLECTION_PERSONAL_RECORDS: records}
+
+        with patch.object(self.app_module, 'get_db_connection', return_value=db), \
+             patch.object(self.app_module, 'DETAILED_SAMPLING', 'client'), \
+             patch.object(self.app_module, 'render_template', return_value="") as mock_render:
+            self.app_module.app.test_client().get("/")
+
+        detailed.find.assert_called_once()
+        packed.find.assert_called_once()
+        # Laps and their totals come from one aggregation, not a second find()
+        summary.aggregate.assert_called_once()
+        summary.find.assert_not_called()
+        context = mock_render.call_args.kwargs
+        self.assertEqual(context["grouped"]["run_2024-01-01.tcx"][0]["AltitudeDelta_m"], 3.0)
+        self.assertNotIn("_id", context["grouped"]["run_2024-01-01.tcx"][0])
+        self.assertEqual(context["file_summaries"][0]["lap_count"], 1)
+        self.assertNotIn("detailed", context)
+
+    def test_index_reads_run_summaries(self):
+        """Test the index view builds tables and records from run documents without scanning laps"""
+        runs = MagicMock()
+        runs.find.return_value = [
+            {"_source_file": "run_2024-01-01.tcx", "date": "2024-01-01", "format": 1, "total_distance_m": 2500.0,
+             "total_time_s": 780.0, "lap_altitude_deltas": {"1": 4.0},
+             "laps": [{"LapNumber": 1, "LapDistance_m": 1000.0, "LapTotalTime_s": 300.0},
+                      {"LapNumber": 2, "LapDistance_m": 1000.0, "LapTotalTime_s": 330.0},
+                      {"LapNumber": 3, "LapDistance_m": 500.0, "LapTotalTime_s": 150.0}],
+             "fastest_lap": {"LapNumber": 1, "LapDistance_m": 1000.0, "LapTotalTime_s": 300.0},
+             "slowest_lap": {"LapNumber": 2, "LapDistance_m": 1000.0, "LapTotalTime_s": 330.0}},
+            {"_source_file": "run_2024-01-02.tcx", "format": 1, "total_distance_m": 1000.0, "total_time_s": 290.0,
+             "laps": [{"LapNumber": 1, "LapDistance_m": 1000.0, "LapTotalTime_s": 290.0}],
+             "fastest_lap": {"LapNumber": 1, "LapDistance_m": 1000.0, "LapTotalTime_s": 290.0},
+             "slowest_lap": {"LapNumber": 1, "LapDistance_m": 1000.0, "LapTotalTime_s": 290.0}},
+            {"_source_file": "old.tcx", "format": 99},
+        ]
+        summary, detailed, records = MagicMock(), MagicMock(), MagicMock()
+        summary.distinct.return_value = ["run_2024-01-01.tcx", "run_2024-01-02.tcx"]
+        records.find.return_value = []
+        db = {self.app_module.COLLECTION_RUNS: runs, self.app_module.COLLECTION_SUMMARY: summary,
+              self.app_module.COLLECTION_DETAILED: detailed, self.app_module.COLLECTION_PERSONAL_RECORDS: records}
+
+        with patch.object(self.app_module, 'get_db_connection', return_value=db), \
+             patch.object(self.app_module, 'render_template', return_value="") as mock_render:
+            self.app_module.app.test_client().get("/")
+
+        summary.find.assert_not_called()
+        detailed.find.assert_not_called()
+        context = mock_render.call_args.kwargs
+        self.assertEqual([f["source"] for f in context["file_summaries"]], ["run_2024-01-01.tcx", "run_2024-01-02.tcx"])
+        self.assertEqual(context["file_summaries"][0]["total_distance_formatted"], "2.50 km")
+        laps = context["file_all_laps"]["run_2024-01-01.tcx"]
+        self.assertEqual([lap["AltitudeDelta_m"] for lap in laps], [4.0, 0, 0])
+        self.assertEqual(len(context["file_valid_laps"]["run_2024-01-01.tcx"]), 2)
+        self.assertEqual(context["fastest_lap"]["_source_file"], "run_2024-01-02.tcx")
+        self.assertEqual(context["slowest_lap"]["LapTotalTime_formatted"], "0:05:30")
+        self.assertEqual(context["longest_distance_file"]["source"], "run_2024-01-01.tcx")
+
+    def test_runs_without_runs_document_are_computed_from_laps(self):
+        """Test runs ingested before the runs collection existed still appear next to newer ones"""
+        runs, records, summary, detailed, packed = MagicMock(), MagicMock(), MagicMock(), MagicMock(), MagicMock()
+        runs.find.return_value = [
+            {"_source_file": "run_2024-02-01.tcx", "format": 1, "total_distance_m": 1000.0, "total_time_s": 300.0,
+             "laps": [{"LapNumber": 1, "LapDistance_m": 1000.0, "LapTotalTime_s": 300.0}],
+             "fastest_lap": {"LapNumber": 1, "LapDistance_m": 1000.0, "LapTotalTime_s": 300.0},
+             "slowest_lap": {"LapNumber": 1, "LapDistance_m": 1000.0, "LapTotalTime_s": 300.0}},
+        ]
+        records.find.return_value = [
+            {"_id": "fastest_lap", "_source_file": "run_2024-02-01.tcx", "value": 300.0,
+             "lap": {"LapNumber": 1, "LapDistance_m": 1000.0, "LapTotalTime_s": 300.0}},
+        ]
+        summary.distinct.return_value = ["run_2024-01-01.tcx", "run_2024-02-01.tcx"]
+        summary.find.return_value = [
+            {"_source_file": "run_2024-01-01.tcx", "LapNumber": 1, "LapDistance_m": 1000, "LapTotalTime_s": 280},
+            {"_source_file": "run_2024-01-01.tcx", "LapNumber": 2, "LapDistance_m": 1000, "LapTotalTime_s": 320},
+        ]
+        detailed.find.return_value.sort.return_value = []
+        packed.find.return_value.sort.return_value = []
+        packed.distinct.return_value = []
+        db = {self.app_module.COLLECTION_RUNS: runs, self.app_module.COLLECTION_PERSONAL_RECORDS: records,
+              self.app_module.COLLECTION_SUMMARY: summary, self.app_module.COLLECTION_DETAILED: detailed,
+              self.app_module.COLLECTION_DETAILED_PACKED: packed}
+
+        with patch.object(self.app_module, 'get_db_connection', return_value=db), \
+             patch.object(self.app_module, 'DETAILED_SAMPLING', 'client'), \
+             patch.object(self.app_module, 'FILE_SUMMARIES', 'client'), \
+             patch.object(self.app_module, 'render_template', return_value="") as mock_render:
+            self.app_module.app.test_client().get("/")
+
+        # Only the run without a runs document is read from the laps
+        self.assertEqual(summary.find.call_args.args[0], {"_source_file": {"$in": ["run_2024-01-01.tcx"]}})
+        context = mock_render.call_args.kwargs
+        self.assertEqual(sorted(f["source"] for f in context["file_summaries"]),
+                         ["run_2024-01-01.tcx", "run_2024-02-01.tcx"])
+        self.assertEqual(len(context["file_all_laps"]["run_2024-01-01.tcx"]), 2)
+        # The records collection only knows runs documents; the older run holds both lap records
+        self.assertEqual(context["fastest_lap"]["_source_file"], "run_2024-01-01.tcx")
+        self.assertEqual(context["slowest_lap"]["_source_file"], "run_2024-01-01.tcx")
+        self.assertEqual(context["longest_distance_file"]["source"], "run_2024-01-01.tcx")
+
+    def test_personal_records_read_from_records_collection(self):
+        """Test the Records panel entries come straight from the personal records documents"""
+        records = MagicMock()
+        records.find.return_value = [
+            {"_id": "fastest_lap", "_source_file": "run_2024-01-02.tcx", "value": 290.0,
+             "lap": {"LapNumber": 3, "LapDistance_m": 1000.0, "LapTotalTime_s": 290.0}},
+            {"_id": "longest_distance", "_source_file": "run_2024-01-01.tcx", "value": 2500.0,
+             "total_distance_m": 2500.0, "total_time_s": 780.0},
+        ]
+        fastest, slowest, longest_distance, longest_time = self.app_module.load_personal_records(
+            {self.app_module.COLLECTION_PERSONAL_RECORDS: records})
+
+        self.assertEqual(fastest["_source_file"], "run_2024-01-02.tcx")
+        self.assertEqual(fastest["LapTotalTime_formatted"], "0:04:50")
+        self.assertIsNone(slowest)
+        self.assertEqual(longest_distance["date"], "2024-01-01")
+        self.assertEqual(longest_distance["total_distance_formatted"], "2.50 km")
+        self.assertIsNone(longest_time)
+
+        records.find.return_value = []
+        self.assertIsNone(self.app_module.load_personal_records({self.app_module.COLLECTION_PERSONAL_RECORDS: records}))
+
+    def test_index_served_from_cache_until_dataset_version_changes(self):
+        """Test repeat index views reuse the render until ingest bumps the dataset version"""
+        runs, records, version = MagicMock(), MagicMock(), MagicMock()
+        runs.find.return_value = [{"_source_file": "run_2024-01-01.tcx", "format": 1, "total_distance_m": 1000.0,
+                                   "total_time_s": 300.0, "laps": []}]
+        records.find.return_value = []
+        version.find_one.return_value = {"_id": "dataset", "version": 7}
+        summary = MagicMock()
+        summary.distinct.return_value = ["run_2024-01-01.tcx"]
+        db = {self.app_module.COLLECTION_RUNS: runs, self.app_module.COLLECTION_PERSONAL_RECORDS: records,
+              self.app_module.COLLECTION_SUMMARY: summary, self.app_module.COLLECTION_DATASET_VERSION: version}
+        cache = self.app_module.ResponseCache(max_entries=8, ttl_s=60)
+
+        with patch.object(self.app_module, 'get_db_connection', return_value=db), \
+             patch.object(self.app_module, 'response_cache', cache), \
+             patch.object(self.app_module, 'DATASET_VERSION_POLL_S', 0), \
+             patch.object(self.app_module, 'render_template', side_effect=["v7", "v8"]) as mock_render:
+            client = self.app_module.app.test_client()
+            first, second = client.get("/"), client.get("/")
+            version.find_one.return_value = {"_id": "dataset", "version": 8}
+            third = client.get("/")
+
+        self.assertEqual([r.get_data(as_text=True) for r in (first, second, third)], ["v7", "v7", "v8"])
+        self.assertEqual(mock_render.call_count, 2)
+        self.assertEqual(runs.find.call_count, 2)
+        self.assertEqual((cache.stats()["hits"], cache.stats()["misses"]), (1, 2))
+
+    def test_index_error_page_is_not_cached(self):
+        """Test a failed index render is not served from the cache afterwards"""
+        version = MagicMock()
+        version.find_one.return_value = None
+        runs = MagicMock()
+        runs.find.side_effect = RuntimeError("down")
+        db = {self.app_module.COLLECTION_RUNS: runs, self.app_module.COLLECTION_DATASET_VERSION: version}
+        cache = self.app_module.ResponseCache(max_entries=8, ttl_s=60)
+
+        with patch.object(self.app_module, 'get_db_connection', return_value=db), \
+             patch.object(self.app_module, 'response_cache', cache), \
+             patch.object(self.app_module, 'render_template', return_value="empty"):
+            self.app_module.app.test_client().get("/")
+
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def _run_db(self, trackpoints):
+        """Fake db holding one run's laps and trackpoints in the row layout"""
+        summary, detailed, packed = MagicMock(), MagicMock(), MagicMock()
+        summary.find.return_value.sort.return_value = [
+            {"_source_file": "run_2024-01-01.tcx", "LapNumber": 1, "LapDistance_m": 1000, "LapTotalTime_s": 300}]
+        detailed.find.return_value.sort.return_value = trackpoints
+        packed.find.return_value.sort.return_value = []
+        return {self.app_module.COLLECTION_SUMMARY: summary, self.app_module.COLLECTION_DETAILED: detailed,
+                self.app_module.COLLECTION_DETAILED_PACKED: packed}
+
+    def test_run_trackpoints_pages_json(self):
+        """Test the trackpoints endpoint returns one JSON page with columns, merge info and nulls for NaN"""
+        trackpoints = [{"_source_file": "run_2024-01-01.tcx", "LapNumber": 1, "Time": f"2024-01-01T10:0{i}:00Z",
+                        "Altitude_m": float("nan") if i == 2 else 10.0 + i} for i in range(5)]
+        db = self._run_db(trackpoints)
+
+        with patch.object(self.app_module, 'get_db_connection', return_value=db), \
+             patch.object(self.app_module, 'DETAILED_SAMPLING', 'client'):
+            response = self.app_module.app.test_client().get("/api/runs/run_2024-01-01.tcx/trackpoints?offset=1&limit=3")
+
+        self.assertEqual(response.status_code, 200)
+        page = response.get_json()
+        self.assertEqual((page["offset"], page["limit"], page["total"]), (1, 3, 5))
+        self.assertEqual([row["Time"] for row in page["rows"]],
+                         ["2024-01-01T10:01:00Z", "2024-01-01T10:02:00Z", "2024-01-01T10:03:00Z"])
+        self.assertIsNone(page["rows"][1]["Altitude_m"])
+        # The first row's delta is taken from the sample before the page
+        self.assertEqual(page["rows"][0]["AltitudeDelta_m"], 1.0)
+        self.assertEqual(page["rows"][0]["_merge_info"]["LapNumber"], {"show": True, "rowspan": 3})
+        self.assertIn({"key": "Altitude_m", "label": "Altitude"}, page["columns"])
+        self.assertNotIn("_source_file", [column["key"] for column in page["columns"]])
+        detailed = db[self.app_module.COLLECTION_DETAILED]
+        self.assertEqual(detailed.find.call_args.args[0], {"_source_file": "run_2024-01-01.tcx"})
+
+    def test_run_trackpoints_skip_lap_deltas(self):
+        """Test the trackpoints endpoint only runs the sampling aggregation and formats only the page"""
+        db = self._run_db([])
+        detailed = db[self.app_module.COLLECTION_DETAILED]
+        detailed.aggregate.return_value = [
+            {"_source_file": "run_2024-01-01.tcx", "LapNumber": 1, "Time": f"2024-01-01T10:0{i}:00Z",
+             "Altitude_m": 10.0 + i} for i in range(5)]
+        db[self.app_module.COLLECTION_DETAILED_PACKED].distinct.return_value = []
+
+        with patch.object(self.app_module, 'get_db_connection', return_value=db), \
+             patch.object(self.app_module, 'DETAILED_SAMPLING', 'server'), \
+             patch.object(self.app_module, '_format_detail_rows',
+                          wraps=self.app_module._format_detail_rows) as mock_format:
+            page = self.app_module.app.test_client().get(
+                "/api/runs/run_2024-01-01.tcx/trackpoints?offset=3&limit=1").get_json()
+
+        detailed.aggregate.assert_called_once()
+        self.assertIn("$setWindowFields", [next(iter(stage)) for stage in detailed.aggregate.call_args.args[0]])
+        self.assertEqual(len(mock_format.call_args.args[0]), 2)
+        self.assertEqual((page["total"], page["rows"][0]["AltitudeDelta_m"]), (5, 1.0))
+
+    def test_run_trackpoints_rejects_bad_requests(self):
+        """Test malformed paging is a 400 and an invalid or unknown source a 404"""
+        client = self.app_module.app.test_client()
+        with patch.object(self.app_module, 'get_db_connection', return_value=self._run_db([])):
+            self.assertEqual(client.get("/api/runs/a.tcx/trackpoints?offset=-1").status_code, 400)
+            self.assertEqual(client.get("/api/runs/a.tcx/trackpoints?limit=abc").status_code, 400)
+            self.assertEqual(client.get("/api/runs/a.tcx/trackpoints?limit=100000").status_code, 400)
+            self.assertEqual(client.get("/api/runs/%0A/trackpoints").status_code, 404)
+            self.assertEqual(client.get("/run/%0A").status_code, 404)
+
+    def test_run_page_renders_laps_and_details(self):
+        """Test the run page renders the lap table and the run's detail table"""
+        trackpoints = [{"_source_file": "run_2024-01-01.tcx", "LapNumber": 1, "Time": "2024-01-01T10:00:00Z",
+                        "Altitude_m": 10.0}]
+        with patch.object(self.app_module, 'get_db_connection', return_value=self._run_db(trackpoints)), \
+             patch.object(self.app_module, 'DETAILED_SAMPLING', 'client'):
+            response = self.app_module.app.test_client().get("/run/run_2024-01-01.tcx")
+
+        self.assertEqual(response.status_code, 200)
+        html = response.get_data(as_text=True)
+        self.assertIn("Run 2024-01-01", html)
+        self.assertIn("2024-01-01T10:00:00Z", html)
+        self.assertIn("0:05:00", html)
+
+    def test_run_laps_fragment(self):
+        """Test a run's lap table fragment comes from its runs document, else from its laps"""
+        runs = MagicMock()
+        runs.find_one.return_value = {
+            "format": 1, "_source_file": "run_2024-01-01.tcx", "lap_altitude_deltas": {"2": 3.0},
+            "laps": [{"LapNumber": 1, "LapDistance_m": 1000.0, "LapTotalTime_s": 290.0},
+                     {"LapNumber": 2, "LapDistance_m": 1000.0, "LapTotalTime_s": 310.0}]}
+        db = dict(self._run_db([]), **{self.app_module.COLLECTION_RUNS: runs})
+        client = self.app_module.app.test_client()
+
+        with patch.object(self.app_module, 'get_db_connection', return_value=db), \
+             patch.object(self.app_module, 'DETAILED_SAMPLING', 'client'):
+            response = client.get("/run/run_2024-01-01.tcx/laps")
+            self.assertEqual(response.status_code, 200)
+            html = response.get_data(as_text=True)
+            self.assertNotIn("<html", html)
+            self.assertIn("0:04:50", html)
+            self.assertIn('title="Fastest Lap"', html)
+            self.assertIn("3.00 m", html)
+            db[self.app_module.COLLECTION_SUMMARY].find.assert_not_called()
+
+            runs.find_one.return_value = None
+            response = client.get("/run/run_2024-01-01.tcx/laps")
+            self.assertEqual(response.status_code, 200)
+            self.assertIn("0:05:00", response.get_data(as_text=True))
+            self.assertEqual(db[self.app_module.COLLECTION_SUMMARY].find.call_args.args[0],
+                             {"_source_file": "run_2024-01-01.tcx"})
+            self.assertEqual(client.get("/run/%0A/laps").status_code, 404)
+
+    def test_index_renders_only_the_latest_lap_table(self):
+        """Test the dashboard renders the open run's laps and leaves the others to load on expand"""
+        runs = [{"_source_file": f"run_2024-01-0{day}.tcx", "format": 1, "total_distance_m": 1000.0,
+                 "total_time_s": 300.0 + day, "laps": [{"LapNumber": 1, "LapDistance_m": 1000.0,
+                                                        "LapTotalTime_s": 300.0 + day}]} for day in (1, 2, 3)]
+        records, summary = MagicMock(), MagicMock()
+        records.find.return_value = []
+        summary.distinct.return_value = []
+        db = {self.app_module.COLLECTION_RUNS: MagicMock(), self.app_module.COLLECTION_PERSONAL_RECORDS: records,
+              self.app_module.COLLECTION_SUMMARY: summary}
+        db[self.app_module.COLLECTION_RUNS].find.return_value = runs
+
+        with patch.object(self.app_module, 'get_db_connection', return_value=db):
+            html = self.app_module.app.test_client().get("/").get_data(as_text=True)
+
+        self.assertEqual(html.count('<th>Lap time</th>'), 1)
+        self.assertIn("0:05:03", html)
+        self.assertIn('data-laps-url="/run/run_2024-01-02.tcx/laps"', html)
+        self.assertIn('data-laps-url="/run/run_2024-01-01.tcx/laps"', html)
+        self.assertNotIn('data-laps-url="/run/run_2024-01-03.tcx/laps"', html)
+
+    def test_calculate_lap_altitude_deltas_single_pass(self):
+        """Test lap altitude deltas are summed per lap, skipping missing and voiding invalid altitudes"""
+        points = [
+            {"LapNumber": 1, "Altitude_m": 10.0}, {"LapNumber": 1, "Altitude_m": None},
+            {"LapNumber": 2, "Altitude_m": 20.0}, {"LapNumber": 1, "Altitude_m": 14.5},
+            {"LapNumber": 2, "Altitude_m": 18.0}, {"LapNumber": 3, "Altitude_m": 5.0},
+            {"LapNumber": 3, "Altitude_m": "bad"}, {"LapNumber": 4, "Altitude_m": 7.0},
+        ]
+        self.assertEqual(self.app_module._calculate_lap_altitude_deltas(points), {1: 4.5, 2: -2.0, 3: 0, 4: 0})
+
+        grouped = {"a.tcx": [{"LapNumber": 1}, {"LapNumber": 5}, {}]}
+        lap_deltas = {"a.tcx": self.app_module._calculate_lap_altitude_deltas(points)}
+        self.app_module._calculate_altitude_deltas(grouped, lap_deltas)
+        self.assertEqual([lap["AltitudeDelta_m"] for lap in grouped["a.tcx"]], [4.5, 0, 0])
+
+    def test_table_merge_info_run_lengths(self):
+        """Test merge info marks the first row of each run with its length and hides the rest"""
+        rows = [
+            {"LapNumber": 1, "_source_file": "a"}, {"LapNumber": 1, "_source_file": "a"},
+            {"LapNumber": 2, "_source_file": "a"}, {"_source_file": "a"},
+            {"LapNumber": 2, "_source_file": "b"},
+        ]
+        info = self.app_module._calculate_table_merge_info(rows)
+        self.assertEqual(info[0]["LapNumber"], {"show": True, "rowspan": 2})
+        self.assertEqual(info[1]["LapNumber"], {"show": False, "rowspan": 1})
+        self.assertEqual(info[2]["LapNumber"], {"show": True, "rowspan": 1})
+        self.assertNotIn("LapNumber", info[3])
+        self.assertEqual(info[4]["LapNumber"], {"show": True, "rowspan": 1})
+        self.assertEqual(info[0]["_source_file"], {"show": True, "rowspan": 4})
+        self.assertEqual(info[4]["_source_file"], {"show": True, "rowspan": 1})
+        self.assertEqual(self.app_module._calculate_table_merge_info([]), [])
+
+    def test_filter_data_by_interval_uses_elapsed_time(self):
+        """Test sampling keeps the first trackpoint of each interval by timestamp, not row index"""
+        times = ["2024-01-01T10:00:00Z", "2024-01-01T10:00:30Z", "2024-01-01T10:01:00Z",
+                 "2024-01-01T10:05:59.000Z", "2024-01-01T10:06:01.000Z", None, "bad"]
+        rows = [{"Time": t} for t in times]
+        with patch.object(self.app_module, 'DETAILED_DATA_SAMPLE_INTERVAL', 60):
+            sampled = self.app_module._filter_data_by_interval(rows)
+        self.assertEqual([r["Time"] for r in sampled], [times[0], times[2], times[3], times[4], None])
+
+    def test_sampling_windows_start_at_the_run_start(self):
+        """Test windows count elapsed time from the first trackpoint, not wall-clock minutes"""
+        times = [None, "2024-01-01T10:00:30Z", "2024-01-01T10:00:59Z", "2024-01-01T10:01:10Z",
+                 "2024-01-01T10:01:30Z", "2024-01-01T10:02:29Z", "2024-01-01T10:02:30Z"]
+        rows = [{"Time": t} for t in times]
+        with patch.object(self.app_module, 'DETAILED_DATA_SAMPLE_INTERVAL', 60):
+            sampled = self.app_module._filter_data_by_interval(rows)
+        self.assertEqual([r["Time"] for r in sampled], [None, times[1], times[4], times[6]])
+
+    def test_server_side_sampling_uses_aggregation(self):
+        """Test server mode gets lap deltas and sampled rows from aggregations instead of a full find"""
+        detailed, packed = MagicMock(), MagicMock()
+        packed.find.return_value.sort.return_value = []
+        detailed.aggregate.side_effect = [
+            iter([{"source": "a.tcx", "lap": 1, "delta": 3.0}]),
+            iter([{"_source_file": "a.tcx", "Time": "t0"}, {"_source_file": "a.tcx", "Time": "t1"}]),
+        ]
+        db = {self.app_module.COLLECTION_DETAILED: detailed, self.app_module.COLLECTION_DETAILED_PACKED: packed}
+
+        with patch.object(self.app_module, 'get_db_connection', return_value=db), \
+             patch.object(self.app_module, 'DETAILED_SAMPLING', 'server'):
+            view = self.app_module.load_detailed_view()
+
+        detailed.find.assert_not_called()
+        self.assertEqual(view.lap_deltas, {"a.tcx": {1: 3.0}})
+        self.assertEqual([r["Time"] for r in view.samples["a.tcx"]], ["t0", "t1"])
+        sampling = detailed.aggregate.call_args_list[1].args[0]
+        stages = {name: stage[name] for stage in sampling for name in stage}
+        self.assertIn("$top", stages["$group"]["row"])
+        # Windows are measured from each run's first trackpoint
+        self.assertEqual(stages["$setWindowFields"]["partitionBy"], "$_source_file")
+        self.assertEqual(stages["$group"]["_id"]["bucket"]["$floor"]["$divide"][0],
+                         {"$subtract": ["$_sample_ms", "$_run_start_ms"]})
+
+    def test_server_side_sampling_falls_back_to_python(self):
+        """Test an aggregation failure falls back to sampling a full scan in Python"""
+        detailed, packed = MagicMock(), MagicMock()
+        packed.find.return_value.sort.return_value = []
+        detailed.aggregate.side_effect = Exception("Unrecognized expression '$top'")
+        detailed.find.return_value.sort.return_value = [{"_source_file": "a.tcx", "LapNumber": 1, "Time": "t0",
+                                                         "Altitude_m": 1.0}]
+        db = {self.app_module.COLLECTION_DETAILED: detailed, self.app_module.COLLECTION_DETAILED_PACKED: packed}
+
+        with patch.object(self.app_module, 'get_db_connection', return_value=db), \
+             patch.object(self.app_module, 'DETAILED_SAMPLING', 'server'):
+            view = self.app_module.load_detailed_view()
+
+        self.assertEqual(view.lap_deltas, {"a.tcx": {1: 0}})
+        self.assertEqual(len(view.samples["a.tcx"]), 1)
+
+    def test_file_laps_aggregation_matches_python(self):
+        """Test the $group laps and totals agree with the find() and Python fallback, invalid values included"""
+        laps = [
+            {"_source_file": "a.tcx", "LapNumber": 1, "LapDistance_m": 1000.0, "LapTotalTime_s": 300.0},
+            {"_source_file": "a.tcx", "LapNumber": 2, "LapDistance_m": 989.9, "LapTotalTime_s": 310.5},
+            {"_source_file": "a.tcx", "LapNumber": 3, "LapDistance_m": "1500", "LapTotalTime_s": 450},
+            {"_source_file": "b.tcx", "LapNumber": 1, "LapDistance_m": 2000.0},
+            {"_source_file": "c.tcx", "LapNumber": 1, "LapDistance_m": "invalid", "LapTotalTime_s": 300.0},
+            {"_source_file": "c.tcx", "LapNumber": 2, "LapDistance_m": 1000.0, "LapTotalTime_s": 300.0},
+            {"_source_file": "d.tcx", "LapNumber": 1, "LapDistance_m": None, "LapTotalTime_s": 300.0},
+            {"LapNumber": 1, "LapDistance_m": 1200.0, "LapTotalTime_s": 360.0},
+        ]
+        summary = MagicMock()
+        summary.aggregate.side_effect = lambda pipeline, **kwargs: _aggregate(
+            pipeline, [{"_id": "oid", **lap} for lap in laps])
+        summary.find.side_effect = lambda *args, **kwargs: [dict(lap) for lap in laps]
+
+        with patch.object(self.app_module, 'get_db_connection', return_value={"summary": summary}):
+            with patch.object(self.app_module, 'FILE_SUMMARIES', 'client'):
+                python_grouped, python_totals = self.app_module.load_file_laps()
+            with patch.object(self.app_module, 'FILE_SUMMARIES', 'server'):
+                server_grouped, server_totals = self.app_module.load_file_laps()
+
+        self.assertIsNone(python_totals)
+        self.assertEqual(len(server_totals), 5)
+        self.assertEqual(server_grouped, python_grouped)
+        server = self.app_module.calculate_file_summaries(server_grouped, server_totals)
+        self.assertEqual(server, self.app_module.calculate_file_summaries(python_grouped))
+        by_source = {summary["source"]: summary for summary in server[0]}
+        self.assertEqual((by_source["a.tcx"]["lap_count"], by_source["a.tcx"]["valid_lap_count"]), (3, 2))
+        self.assertEqual(by_source["c.tcx"]["total_distance"], 0)
+
+    def test_file_laps_fall_back_to_find(self):
+        """Test a failing aggregation reads the laps with find() and leaves the totals to Python"""
+        summary = MagicMock()
+        summary.aggregate.side_effect = Exception("not authorized")
+        summary.find.return_value = [{"_source_file": "a.tcx", "LapDistance_m": 1000, "LapTotalTime_s": 300}]
+        with patch.object(self.app_module, 'get_db_connection', return_value={"summary": summary}), \
+             patch.object(self.app_module, 'FILE_SUMMARIES', 'server'):
+            grouped, totals = self.app_module.load_file_laps()
+        self.assertIsNone(totals)
+        summary.find.assert_called_once()
+
+        summaries, _, _ = self.app_module.calculate_file_summaries(grouped, totals)
+        self.assertEqual((summaries[0]["total_distance"], summaries[0]["lap_count"]), (1000.0, 1))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
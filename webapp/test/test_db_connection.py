@@ -0,0 +1,103 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import threading
+
+# Add webapp directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class TestDbConnection(unittest.TestCase):
+    def setUp(self):
+        # Mock dependencies before importing app
+        self.patches = [
+            patch.dict('sys.modules', {
+                'logging_config': MagicMock(),
+                'pymongo': MagicMock()
+            }),
+            patch.dict('os.environ', {'FLASK_ENV': 'development'})
+        ]
+
+        for p in self.patches:
+            p.start()
+
+        import app
+        self.app_module = app
+        self.clients = []
+        self.mongo_client = patch.object(app, 'MongoClient', side_effect=self.new_client)
+        self.mongo_client.start()
+
+    def tearDown(self):
+        self.mongo_client.stop()
+        for p in self.patches:
+            p.stop()
+
+    def new_client(self, *args, **kwargs):
+        client = MagicMock()
+        self.clients.append((client, kwargs))
+        return client
+
+    def test_client_is_shared_and_pool_sized_by_config(self):
+        """Test one pooled client serves every call in a process, sized by MONGO_MAX_POOL_SIZE"""
+        with patch.object(self.app_module, 'MONGO_POOL_MAX', 32), \
+             patch.object(self.app_module, 'ensure_indexes'):
+            first = self.app_module.get_db_connection()
+            second = self.app_module.get_db_connection()
+
+        self.assertIs(first, second)
+        self.assertEqual(len(self.clients), 1)
+        self.assertEqual(self.clients[0][1]["maxPoolSize"], 32)
+
+    def test_forked_process_opens_its_own_client(self):
+        """Test a pid change creates a new client and leaves the inherited one open"""
+        with patch.object(self.app_module, 'ensure_indexes'):
+            self.app_module.get_db_connection()
+            with patch.object(self.app_module.os, 'getpid', return_value=os.getpid() + 1):
+                self.app_module.get_db_connection()
+                self.app_module.close_db_connection()
+
+        inherited, own = self.clients[0][0], self.clients[1][0]
+        inherited.close.assert_not_called()
+        own.close.assert_called_once()
+        self.assertIsNone(self.app_module.client)
+
+    def test_failed_connection_is_retried(self):
+        """Test a failed server check leaves no client behind, so the next call reconnects"""
+        with patch.object(self.app_module, 'ensure_indexes'):
+            self.mongo_client.stop()
+            failing = MagicMock()
+            failing.return_value.server_info.side_effect = Exception("timed out")
+            with patch.object(self.app_module, 'MongoClient', failing):
+                with self.assertRaises(Exception):
+                    self.app_module.get_db_connection()
+            self.mongo_client.start()
+            self.app_module.get_db_connection()
+
+        self.assertEqual(len(self.clients), 1)
+        self.assertIs(self.app_module.client, self.clients[0][0])
+
+    def test_independent_queries_overlap(self):
+        """Test run_concurrently runs calls at the same time and returns results in call order"""
+        barrier = threading.Barrier(3, timeout=5)
+
+        def query(n):
+            barrier.wait()
+            return n
+        calls = [lambda n=n: query(n) for n in range(3)]
+        with patch.object(self.app_module, 'QUERY_CONCURRENCY', 3):
+            # Every call blocks until all three are running, so sequential execution would time out
+            self.assertEqual(self.app_module.run_concurrently(*calls), [0, 1, 2])
+
+    def test_query_failure_is_raised_and_sequential_mode(self):
+        """Test a failing call is re-raised, and QUERY_CONCURRENCY=1 runs calls in the request thread"""
+        def fail():
+            raise ValueError("boom")
+        with patch.object(self.app_module, 'QUERY_CONCURRENCY', 2):
+            with self.assertRaises(ValueError):
+                self.app_module.run_concurrently(lambda: 1, fail)
+        with patch.object(self.app_module, 'QUERY_CONCURRENCY', 1):
+            threads = self.app_module.run_concurrently(threading.get_ident, threading.get_ident)
+        self.assertEqual(threads, [threading.get_ident()] * 2)
+
+if __name__ == '__main__':
+    unittest.main()
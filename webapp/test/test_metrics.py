@@ -0,0 +1,163 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import sys
+import os
+import time
+import tempfile
+from types import SimpleNamespace
+
+# Add webapp directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import (MetricsRegistry, MetricsDirectory, MongoCommandMetrics, MONGO_COMMAND_SECONDS,
+                     MONGO_COMMAND_FAILURES, start_request, end_request, phase)
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_prometheus_summary_and_counter(self):
+        """Test summaries export rolling quantiles, sum and count, and counters their value"""
+        registry = MetricsRegistry(window=10)
+        for value in range(1, 21):
+            registry.observe("latency_seconds", value / 100, endpoint="index")
+        registry.increment("failures_total", command="find")
+
+        text = registry.render()
+        self.assertIn("# TYPE latency_seconds summary", text)
+        # Quantiles only cover the last 10 observations, sum and count everything
+        self.assertIn('latency_seconds{endpoint="index",quantile="0.5"} 0.160000', text)
+        self.assertIn('latency_seconds_sum{endpoint="index"} 2.100000', text)
+        self.assertIn('latency_seconds_count{endpoint="index"} 20', text)
+        self.assertIn('# TYPE failures_total counter\nfailures_total{command="find"} 1', text)
+
+    def test_command_listener_feeds_registry_and_request(self):
+        """Test MongoDB command events are recorded globally and in the issuing request's mongo phase"""
+        registry = MetricsRegistry()
+        listener = MongoCommandMetrics(registry)
+        timings = start_request()
+        try:
+            listener.succeeded(SimpleNamespace(command_name="find", duration_micros=2500))
+            listener.failed(SimpleNamespace(command_name="aggregate", duration_micros=1000))
+        finally:
+            end_request()
+        listener.succeeded(SimpleNamespace(command_name="find", duration_micros=500))
+
+        self.assertAlmostEqual(timings.phases["mongo"], 0.0035)
+        self.assertEqual(registry.quantiles(MONGO_COMMAND_SECONDS, command="find")[0.99], 0.0025)
+        self.assertIn(f'{MONGO_COMMAND_FAILURES}{{command="aggregate"}} 1', registry.render())
+
+class TestMetricsDirectory(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.directory = MetricsDirectory(self.tmp.name, publish_interval_s=60)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _worker(self, pid, *latencies):
+        """A registry published from worker `pid`, which has a MetricsDirectory of its own"""
+        registry = MetricsRegistry()
+        for value in latencies:
+            registry.observe("latency_seconds", value, endpoint="index")
+        registry.increment("failures_total", command="find")
+        with patch('metrics.os.getpid', return_value=pid):
+            MetricsDirectory(self.tmp.name, publish_interval_s=60).publish(registry)
+        return registry
+
+    def test_scrape_reports_every_worker(self):
+        """Test whichever worker is scraped reports the sum of all workers' metrics"""
+        self._worker(101, 0.1, 0.2)
+        scraped = self._worker(102, 0.3)
+        scraped.observe("latency_seconds", 0.4, endpoint="index")
+
+        with patch('metrics.os.getpid', return_value=102):
+            text = self.directory.aggregate(scraped).render()
+        # The scraped worker's unpublished observation is included
+        self.assertIn('latency_seconds_count{endpoint="index"} 4', text)
+        self.assertIn('latency_seconds_sum{endpoint="index"} 1.000000', text)
+        self.assertIn('latency_seconds{endpoint="index",quantile="0.99"} 0.400000', text)
+        self.assertIn('failures_total{command="find"} 2', text)
+
+    def test_publish_is_throttled(self):
+        """Test a worker rewrites its snapshot at most once per interval"""
+        registry = MetricsRegistry()
+        with patch('metrics.os.getpid', return_value=101):
+            registry.observe("latency_seconds", 0.1, endpoint="index")
+            self.directory.publish(registry)
+            registry.observe("latency_seconds", 0.2, endpoint="index")
+            self.directory.publish(registry)
+        self.assertEqual(self.directory._read("101.json")["summaries"][0][2], 1)
+
+    def test_exited_worker_keeps_counts_not_quantiles(self):
+        """Test an exited worker's counts and sums survive it, its stale quantiles do not"""
+        self._worker(101, 0.5, 0.5)
+        self.directory.archive(101)
+        self._worker(102, 0.1)
+        self.directory.archive(102)
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), [MetricsDirectory.EXITED])
+
+        with patch('metrics.os.getpid', return_value=103):
+            text = self.directory.aggregate(MetricsRegistry()).render()
+        self.assertIn('latency_seconds_count{endpoint="index"} 3', text)
+        self.assertIn('latency_seconds_sum{endpoint="index"} 1.100000', text)
+        self.assertNotIn("quantile", text)
+        self.assertIn('failures_total{command="find"} 2', text)
+
+class TestRequestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        # Mock dependencies before importing app
+        self.patches = [
+            patch.dict('sys.modules', {
+                'logging_config': MagicMock(),
+                'pymongo': MagicMock()
+            }),
+            patch.dict('os.environ', {'FLASK_ENV': 'development'})
+        ]
+
+        for p in self.patches:
+            p.start()
+
+        import app
+        self.app_module = app
+        self.client = app.app.test_client()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def get(self, url):
+        def query():
+            with phase("query"):
+                time.sleep(0.01)
+
+        def slow_dashboard():
+            # Phases timed on query pool threads must reach the request
+            self.app_module.run_concurrently(query, query)
+            return [], [], {}, {}, (None, None, None, None)
+        with patch.object(self.app_module, 'get_dataset_state', return_value=None), \
+             patch.object(self.app_module, 'load_dashboard_from_runs', side_effect=slow_dashboard), \
+             patch.object(self.app_module, 'render_template', return_value="<html></html>"):
+            return self.client.get(url)
+
+    def test_server_timing_and_metrics_when_enabled(self):
+        """Test METRICS=on adds Server-Timing per phase and exposes request summaries on /metrics"""
+        with patch.object(self.app_module, 'METRICS', True), \
+             patch.object(self.app_module.timing_logger, 'info') as log:
+            response = self.get("/")
+            metrics = self.client.get("/metrics")
+
+        phases = dict(entry.split(";dur=") for entry in response.headers["Server-Timing"].split(", "))
+        self.assertEqual({"data", "query", "render", "total"}, set(phases))
+        self.assertGreaterEqual(float(phases["query"]), 20.0)
+        self.assertIn('"endpoint":"index"', log.call_args_list[0].args[0])
+        self.assertEqual(metrics.status_code, 200)
+        body = metrics.get_data(as_text=True)
+        self.assertIn('runningtracker_request_duration_seconds_count{endpoint="index",status="200"} 1', body)
+        self.assertIn('runningtracker_request_phase_seconds_count{endpoint="index",phase="render"} 1', body)
+
+    def test_instrumentation_is_opt_in(self):
+        """Test the default leaves responses untouched and hides /metrics"""
+        response = self.get("/")
+        self.assertNotIn("Server-Timing", response.headers)
+        self.assertEqual(self.client.get("/metrics").status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
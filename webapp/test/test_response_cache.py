@@ -0,0 +1,64 @@
+import unittest
+import sys
+import os
+
+# Add webapp directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from response_cache import ResponseCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = ResponseCache(max_entries=2, ttl_s=10, clock=self.clock)
+
+    def test_hits_and_misses_are_counted(self):
+        """Test lookups count hits and misses and computed values are stored"""
+        calls = []
+        compute = lambda: calls.append(1) or "page"
+        self.assertEqual(self.cache.get_or_compute((1, "index"), compute), "page")
+        self.assertEqual(self.cache.get_or_compute((1, "index"), compute), "page")
+        self.assertEqual(len(calls), 1)
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+        self.assertEqual(stats["hit_ratio"], 0.5)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test the size limit evicts the least recently used key"""
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.cache.get("a")
+        self.cache.set("c", 3)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertEqual(self.cache.get("c"), 3)
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_entries_expire_after_ttl(self):
+        """Test an entry is served until its TTL passes and dropped afterwards"""
+        self.cache.set("a", 1)
+        self.clock.now = 9.9
+        self.assertEqual(self.cache.get("a"), 1)
+        self.clock.now = 10.0
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+    def test_disabled_cache_always_computes(self):
+        """Test max_entries=0 turns the cache off"""
+        cache = ResponseCache(max_entries=0)
+        calls = []
+        for _ in range(2):
+            cache.get_or_compute("a", lambda: calls.append(1))
+        self.assertEqual(len(calls), 2)
+        self.assertFalse(cache.stats()["enabled"])
+        self.assertEqual(cache.stats()["entries"], 0)
+
+if __name__ == '__main__':
+    unittest.main()